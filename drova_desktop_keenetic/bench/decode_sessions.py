@@ -0,0 +1,59 @@
+"""Microbenchmark: session-manager response decoding.
+
+Compares the previous path (``json.loads`` + ``SessionsResponse(**...)``) with
+``decode_sessions`` on bodies rebuilt from ``drova_har_reg_file.txt``.
+
+    python -m drova_desktop_keenetic.bench.decode_sessions [har_file]
+"""
+
+import json
+import sys
+import timeit
+
+from drova_desktop_keenetic.common.drova import (
+    SessionsResponse,
+    SessionStatus,
+    decode_sessions,
+)
+from drova_desktop_keenetic.common.har import (
+    HAR_FILE,
+    load_har,
+    session_entries,
+    sessions_body,
+)
+
+# recorded responses hold 0..1 sessions; larger lists show how each path scales with history length
+SESSION_COUNTS = (None, 10, 100, 500)
+
+
+def _legacy(body: bytes):
+    sessions = SessionsResponse(**json.loads(body)).sessions
+    return sessions[0] if sessions else None
+
+
+CASES = {
+    "legacy json.loads + SessionsResponse(**)": _legacy,
+    "model_validate_json (all sessions)": lambda body: decode_sessions(body),
+    "from_json + first session": lambda body: decode_sessions(body, limit=1),
+    "from_json + first status only": lambda body: decode_sessions(body, limit=1, model=SessionStatus),
+}
+
+
+def main() -> None:
+    entries = session_entries(load_har(sys.argv[1] if len(sys.argv) > 1 else HAR_FILE))
+    print(f"{len(entries)} recorded session responses")
+
+    for count in SESSION_COUNTS:
+        bodies = [sessions_body(entry, count) for entry in entries]
+        size = sum(map(len, bodies)) // len(bodies)
+        label = "recorded" if count is None else f"{count} sessions"
+        print(f"\n{label} (avg {size} bytes)")
+
+        number = max(1, 2000 // (count or 1))
+        for name, decode in CASES.items():
+            seconds = min(timeit.repeat(lambda: [decode(body) for body in bodies], number=number, repeat=3))
+            print(f"  {name:<45} {seconds / number / len(bodies) * 1e6:10.1f} us/response")
+
+
+if __name__ == "__main__":
+    main()
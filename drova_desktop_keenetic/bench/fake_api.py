@@ -0,0 +1,303 @@
+"""Local stand-in for services.drova.io with latency and fault injection.
+
+Serves ``/session-manager/sessions`` and ``/server-manager/product/get/{id}``
+from scripted session timelines or from the recorded ``drova_har_reg_file.txt``.
+Point the workers at it with ``DROVA_API_URL=http://127.0.0.1:<port>``.
+
+    python -m drova_desktop_keenetic.bench.fake_api --port 8085 --latency lognormal:0.08:0.5 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+from uuid import UUID
+
+from aiohttp import web
+
+from drova_desktop_keenetic.common.drova import UUID_DESKTOP, StatusEnum
+from drova_desktop_keenetic.common.fleet_poller import TokenBucket
+from drova_desktop_keenetic.common.har import (
+    HarEntry,
+    session_entries,
+    sessions_body,
+    synthesize_session,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER = "default"
+
+
+@dataclass(frozen=True)
+class TimelineStep:
+    status: StatusEnum | None  # None — the server has no sessions yet
+    duration: float
+    product_id: UUID = UUID_DESKTOP
+
+
+class SessionTimeline:
+    """Session history of one server, advanced by wall-clock time since the first request."""
+
+    def __init__(self, steps: list[TimelineStep], server_id: str = DEFAULT_SERVER, repeat: bool = True):
+        assert steps
+        self.steps = steps
+        self.server_id = server_id
+        self.repeat = repeat
+        self.started: float | None = None
+
+    @classmethod
+    def default(cls, server_id: str = DEFAULT_SERVER) -> "SessionTimeline":
+        return cls(
+            [
+                TimelineStep(StatusEnum.FINISHED, 5),
+                TimelineStep(StatusEnum.NEW, 2),
+                TimelineStep(StatusEnum.HANDSHAKE, 2),
+                TimelineStep(StatusEnum.ACTIVE, 60),
+            ],
+            server_id,
+        )
+
+    @classmethod
+    def from_json(cls, raw: list[dict], server_id: str = DEFAULT_SERVER) -> "SessionTimeline":
+        return cls(
+            [
+                TimelineStep(
+                    status=StatusEnum(step["status"]) if step.get("status") else None,
+                    duration=step["duration"],
+                    product_id=UUID(step.get("product_id", str(UUID_DESKTOP))),
+                )
+                for step in raw
+            ],
+            server_id,
+        )
+
+    def sessions(self, now: float) -> list[dict]:
+        if self.started is None:
+            self.started = now
+        elapsed = now - self.started
+        cycle = sum(step.duration for step in self.steps)
+
+        # every pass through the script is a new session uuid
+        passes = int(elapsed // cycle) if self.repeat and cycle else 0
+        elapsed = elapsed - passes * cycle if self.repeat and cycle else elapsed
+
+        current = self.steps[-1]
+        for step in self.steps:
+            if elapsed < step.duration:
+                current = step
+                break
+            elapsed -= step.duration
+
+        if current.status is None:
+            return []
+        return [synthesize_session(self.server_id, current.status, current.product_id, index=passes)]
+
+
+@dataclass
+class LatencyModel:
+    kind: str = "fixed"  # fixed | uniform | normal | lognormal | replay
+    a: float = 0.0
+    b: float = 0.0
+    samples: list[float] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """``fixed:0.05``, ``uniform:0.01:0.2``, ``normal:mean:stddev``, ``lognormal:median:sigma``."""
+        kind, *params = spec.split(":")
+        values = [float(param) for param in params] + [0.0, 0.0]
+        return cls(kind=kind, a=values[0], b=values[1])
+
+    def sample(self) -> float:
+        match self.kind:
+            case "uniform":
+                value = random.uniform(self.a, self.b)
+            case "normal":
+                value = random.gauss(self.a, self.b)
+            case "lognormal":
+                value = self.a * random.lognormvariate(0, self.b)
+            case "replay":
+                value = random.choice(self.samples) if self.samples else 0.0
+            case _:
+                value = self.a
+        return max(value, 0.0)
+
+
+@dataclass
+class FaultConfig:
+    error_rate: float = 0.0  # share of requests answered with 5xx
+    unauthorized_rate: float = 0.0  # share of requests answered with 401
+    rate_limit: float | None = None  # requests/sec over all clients before 429
+    rate_burst: int = 10
+    invalid_tokens: set[str] = field(default_factory=set)
+
+
+class FakeDrovaApi:
+    logger = logger.getChild("FakeDrovaApi")
+
+    def __init__(
+        self,
+        timelines: dict[str, SessionTimeline] | None = None,
+        har_entries: list[HarEntry] | None = None,
+        latency: LatencyModel | None = None,
+        faults: FaultConfig | None = None,
+    ):
+        self.timelines = timelines or {}
+        self.har_entries = session_entries(har_entries or [])
+        self.latency = latency or LatencyModel()
+        self.faults = faults or FaultConfig()
+
+        self.stats: Counter[str] = Counter()
+        self._bucket = TokenBucket(self.faults.rate_limit, self.faults.rate_burst) if self.faults.rate_limit else None
+        self._har_index = 0
+
+        self.app = web.Application(middlewares=[self._inject_faults])
+        self.app.router.add_get("/session-manager/sessions", self.handle_sessions)
+        self.app.router.add_get("/server-manager/product/get/{product_id}", self.handle_product)
+
+        self._runner: web.AppRunner | None = None
+        self.base_url: str | None = None
+
+    @web.middleware
+    async def _inject_faults(self, request: web.Request, handler):
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.latency.sample())
+
+        if self._bucket is not None and not self._bucket.try_acquire():
+            self.stats["429"] += 1
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+        if request.headers.get("X-Auth-Token") in self.faults.invalid_tokens:
+            self.stats["401"] += 1
+            return web.json_response({"error": "unauthorized"}, status=401)
+        if random.random() < self.faults.unauthorized_rate:
+            self.stats["401"] += 1
+            return web.json_response({"error": "unauthorized"}, status=401)
+        if random.random() < self.faults.error_rate:
+            self.stats["5xx"] += 1
+            return web.json_response({"error": "injected"}, status=random.choice((500, 502, 503)))
+
+        return await handler(request)
+
+    async def _server_id(self, request: web.Request) -> str:
+        # drova.py sends the id as a form body on GET; the web UI uses ?server_id=
+        if server_id := request.query.get("server_id"):
+            return server_id
+        if request.can_read_body:
+            # aiohttp's request.post() ignores bodies of GET requests
+            form = parse_qs((await request.read()).decode())
+            if ids := form.get("serveri_id"):
+                return ids[0]
+        return DEFAULT_SERVER
+
+    async def handle_sessions(self, request: web.Request) -> web.Response:
+        server_id = await self._server_id(request)
+        self.stats["sessions"] += 1
+
+        if server_id not in self.timelines and self.har_entries:
+            entry = self.har_entries[self._har_index % len(self.har_entries)]
+            self._har_index += 1
+            return web.Response(body=sessions_body(entry), content_type="application/json")
+
+        timeline = self.timelines.get(server_id) or self.timelines.setdefault(
+            server_id, SessionTimeline.default(server_id)
+        )
+        sessions = timeline.sessions(time.monotonic())
+        if states := request.query.getall("state", []):
+            sessions = [session for session in sessions if session["status"] in states]
+        return web.json_response({"sessions": sessions})
+
+    async def handle_product(self, request: web.Request) -> web.Response:
+        product_id = request.match_info["product_id"]
+        self.stats["product"] += 1
+        is_desktop = product_id == str(UUID_DESKTOP)
+        return web.json_response(
+            {
+                "product_id": product_id,
+                "game_path": r"C:\Windows\explorer.exe" if is_desktop else r"C:\Games\game.exe",
+                "work_path": r"C:\Windows" if is_desktop else r"C:\Games",
+                "args": "",
+                "use_default_desktop": is_desktop,
+                "title": "Desktop" if is_desktop else f"Game {product_id[:8]}",
+            }
+        )
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_host, bound_port = self._runner.addresses[0][:2]
+        self.base_url = f"http://{bound_host}:{bound_port}"
+        self.logger.info("serving on %s", self.base_url)
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeDrovaApi":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+def main() -> None:
+    from drova_desktop_keenetic.common.har import HAR_FILE, load_har
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    parser.add_argument("--timelines", help='JSON file: {"<server_id>": [{"status": "NEW", "duration": 2}, ...]}')
+    parser.add_argument("--har", nargs="?", const=str(HAR_FILE), help="replay recorded session responses")
+    parser.add_argument(
+        "--latency", default="fixed:0", help="fixed:S | uniform:A:B | normal:M:SD | lognormal:MED:SIGMA"
+    )
+    parser.add_argument("--replay-latency", action="store_true", help="sample latency from the HAR timings")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    timelines = {}
+    if args.timelines:
+        with open(args.timelines) as f:
+            timelines = {
+                server_id: SessionTimeline.from_json(steps, server_id) for server_id, steps in json.load(f).items()
+            }
+
+    har_entries = load_har(args.har) if args.har else []
+    latency = LatencyModel.parse(args.latency)
+    if args.replay_latency:
+        recorded = session_entries(har_entries or load_har(HAR_FILE))
+        latency = LatencyModel(kind="replay", samples=[entry.wait for entry in recorded])
+
+    api = FakeDrovaApi(
+        timelines=timelines,
+        har_entries=har_entries,
+        latency=latency,
+        faults=FaultConfig(
+            error_rate=args.error_rate, unauthorized_rate=args.unauthorized_rate, rate_limit=args.rate_limit
+        ),
+    )
+
+    async def serve() -> None:
+        await api.start(args.host, args.port)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await api.stop()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
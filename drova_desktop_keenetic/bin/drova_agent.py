@@ -0,0 +1,41 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from drova_desktop_keenetic.common.agent_server import AgentServer, LocalWindowsSource
+from drova_desktop_keenetic.common.contants import (
+    DROVA_AGENT_LISTEN,
+    DROVA_AGENT_TOKEN,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _publish_stdin(server: AgentServer) -> None:
+    """Stand-in source off Windows: every stdin line is one protocol message to publish."""
+    while line := await asyncio.to_thread(sys.stdin.readline):
+        if not line.strip():
+            continue
+        try:
+            await server.publish(json.loads(line))
+        except (ValueError, KeyError, TypeError):
+            logger.warning("bad message: %r", line)
+
+
+async def _main() -> None:
+    # the LAN address the router reaches the host on, e.g. 192.168.0.10:7989 — never all interfaces by default
+    async with AgentServer(os.environ[DROVA_AGENT_LISTEN], os.environ[DROVA_AGENT_TOKEN]) as server:
+        if sys.platform == "win32":
+            await LocalWindowsSource(server).run()
+        else:
+            await _publish_stdin(server)
+
+
+def run_async_main():
+    asyncio.run(_main())
+
+
+if __name__ == "__main__":
+    run_async_main()
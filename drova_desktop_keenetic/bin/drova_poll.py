@@ -2,8 +2,15 @@ import asyncio
 import json
 import os
 
-from drova_desktop_keenetic.common.contants import DROVA_CONFIG, SHADOW_DEFENDER_DRIVES, SHADOW_DEFENDER_PASSWORD
+from drova_desktop_keenetic.common.contants import (
+    DROVA_CONFIG,
+    SHADOW_DEFENDER_DRIVES,
+    SHADOW_DEFENDER_PASSWORD,
+)
+from drova_desktop_keenetic.common.drova import close_api_client
 from drova_desktop_keenetic.common.drova_poll import DrovaPoll
+from drova_desktop_keenetic.common.fleet_poller import DEFAULT_RATE, FleetSessionPoller
+from drova_desktop_keenetic.common.metrics import MetricsExporter
 
 
 def _load_config(path: str) -> dict:
@@ -19,23 +26,43 @@ async def _run_multihost(config: dict) -> None:
     if sd_drives := defaults.get("shadow_defender_drives"):
         os.environ.setdefault(SHADOW_DEFENDER_DRIVES, sd_drives)
 
-    workers = [
-        DrovaPoll(
-            windows_host=host["host"],
-            windows_login=host.get("login", defaults.get("login")),
-            windows_password=host.get("password", defaults.get("password")),
-        ).serve(wait_forever=True)
-        for host in config["hosts"]
-    ]
-    await asyncio.gather(*workers)
+    poller_config = config.get("poller", {})
+    async with FleetSessionPoller(
+        rate=poller_config.get("rate", DEFAULT_RATE),
+        # unset: sized from the number of hosts
+        burst=poller_config.get("burst"),
+        jitter=poller_config.get("jitter", 0.5),
+        hosts=len(config["hosts"]),
+    ) as fleet_poller:
+        workers = [
+            DrovaPoll(
+                windows_host=host["host"],
+                windows_login=host.get("login", defaults.get("login")),
+                windows_password=host.get("password", defaults.get("password")),
+                fleet_poller=fleet_poller,
+                agent_port=host.get("agent_port", defaults.get("agent_port")),
+                agent_token=host.get("agent_token", defaults.get("agent_token")),
+            ).serve(wait_forever=True)
+            for host in config["hosts"]
+        ]
+        await asyncio.gather(*workers)
+
+
+async def _main() -> None:
+    exporter = MetricsExporter.from_env()
+    await exporter.start()
+    try:
+        if DROVA_CONFIG in os.environ:
+            await _run_multihost(_load_config(os.environ[DROVA_CONFIG]))
+        else:
+            await DrovaPoll().serve(True)
+    finally:
+        await exporter.stop()
+        await close_api_client()
 
 
 def run_async_main():
-    if DROVA_CONFIG in os.environ:
-        config = _load_config(os.environ[DROVA_CONFIG])
-        asyncio.run(_run_multihost(config))
-    else:
-        asyncio.run(DrovaPoll().serve(True))
+    asyncio.run(_main())
 
 
 if __name__ == "__main__":
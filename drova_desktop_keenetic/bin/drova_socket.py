@@ -4,14 +4,26 @@ from logging import warning
 from logging.handlers import RotatingFileHandler
 
 from drova_desktop_keenetic.common.contants import DROVA_SOCKET_LISTEN
+from drova_desktop_keenetic.common.drova import close_api_client
 from drova_desktop_keenetic.common.drova_socket import DrovaSocket
+from drova_desktop_keenetic.common.metrics import MetricsExporter
 
 assert DROVA_SOCKET_LISTEN in os.environ, "Need socket listening"
 
 
+async def _main() -> None:
+    exporter = MetricsExporter.from_env()
+    await exporter.start()
+    try:
+        await DrovaSocket().serve(True)
+    finally:
+        await exporter.stop()
+        await close_api_client()
+
+
 def run_async_main():
     warning("Is DEPRECATED!")
-    asyncio.run(DrovaSocket().serve(True))
+    asyncio.run(_main())
 
 
 if __name__ == "__main__":
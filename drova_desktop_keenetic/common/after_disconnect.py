@@ -1,10 +1,9 @@
 import logging
 import os
-from asyncio import sleep
 
 from asyncssh import SSHClientConnection
 
-from drova_desktop_keenetic.common.commands import ShadowDefenderCLI
+from drova_desktop_keenetic.common.commands import ShadowDefenderCLI, run_command
 from drova_desktop_keenetic.common.contants import (
     SHADOW_DEFENDER_DRIVES,
     SHADOW_DEFENDER_PASSWORD,
@@ -21,16 +20,15 @@ class AfterDisconnect:
 
     async def run(self) -> bool:
         self.logger.info("after_disconnect: SD exit+reboot")
-        await sleep(5)
-        # exit shadow mode and reboot
-        await self.client.run(
-            str(
-                ShadowDefenderCLI(
-                    password=os.environ[SHADOW_DEFENDER_PASSWORD],
-                    actions=["exit", "reboot"],
-                    drives=os.environ[SHADOW_DEFENDER_DRIVES],
-                )
-            )
+        # exit shadow mode and reboot — nothing to wait for first: the reboot discards the
+        # session's writes whatever state the drives are in
+        await run_command(
+            self.client,
+            ShadowDefenderCLI(
+                password=os.environ[SHADOW_DEFENDER_PASSWORD],
+                actions=["exit", "reboot"],
+                drives=os.environ[SHADOW_DEFENDER_DRIVES],
+            ),
         )
 
         return True
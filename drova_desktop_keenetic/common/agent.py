@@ -0,0 +1,274 @@
+"""Optional push channel from a small agent running on the Windows host.
+
+A subscriber opens a TCP connection and sends one line, a hello with the token
+shared with the agent; the agent hangs up on a wrong one. Otherwise it keeps the
+connection and writes newline-delimited JSON: a ``snapshot`` of everything it
+tracks, then one message per change::
+
+    {"type": "hello", "token": "<shared token>"}            # subscriber -> agent
+
+    {"type": "snapshot", "host": "gamepc", "parts": ["processes", "registry", "sessions", "shadow"],
+     "sessions": {"2": "Active"}, "processes": ["steam.exe"], "shadow": {"C": true},
+     "registry": {"HKEY_LOCAL_MACHINE\\...\\servers": "<digest>"}}
+    {"type": "parts", "parts": ["processes", "registry", "sessions"]}
+    {"type": "session", "id": 2, "state": "Disc"}           # "Gone" once the session is logged off
+    {"type": "process", "image": "steam.exe", "running": false}
+    {"type": "shadow", "drive": "C", "protected": true}
+    {"type": "registry", "key": "HKEY_LOCAL_MACHINE\\...\\servers", "digest": "<digest>"}
+    {"type": "ping"}
+
+``parts`` lists what the agent actually observes — the reference agent only
+reports ``sessions`` and ``registry`` — and is re-sent whenever that changes; a
+change message implies its part. Nothing else is sent back. When no agent listens,
+or it doesn't observe what a helper waits for, the helpers poll over SSH as before.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+AGENT_PORT = 7989
+
+# Drova's server registrations; a change here means the auth tokens changed
+ESME_SERVERS_KEY = r"HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers"
+
+Message = dict[str, Any]
+
+
+class AgentUnavailable(RuntimeError): ...
+
+
+@dataclass
+class AgentState:
+    """What the agent last reported; the client's copy follows the agent's one message at a time."""
+
+    sessions: dict[int, str] = field(default_factory=dict)  # session id -> Active/Disc/...
+    processes: set[str] = field(default_factory=set)  # lower-cased image names
+    shadow: dict[str, bool] = field(default_factory=dict)  # drive letter -> protected
+    registry: dict[str, str] = field(default_factory=dict)  # upper-cased key -> digest of its content
+    parts: set[str] = field(default_factory=set)  # which of the above the agent observes
+
+    def snapshot(self) -> Message:
+        return {
+            "type": "snapshot",
+            "parts": sorted(self.parts),
+            "sessions": {str(session_id): state for session_id, state in self.sessions.items()},
+            "processes": sorted(self.processes),
+            "shadow": dict(self.shadow),
+            "registry": dict(self.registry),
+        }
+
+    def apply(self, message: Message) -> bool:
+        """Update from one message; False if it changed nothing."""
+        match message.get("type"):
+            case "snapshot":
+                previous = self.snapshot()
+                self.sessions = {int(session_id): state for session_id, state in message["sessions"].items()}
+                self.processes = {image.lower() for image in message["processes"]}
+                self.shadow = {drive.upper(): protected for drive, protected in message["shadow"].items()}
+                self.registry = {key.upper(): digest for key, digest in message["registry"].items()}
+                # an agent that doesn't announce its parts is trusted with none of them
+                self.parts = set(message.get("parts", ()))
+                return self.snapshot() != previous
+            case "parts":
+                changed = self.parts != set(message["parts"])
+                self.parts = set(message["parts"])
+                return changed
+            case "session":
+                self.parts.add("sessions")
+                session_id, state = int(message["id"]), message["state"]
+                if state == "Gone":
+                    return self.sessions.pop(session_id, None) is not None
+                changed = self.sessions.get(session_id) != state
+                self.sessions[session_id] = state
+                return changed
+            case "process":
+                self.parts.add("processes")
+                image = message["image"].lower()
+                if message["running"]:
+                    changed = image not in self.processes
+                    self.processes.add(image)
+                else:
+                    changed = image in self.processes
+                    self.processes.discard(image)
+                return changed
+            case "shadow":
+                self.parts.add("shadow")
+                drive = message["drive"].upper()
+                changed = self.shadow.get(drive) != message["protected"]
+                self.shadow[drive] = message["protected"]
+                return changed
+            case "registry":
+                self.parts.add("registry")
+                key = message["key"].upper()
+                changed = self.registry.get(key) != message["digest"]
+                self.registry[key] = message["digest"]
+                return changed
+        return False
+
+    def diff(self, observed: "AgentState") -> list[Message]:
+        """Messages that turn this state into ``observed``, limited to the parts ``observed`` covers."""
+        parts = observed.parts
+        messages: list[Message] = []
+        if parts != self.parts:
+            messages.append({"type": "parts", "parts": sorted(parts)})
+        if "sessions" in parts:
+            for session_id in self.sessions.keys() - observed.sessions.keys():
+                messages.append({"type": "session", "id": session_id, "state": "Gone"})
+            for session_id, state in observed.sessions.items():
+                if self.sessions.get(session_id) != state:
+                    messages.append({"type": "session", "id": session_id, "state": state})
+        if "processes" in parts:
+            for image in sorted(observed.processes - self.processes):
+                messages.append({"type": "process", "image": image, "running": True})
+            for image in sorted(self.processes - observed.processes):
+                messages.append({"type": "process", "image": image, "running": False})
+        if "shadow" in parts:
+            for drive, protected in observed.shadow.items():
+                if self.shadow.get(drive) != protected:
+                    messages.append({"type": "shadow", "drive": drive, "protected": protected})
+        if "registry" in parts:
+            for key, digest in observed.registry.items():
+                if self.registry.get(key) != digest:
+                    messages.append({"type": "registry", "key": key, "digest": digest})
+        return messages
+
+
+def encode_message(message: Message) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class AgentClient:
+    """Subscribes to a host's agent and keeps ``state`` current.
+
+    ``start()`` connects in the background and reconnects every ``retry_interval``;
+    while nothing is connected ``available`` is False and the callers poll over SSH.
+    """
+
+    logger = logger.getChild("AgentClient")
+
+    def __init__(
+        self,
+        host: str,
+        port: int = AGENT_PORT,
+        token: str = "",
+        connect_timeout: float = 1.0,
+        retry_interval: float = 30.0,
+        stale_after: float = 15.0,
+    ):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.connect_timeout = connect_timeout
+        self.retry_interval = retry_interval
+        # the agent pings every few seconds — silence longer than this means a dead link
+        self.stale_after = stale_after
+
+        self.state = AgentState()
+        self.messages = 0
+
+        self._connected = False
+        self._changed = asyncio.Event()
+        self._listeners: list[Callable[[Message], None]] = []
+        self._task: asyncio.Task | None = None
+
+    @property
+    def available(self) -> bool:
+        return self._connected
+
+    def add_listener(self, listener: Callable[[Message], None]) -> None:
+        """Called with every message that changed ``state``."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Message], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        # wake every waiter; they re-check their predicate against the new state
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def connect(self) -> bool:
+        """One connection attempt; reads until the link drops. False if no agent answered with a snapshot."""
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+
+        subscribed = False
+        try:
+            writer.write(encode_message({"type": "hello", "token": self.token}))
+            line = await asyncio.wait_for(reader.readline(), self.connect_timeout)
+            snapshot = json.loads(line) if line else {}
+            if snapshot.get("type") != "snapshot":
+                self.logger.warning("%s:%d sent no snapshot — wrong agent token?", self.host, self.port)
+                return False
+
+            self.state = AgentState()
+            self.state.apply(snapshot)
+            self._connected = subscribed = True
+            self.logger.info("%s: agent connected", self.host)
+            self._notify()
+
+            while line := await asyncio.wait_for(reader.readline(), self.stale_after):
+                message = json.loads(line)
+                self.messages += 1
+                if self.state.apply(message):
+                    for listener in list(self._listeners):
+                        listener(message)
+                    self._notify()
+        except (OSError, ValueError, asyncio.TimeoutError):
+            self.logger.debug("%s: agent link lost", self.host, exc_info=True)
+        finally:
+            writer.close()
+            if self._connected:
+                self._connected = False
+                self.logger.info("%s: agent disconnected — polling over SSH", self.host)
+                self._notify()
+        return subscribed
+
+    async def _run(self) -> None:
+        while True:
+            await self.connect()
+            await asyncio.sleep(self.retry_interval)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"agent_client:{self.host}")
+
+    async def wait_until(
+        self,
+        predicate: Callable[[AgentState], bool],
+        timeout: float | None = None,
+        covers: Callable[[AgentState], bool] | None = None,
+    ) -> None:
+        """Return once ``predicate(state)`` holds; asyncio.TimeoutError after ``timeout``.
+
+        Raises AgentUnavailable if there is (or stops being) no agent, or if ``covers(state)``
+        says the agent doesn't observe what the predicate looks at — the caller falls back to polling.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            if not self._connected:
+                raise AgentUnavailable(f"{self.host}: no agent")
+            if covers is not None and not covers(self.state):
+                raise AgentUnavailable(f"{self.host}: agent doesn't observe this")
+            if predicate(self.state):
+                return
+            changed = self._changed
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.wait_for(changed.wait(), remaining)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,187 @@
+"""Reference implementation of the host agent (see ``agent`` for the protocol).
+
+On Windows ``LocalWindowsSource`` runs ``qwinsta`` and ``reg query`` locally
+every few seconds and publishes only the differences. Anywhere else the server
+can be fed messages directly, which makes it a stand-in for tests and local runs.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import socket
+
+from drova_desktop_keenetic.common.agent import (
+    ESME_SERVERS_KEY,
+    AgentState,
+    Message,
+    encode_message,
+)
+from drova_desktop_keenetic.common.commands import QWinSta, RegQuery
+from drova_desktop_keenetic.common.parsers import parse_qwinsta
+
+logger = logging.getLogger(__name__)
+
+
+class AgentServer:
+    """Serves the agent protocol on ``listen`` (``address:port`` of one interface) to subscribers that know ``token``."""
+
+    logger = logger.getChild("AgentServer")
+
+    def __init__(self, listen: str, token: str, ping_interval: float = 5.0, write_timeout: float = 5.0):
+        host, _, port = listen.rpartition(":")
+        if not host:
+            raise ValueError(f"agent: listen {listen!r} names no interface address")
+        if not token:
+            raise ValueError("agent: a shared token is required")
+        self.listen_host = host
+        self.port = int(port)
+        self.token = token
+        self.ping_interval = ping_interval
+        self.write_timeout = write_timeout
+        self.host_name = socket.gethostname()
+
+        self.state = AgentState()
+        self._subscribers: set[asyncio.StreamWriter] = set()
+        self._server: asyncio.Server | None = None
+        self._ping_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.listen_host, self.port)
+        # port 0 asks the OS for a free one
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ping_task = asyncio.create_task(self._ping_loop())
+        self.logger.info("listening on %s:%d", self.listen_host, self.port)
+
+    def _authorized(self, line: bytes) -> bool:
+        try:
+            hello = json.loads(line)
+        except ValueError:
+            return False
+        if not isinstance(hello, dict) or hello.get("type") != "hello":
+            return False
+        return hmac.compare_digest(str(hello.get("token", "")).encode(), self.token.encode())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        try:
+            if not self._authorized(await asyncio.wait_for(reader.readline(), self.write_timeout)):
+                self.logger.warning("subscriber %s rejected: no valid hello", peer)
+                return
+            self.logger.info("subscriber %s connected", peer)
+            # queued and registered in one step: whatever is published while the snapshot drains follows it
+            writer.write(encode_message(self.state.snapshot() | {"host": self.host_name}))
+            self._subscribers.add(writer)
+            await writer.drain()
+            # nothing more comes from subscribers; EOF means they left
+            while await reader.read(4096):
+                pass
+        except (OSError, ValueError, asyncio.TimeoutError):
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+            self.logger.info("subscriber %s gone", peer)
+
+    async def _send(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        try:
+            writer.write(data)
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except (OSError, asyncio.TimeoutError):
+            # a stuck subscriber must not hold back the others
+            self._subscribers.discard(writer)
+            writer.close()
+
+    async def _broadcast(self, data: bytes) -> None:
+        await asyncio.gather(*(self._send(writer, data) for writer in list(self._subscribers)))
+
+    async def publish(self, *messages: Message) -> int:
+        """Apply ``messages`` to the state and push the ones that changed it; returns how many were pushed."""
+        changed = [message for message in messages if self.state.apply(message)]
+        if changed:
+            await self._broadcast(b"".join(encode_message(message) for message in changed))
+        return len(changed)
+
+    async def update(self, observed: AgentState) -> int:
+        """Publish whatever differs between the current state and a fresh observation."""
+        return await self.publish(*self.state.diff(observed))
+
+    async def _ping_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await self._broadcast(encode_message({"type": "ping"}))
+
+    async def stop(self) -> None:
+        if self._ping_task is not None:
+            self._ping_task.cancel()
+            await asyncio.gather(self._ping_task, return_exceptions=True)
+            self._ping_task = None
+        for writer in list(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "AgentServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+class LocalWindowsSource:
+    """Observes the local Windows host every ``interval`` and feeds changes to an ``AgentServer``.
+
+    Only Windows sessions and the registry keys are observed — changes the poller can act
+    on seconds later. Processes and Shadow Defender are left to SSH polling, which runs only
+    while a setup waits on them: watching them here would mean spawning ``tasklist`` several
+    times a second, and ``CmdTool.exe`` with the Shadow Defender password on its command line.
+    """
+
+    logger = logger.getChild("LocalWindowsSource")
+
+    def __init__(
+        self,
+        server: AgentServer,
+        interval: float = 5.0,
+        registry_keys: tuple[str, ...] = (ESME_SERVERS_KEY,),
+    ):
+        self.server = server
+        self.interval = interval
+        self.registry_keys = registry_keys
+
+    async def _output(self, command: str) -> bytes | None:
+        process = await asyncio.create_subprocess_shell(
+            command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+        return stdout if process.returncode == 0 else None
+
+    async def observe(self) -> AgentState:
+        """A fresh state; ``parts`` says which of it could be observed this time."""
+        observed = AgentState()
+
+        if (output := await self._output(str(QWinSta()))) is not None:
+            observed.sessions = {station.id: station.state for station in parse_qwinsta(output)}
+            observed.parts.add("sessions")
+
+        registry = await asyncio.gather(
+            *(self._output(str(RegQuery(key, recursive=True))) for key in self.registry_keys)
+        )
+        for key, output in zip(self.registry_keys, registry):
+            # a missing key has a digest too — its disappearance is a change
+            observed.registry[key.upper()] = hashlib.sha256(output or b"").hexdigest()
+        observed.parts.add("registry")
+        return observed
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.server.update(await self.observe())
+            except Exception:
+                self.logger.warning("observation failed", exc_info=True)
+            await asyncio.sleep(self.interval)
@@ -1,15 +1,22 @@
 import logging
 import os
-from asyncio import sleep
 
 from asyncssh import SSHClientConnection
 
-from drova_desktop_keenetic.common.commands import ShadowDefenderCLI, TaskKill
+from drova_desktop_keenetic.common.agent import AgentClient
+from drova_desktop_keenetic.common.commands import ShadowDefenderCLI, run_command
 from drova_desktop_keenetic.common.contants import (
     SHADOW_DEFENDER_DRIVES,
     SHADOW_DEFENDER_PASSWORD,
 )
-from drova_desktop_keenetic.common.patch import ALL_PATCHES
+from drova_desktop_keenetic.common.metrics import BEFORE_CONNECT_SECONDS
+from drova_desktop_keenetic.common.patch_scheduler import PatchScheduler
+from drova_desktop_keenetic.common.patch_state import get_patch_state
+from drova_desktop_keenetic.common.powershell import persistent_shell
+from drova_desktop_keenetic.common.readiness import (
+    ShadowModeTimeout,
+    wait_for_shadow_mode,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -17,35 +24,42 @@ logger = logging.getLogger(__name__)
 class BeforeConnect:
     logger = logger.getChild("BeforeConnect")
 
-    def __init__(self, client: SSHClientConnection):
+    def __init__(self, client: SSHClientConnection, host: str | None = None, agent: AgentClient | None = None):
         self.client = client
+        self.agent = agent
+        # without a host there is nothing to key remembered file state by — every file is patched
+        self.state = get_patch_state().for_host(host) if host is not None else None
 
     async def run(self) -> bool:
+        """Enter shadow mode and patch; False if shadow mode wasn't confirmed — the host must not be handed out.
+
+        SSH/SFTP and shell errors propagate, so the caller retries them rather than rebooting the host.
+        """
         self.logger.info("before_connect: start")
+        protected = False
         try:
-            async with self.client.start_sftp_client() as sftp:
-                await self.client.run(
-                    str(
+            with BEFORE_CONNECT_SECONDS.time():
+                async with persistent_shell(self.client) as shell, self.client.start_sftp_client() as sftp:
+                    await run_command(
+                        shell,
                         ShadowDefenderCLI(
                             password=os.environ[SHADOW_DEFENDER_PASSWORD],
                             actions=["enter"],
                             drives=os.environ[SHADOW_DEFENDER_DRIVES],
-                        )
+                        ),
+                    )
+                    # raises if shadow mode doesn't come up — never patch the real disk
+                    await wait_for_shadow_mode(
+                        shell, os.environ[SHADOW_DEFENDER_DRIVES], protected=True, agent=self.agent
                     )
-                )
-                await sleep(2)
-
-                for path in ALL_PATCHES:
-                    if path.TASKKILL_IMAGE:
-                        await self.client.run(str(TaskKill(image=path.TASKKILL_IMAGE)))
-                    await sleep(0.2)
-                    try:
-                        await path(self.client, sftp).patch()
-                    except Exception:
-                        self.logger.warning("patch %s: FAILED — skipped", path.NAME, exc_info=True)
-
-        except Exception:
-            self.logger.exception("before_connect: error")
-
-        self.logger.info("before_connect: done")
-        return True
+                    protected = True
+
+                    results = await PatchScheduler(shell, sftp, state=self.state, agent=self.agent).run()
+                    if failed := [result.name for result in results if not result.ok]:
+                        self.logger.warning("patches failed — skipped: %s", ", ".join(failed))
+
+        except ShadowModeTimeout as e:
+            self.logger.error("before_connect: %s", e)
+
+        self.logger.info("before_connect: done, protected=%s", protected)
+        return protected
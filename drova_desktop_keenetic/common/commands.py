@@ -1,13 +1,23 @@
 import os
-import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import StrEnum
-from typing import Literal
+from typing import Any, ClassVar, Literal, Protocol
 
+from asyncssh import SSHCompletedProcess
 from mslex import quote
 
 from drova_desktop_keenetic.common.contants import WINDOWS_LOGIN, WINDOWS_PASSWORD
+from drova_desktop_keenetic.common.metrics import COMMAND_SECONDS
+from drova_desktop_keenetic.common.parsers import (
+    parse_active_session_id,
+    parse_auth_tokens,
+    parse_psexec_exit_code,
+    parse_reg_query,
+    parse_reg_values,
+    parse_shadow_status,
+    parse_tasklist_images,
+)
 
 
 class PsExecNotFoundExecutable(RuntimeError): ...
@@ -21,6 +31,8 @@ class DuplicateAuthCode(RuntimeError): ...
 
 @dataclass(kw_only=True)
 class ICommandBuilder(ABC):
+    # output is parsed at byte level: run without decoding (``encoding=None``)
+    RAW_OUTPUT: ClassVar[bool] = False
 
     @abstractmethod
     def _build_command(self) -> str: ...
@@ -29,8 +41,30 @@ class ICommandBuilder(ABC):
         return self._build_command()
 
 
+class CommandRunner(Protocol):
+    """Anything ``run_command`` can send a command line to.
+
+    An ``SSHClientConnection``, a ``PowerShellExecutor`` or an ``SSHConnectionManager``.
+    """
+
+    async def run(self, command: str, **kwargs: Any) -> SSHCompletedProcess: ...
+
+
+async def run_command(client: CommandRunner, command: ICommandBuilder, **kwargs) -> SSHCompletedProcess:
+    """``client.run(str(command))`` timed per builder class in ``drova_command_seconds``.
+
+    Builders with ``RAW_OUTPUT`` get ``bytes`` stdout/stderr unless the caller sets ``encoding``.
+    """
+    if command.RAW_OUTPUT:
+        kwargs.setdefault("encoding", None)
+    with COMMAND_SECONDS.labels(command=type(command).__name__).time():
+        return await client.run(str(command), **kwargs)
+
+
 @dataclass
 class PsExec(ICommandBuilder):
+    RAW_OUTPUT = True
+
     command: ICommandBuilder | str = ""
     interactive: int | None = field(kw_only=True, default=1)
     accepteula: bool = True
@@ -60,24 +94,18 @@ class PsExec(ICommandBuilder):
         return " ".join(command)
 
     @staticmethod
-    def parseStderrErrorCode(stderr: bytes) -> int:
-        last_line = b""
-        for line in stderr.split(b"\r\n"):
-            if line:
-                last_line = line
-
-        r = re.compile(r"(?P<executable>\S*) exited on (?P<hostname>\S*) with error code (?P<exit_code>\d+)\.")
-
-        if match := r.search(last_line.decode("windows-1251")):
-            return int(match.group("exit_code") + "0")
+    def parseStderrErrorCode(stderr: bytes | str | None) -> int:
+        if (exit_code := parse_psexec_exit_code(stderr)) is not None:
+            return exit_code
 
         raise PsExecNotFoundExecutable()
 
 
 @dataclass
 class TaskKill(ICommandBuilder):
-    image: str
+    image: str | None = None
     force: bool = True
+    images: tuple[str, ...] = ()  # more images killed by the same invocation
 
     def _build_command(self) -> str:
         command = ["taskkill.exe"]
@@ -85,11 +113,26 @@ class TaskKill(ICommandBuilder):
         if self.force:
             command += ["/f"]
 
-        command += ["/IM", self.image]
+        for image in (self.image, *self.images):
+            if image:
+                command += ["/IM", image]
 
         return " ".join(command)
 
 
+@dataclass
+class TaskList(ICommandBuilder):
+    RAW_OUTPUT = True
+
+    def _build_command(self) -> str:
+        return "tasklist /FO CSV /NH"
+
+    @staticmethod
+    def parse_images(stdout: bytes | str | None) -> set[str]:
+        """Lower-cased image names of running processes."""
+        return parse_tasklist_images(stdout)
+
+
 @dataclass
 class Steam(ICommandBuilder):
     def _build_command(self) -> str:
@@ -104,6 +147,8 @@ class EpicGamesLauncher(ICommandBuilder):
 
 @dataclass
 class ShadowDefenderCLI(ICommandBuilder):
+    RAW_OUTPUT = True
+
     password: str
     actions: list[Literal["enter", "exit", "reboot", "commit", "list"]]
     drives: str | None = None
@@ -133,63 +178,50 @@ class ShadowDefenderCLI(ICommandBuilder):
         command += ["/now"]
         return " ".join(command)
 
+    @staticmethod
+    def parse_status(stdout: bytes | str | None) -> dict[str, bool]:
+        """``/list`` output -> {drive letter: protected}, e.g. ``Drive C: Protected`` -> {"C": True}."""
+        return parse_shadow_status(stdout)
+
 
 @dataclass
 class RegQueryEsme(ICommandBuilder):
+    RAW_OUTPUT = True
+
     def _build_command(self) -> str:
         return " ".join(("reg", "query", r"HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers", "/s", "/f", "auth_token"))
 
     @staticmethod
-    def parseAllAuthCodes(stdout: bytes) -> list[tuple[str, str]]:
+    def parseAllAuthCodes(stdout: bytes | str | None) -> list[tuple[str, str]]:
         """Parse all (server_id, auth_token) pairs from registry output.
 
         Correctly pairs each server_id with its own auth_token even when
         multiple server registrations are present.
         """
-        text = stdout.decode("windows-1251")
-        r_pair = re.compile(
-            r"servers\\(?P<server_id>\S+)\s+auth_token\s+REG_SZ\s+(?P<auth_token>\S+)",
-            re.MULTILINE,
-        )
-        return [(m.group("server_id"), m.group("auth_token")) for m in r_pair.finditer(text)]
+        return parse_auth_tokens(stdout)
 
     @staticmethod
-    def parseAuthCode(stdout: bytes) -> tuple[str, str]:
-        r_auth_token = re.compile(r"auth_token\s+REG_SZ\s+(?P<auth_token>\S+)", re.MULTILINE)
-
-        r_servers = re.compile(r"servers\\(?P<server_id>\S+)", re.MULTILINE)
-
-        matches_auth_token = r_auth_token.findall(stdout.decode("windows-1251"))
-        if not matches_auth_token:
+    def parseAuthCode(stdout: bytes | str | None) -> tuple[str, str]:
+        pairs = parse_auth_tokens(stdout)
+        if not pairs:
             raise NotFoundAuthCode()
 
-        if len(matches_auth_token) > 1:
+        if len(pairs) > 1:
             raise DuplicateAuthCode()
 
-        matches_server_id = r_servers.search(stdout.decode("windows-1251"))
-        if not matches_server_id:
-            raise NotFoundAuthCode()
-
-        return matches_server_id["server_id"], matches_auth_token[0]
+        return pairs[0]
 
 
 @dataclass
 class QWinSta(ICommandBuilder):
+    RAW_OUTPUT = True
+
     def _build_command(self) -> str:
         return "qwinsta"
 
     @staticmethod
-    def parse_active_session_id(stdout: bytes | str) -> int | None:
-        if isinstance(stdout, bytes):
-            text = stdout.decode("windows-1251", errors="replace")
-        else:
-            text = stdout
-        # qwinsta output: "rdp-tcp#0  username  2  Active ..."
-        # Russian Windows uses "Активный" instead of "Active"
-        match = re.search(r"\s+(\d+)\s+(?:Active|Активный)\b", text, re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-        return None
+    def parse_active_session_id(stdout: bytes | str | None) -> int | None:
+        return parse_active_session_id(stdout)
 
 
 @dataclass
@@ -202,22 +234,30 @@ class RegDeleteKey(ICommandBuilder):
 
 @dataclass
 class RegQuery(ICommandBuilder):
+    RAW_OUTPUT = True
+
     reg_path: str
     value_name: str | None = None
+    recursive: bool = False
 
     def _build_command(self) -> str:
         args = ["reg", "query", quote(self.reg_path)]
         if self.value_name is not None:
             args += ["/v", quote(self.value_name)]
+        if self.recursive:
+            args += ["/s"]
         return " ".join(args)
 
     @staticmethod
-    def parse_value(stdout: str | bytes) -> str | None:
-        if isinstance(stdout, bytes):
-            stdout = stdout.decode("windows-1251")
-        r = re.compile(r"\s+\S+\s+REG_\w+\s+(?P<value>\S+)", re.MULTILINE)
-        if match := r.search(stdout):
-            return match.group("value")
+    def parse_values(stdout: bytes | str | None) -> dict[str, dict[str, tuple[str, str]]]:
+        """``{KEY: {value name: (REG_TYPE, data)}}`` for every key in the output; key and names upper-cased."""
+        return parse_reg_values(stdout)
+
+    @staticmethod
+    def parse_value(stdout: bytes | str | None) -> str | None:
+        for key in parse_reg_query(stdout):
+            if key.values:
+                return key.values[0].data
         return None
 
 
@@ -233,6 +273,14 @@ class RegValueType(StrEnum):
     REG_EXPAND_SZ = "REG_EXPAND_SZ"
 
 
+@dataclass
+class RegImport(ICommandBuilder):
+    reg_file: str
+
+    def _build_command(self) -> str:
+        return f"reg import {quote(self.reg_file)}"
+
+
 @dataclass
 class RegAdd(ICommandBuilder):
 
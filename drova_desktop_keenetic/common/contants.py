@@ -1,6 +1,15 @@
 DROVA_CONFIG = "DROVA_CONFIG"
+DROVA_API_URL = "DROVA_API_URL"
 
 DROVA_SOCKET_LISTEN = "DROVA_SOCKET_LISTEN"
+DROVA_PRODUCT_CACHE = "DROVA_PRODUCT_CACHE"
+DROVA_METRICS_LISTEN = "DROVA_METRICS_LISTEN"
+DROVA_METRICS_TEXTFILE = "DROVA_METRICS_TEXTFILE"
+DROVA_PATCH_CONCURRENCY = "DROVA_PATCH_CONCURRENCY"
+DROVA_STATE_DIR = "DROVA_STATE_DIR"
+DROVA_AGENT_PORT = "DROVA_AGENT_PORT"
+DROVA_AGENT_LISTEN = "DROVA_AGENT_LISTEN"
+DROVA_AGENT_TOKEN = "DROVA_AGENT_TOKEN"
 
 WINDOWS_HOST = "WINDOWS_HOST"
 WINDOWS_LOGIN = "WINDOWS_LOGIN"
@@ -1,18 +1,57 @@
+import asyncio
+import os
 from datetime import datetime
 from enum import StrEnum
 from ipaddress import IPv4Address
 from pathlib import PureWindowsPath
+from typing import Any, Awaitable, Callable, TypeVar, overload
 from urllib.parse import urlencode, urlparse, urlunparse
 from uuid import UUID
 
 import aiohttp
 from pydantic import BaseModel, ConfigDict
+from pydantic_core import from_json
 
-URL_SESSIONS = "https://services.drova.io/session-manager/sessions?"
-URL_PRODUCT = "https://services.drova.io/server-manager/product/get/{product_id}"
+from drova_desktop_keenetic.common.contants import DROVA_API_URL
+from drova_desktop_keenetic.common.metrics import API_CIRCUIT_OPEN, API_REQUEST_SECONDS
+from drova_desktop_keenetic.common.resilience import (
+    CircuitBreaker,
+    CircuitState,
+    RetryBudget,
+    RetryPolicy,
+    call_with_retry,
+)
+from drova_desktop_keenetic.common.singleflight import SingleFlight
+
+DEFAULT_API_URL = "https://services.drova.io"
+URL_SESSIONS = "{base_url}/session-manager/sessions?"
+URL_PRODUCT = "{base_url}/server-manager/product/get/{product_id}"
 UUID_DESKTOP = UUID("9fd0eb43-b2bb-4ce3-93b8-9df63f209098")
 
 
+class DrovaApiError(RuntimeError):
+    def __init__(self, status: int, url: str):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+        self.url = url
+
+
+class DrovaUnauthorized(DrovaApiError): ...
+
+
+class DrovaServerUnavailable(DrovaApiError): ...
+
+
+_RETRYABLE = (aiohttp.ClientError, asyncio.TimeoutError, DrovaServerUnavailable)
+
+
+def _check_response(resp: aiohttp.ClientResponse) -> None:
+    if resp.status in (401, 403):
+        raise DrovaUnauthorized(resp.status, str(resp.url))
+    if resp.status == 429 or resp.status >= 500:
+        raise DrovaServerUnavailable(resp.status, str(resp.url))
+
+
 class StatusEnum(StrEnum):
     NEW = "NEW"
     HANDSHAKE = "HANDSHAKE"
@@ -37,10 +76,45 @@ class SessionsEntity(BaseModel):
     billing_type: str | None = None
 
 
+class SessionStatus(BaseModel):
+    """Status-only view of a session, for callers that never look at the other fields."""
+
+    uuid: UUID
+    product_id: UUID
+    status: StatusEnum
+
+
 class SessionsResponse(BaseModel):
     sessions: list[SessionsEntity]
 
 
+T = TypeVar("T")
+_SessionModel = TypeVar("_SessionModel", SessionsEntity, SessionStatus)
+
+
+@overload
+def decode_sessions(body: bytes, limit: int | None = None) -> list[SessionsEntity]: ...
+
+
+@overload
+def decode_sessions(body: bytes, limit: int | None = None, *, model: type[_SessionModel]) -> list[_SessionModel]: ...
+
+
+def decode_sessions(body: bytes, limit: int | None = None, model: type[BaseModel] = SessionsEntity) -> list[Any]:
+    """Decode a session-manager response straight from bytes.
+
+    With ``limit`` the whole document is still parsed by the Rust JSON parser,
+    but only the first sessions are validated into models.
+    """
+    if limit is None and model is SessionsEntity:
+        return SessionsResponse.model_validate_json(body).sessions
+
+    raw_sessions = from_json(body)["sessions"]
+    if limit is not None:
+        raw_sessions = raw_sessions[:limit]
+    return [model.model_validate(raw_session) for raw_session in raw_sessions]
+
+
 class ProductInfo(BaseModel):
     model_config = ConfigDict(extra="allow")  # todo add full
     product_id: UUID
@@ -51,40 +125,186 @@ class ProductInfo(BaseModel):
     title: str
 
 
+class DrovaApiClient:
+    """Long-lived HTTP client for services.drova.io.
+
+    Keeps one aiohttp session with a keep-alive connection pool and a DNS cache,
+    so polling loops reuse TLS connections instead of handshaking on every call.
+    Every call goes through a per-endpoint circuit breaker and a shared retry budget.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        limit: int = 32,
+        limit_per_host: int = 8,
+        ttl_dns_cache: int = 300,
+        keepalive_timeout: float = 60,
+        timeout: float = 15,
+    ):
+        # DROVA_API_URL points the client at a stand-in such as bench/fake_api.py
+        self.base_url = (base_url or os.environ.get(DROVA_API_URL) or DEFAULT_API_URL).rstrip("/")
+        self.url_sessions = URL_SESSIONS.format(base_url=self.base_url)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+
+        self.retry_policy = RetryPolicy()
+        self.retry_budget = RetryBudget()
+        self.breakers = {endpoint: CircuitBreaker(f"drova.{endpoint}") for endpoint in ("sessions", "product")}
+
+        self._session: aiohttp.ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _discard_session(self) -> None:
+        """Let go of a session made on another event loop; it can only be closed on that loop."""
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.create_task, session.close())
+        else:
+            # its loop is gone and its sockets with it — just mark the session closed
+            session.detach()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            self._discard_session()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.ttl_dns_cache,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    async def __aenter__(self) -> "DrovaApiClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def health(self) -> dict[str, dict]:
+        return {
+            **{name: breaker.stats() for name, breaker in self.breakers.items()},
+            "retry_budget": {"exhausted": self.retry_budget.exhausted},
+        }
+
+    async def _call(self, endpoint: str, request: Callable[[], Awaitable[T]]) -> T:
+        latency = API_REQUEST_SECONDS.labels(endpoint=endpoint)
+        breaker = self.breakers[endpoint]
+
+        async def timed_request() -> T:
+            with latency.time():
+                return await request()
+
+        try:
+            return await call_with_retry(
+                timed_request, breaker, self.retry_budget, self.retry_policy, retry_on=_RETRYABLE
+            )
+        finally:
+            API_CIRCUIT_OPEN.labels(endpoint=endpoint).set(breaker.state != CircuitState.CLOSED)
+
+    async def check_credentials(self, server_id: str, auth_token: str) -> bool:
+        """Returns True if (server_id, auth_token) are accepted by Drova API (HTTP 200)."""
+
+        async def request() -> bool:
+            async with self.session.get(
+                self.url_sessions, data={"serveri_id": server_id}, headers={"X-Auth-Token": auth_token}
+            ) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    raise DrovaServerUnavailable(resp.status, str(resp.url))
+                return resp.status == 200
+
+        return await self._call("sessions", request)
+
+    async def get_latest_session(self, server_id: str, auth_token: str) -> SessionsEntity | None:
+        async def request() -> SessionsEntity | None:
+            async with self.session.get(
+                self.url_sessions, data={"serveri_id": server_id}, headers={"X-Auth-Token": auth_token}
+            ) as resp:
+                _check_response(resp)
+                sessions = decode_sessions(await resp.read(), limit=1)
+                return sessions[0] if sessions else None
+
+        return await self._call("sessions", request)
+
+    async def get_new_session(self, server_id: str, auth_token: str) -> SessionsEntity | None:
+        query_params = f"state={StatusEnum.NEW.value}&state={StatusEnum.HANDSHAKE.value}"
+
+        async def request() -> SessionsEntity | None:
+            async with self.session.get(
+                self.url_sessions + query_params, data={"serveri_id": server_id}, headers={"X-Auth-Token": auth_token}
+            ) as resp:
+                _check_response(resp)
+                sessions = decode_sessions(await resp.read(), limit=1)
+                return sessions[0] if sessions else None
+
+        return await self._call("sessions", request)
+
+    async def get_product_info(self, product_id: UUID, auth_token: str) -> ProductInfo:
+        async def request() -> ProductInfo:
+            async with self.session.get(
+                URL_PRODUCT.format(base_url=self.base_url, product_id=product_id), headers={"X-Auth-Token": auth_token}
+            ) as resp:
+                _check_response(resp)
+                return ProductInfo.model_validate_json(await resp.read())
+
+        return await self._call("product", request)
+
+
+_default_client: DrovaApiClient | None = None
+
+# startup diagnostic, CheckDesktop and socket mode ask for the same server's session back to back
+latest_session_flight: SingleFlight[tuple[str, str], SessionsEntity | None] = SingleFlight(window=0.5)
+
+
+def get_api_client() -> DrovaApiClient:
+    """Process-wide client shared by DrovaPoll, DrovaSocket and GamePCDiagnostic."""
+    global _default_client
+    if _default_client is None:
+        _default_client = DrovaApiClient()
+    return _default_client
+
+
+async def close_api_client() -> None:
+    global _default_client
+    if _default_client is not None:
+        await _default_client.close()
+        _default_client = None
+
+
 async def check_credentials(server_id: str, auth_token: str) -> bool:
     """Returns True if (server_id, auth_token) are accepted by Drova API (HTTP 200)."""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            URL_SESSIONS, data={"serveri_id": server_id}, headers={"X-Auth-Token": auth_token}
-        ) as resp:
-            return resp.status == 200
+    return await get_api_client().check_credentials(server_id, auth_token)
 
 
 async def get_latest_session(server_id: str, auth_token: str) -> SessionsEntity | None:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            URL_SESSIONS, data={"serveri_id": server_id}, headers={"X-Auth-Token": auth_token}
-        ) as resp:
-            sessions = SessionsResponse(**await resp.json())
-            if not sessions.sessions:
-                return None
-            return sessions.sessions[0]
+    return await latest_session_flight.do(
+        (server_id, auth_token), lambda: get_api_client().get_latest_session(server_id, auth_token)
+    )
 
 
 async def get_new_session(server_id: str, auth_token: str) -> SessionsEntity | None:
-    query_params = f"state={StatusEnum.NEW.value}&state={StatusEnum.HANDSHAKE.value}"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            URL_SESSIONS + query_params, data={"serveri_id": server_id}, headers={"X-Auth-Token": auth_token}
-        ) as resp:
-            sessions = SessionsResponse(**await resp.json())
-            if not sessions.sessions:
-                return None
-            return sessions.sessions[0]
-
-
-async def get_product_info(product_id: UUID, auth_token: str):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(URL_PRODUCT.format(product_id=product_id), headers={"X-Auth-Token": auth_token}) as resp:
-            product_info = ProductInfo(**await resp.json())
-            return product_info
+    return await get_api_client().get_new_session(server_id, auth_token)
+
+
+async def get_product_info(product_id: UUID, auth_token: str) -> ProductInfo:
+    return await get_api_client().get_product_info(product_id, auth_token)
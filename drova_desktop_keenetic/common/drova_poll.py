@@ -3,18 +3,22 @@ import logging
 import os
 from logging import DEBUG, basicConfig
 
-from asyncssh import connect as connect_ssh
+from asyncssh import DisconnectError
 from asyncssh.misc import ChannelOpenError
 
 from drova_desktop_keenetic.common.after_disconnect import AfterDisconnect
+from drova_desktop_keenetic.common.agent import ESME_SERVERS_KEY, AgentClient, Message
 from drova_desktop_keenetic.common.before_connect import BeforeConnect
 from drova_desktop_keenetic.common.commands import DuplicateAuthCode
 from drova_desktop_keenetic.common.contants import (
+    DROVA_AGENT_PORT,
+    DROVA_AGENT_TOKEN,
     WINDOWS_HOST,
     WINDOWS_LOGIN,
     WINDOWS_PASSWORD,
 )
-from drova_desktop_keenetic.common.drova import get_new_session
+from drova_desktop_keenetic.common.drova import DrovaApiError, get_new_session
+from drova_desktop_keenetic.common.fleet_poller import FleetSessionPoller
 from drova_desktop_keenetic.common.gamepc_diagnostic import GamePCDiagnostic
 from drova_desktop_keenetic.common.helpers import (
     CheckDesktop,
@@ -22,9 +26,16 @@ from drova_desktop_keenetic.common.helpers import (
     WaitFinishOrAbort,
     WaitNewDesktopSession,
 )
+from drova_desktop_keenetic.common.metrics import POLL_TICKS, REBOOTS
+from drova_desktop_keenetic.common.resilience import CircuitOpenError
+from drova_desktop_keenetic.common.ssh_pool import SSHConnectionManager
+from drova_desktop_keenetic.common.token_store import get_token_store
 
 logger = logging.getLogger(__name__)
 
+# between sessions SSH is only needed for token reads — don't keep keepalives going for hours
+SSH_IDLE_TIMEOUT = 60.0
+
 
 class DrovaPoll:
     def __init__(
@@ -32,94 +43,135 @@ class DrovaPoll:
         windows_host: str | None = None,
         windows_login: str | None = None,
         windows_password: str | None = None,
+        fleet_poller: FleetSessionPoller | None = None,
+        agent_port: int | None = None,
+        agent_token: str | None = None,
     ):
         self.windows_host = windows_host if windows_host is not None else os.environ[WINDOWS_HOST]
         self.windows_login = windows_login if windows_login is not None else os.environ[WINDOWS_LOGIN]
         self.windows_password = windows_password if windows_password is not None else os.environ[WINDOWS_PASSWORD]
 
+        self.ssh = SSHConnectionManager(
+            self.windows_host, self.windows_login, self.windows_password, idle_timeout=SSH_IDLE_TIMEOUT
+        )
+        # one token store per host: the registry is read again only on 401/403, a reboot or the long TTL
+        self.tokens = get_token_store(self.windows_host)
+        self.session_fetcher = fleet_poller.fetcher(self.windows_host) if fleet_poller is not None else None
+
+        # optional push channel; without an agent on the host everything is polled over SSH
+        if agent_port is None and DROVA_AGENT_PORT in os.environ:
+            agent_port = int(os.environ[DROVA_AGENT_PORT])
+        if agent_token is None:
+            agent_token = os.environ.get(DROVA_AGENT_TOKEN)
+        if agent_port and not agent_token:
+            logger.warning("%s: agent port set without a token — polling over SSH", self.windows_host)
+        self.agent = AgentClient(self.windows_host, agent_port, agent_token) if agent_port and agent_token else None
+        if self.agent is not None:
+            self.agent.add_listener(self._on_agent_message)
+
         self.stop_future = asyncio.get_event_loop().create_future()
 
+    def _on_agent_message(self, message: Message) -> None:
+        if message["type"] == "registry" and message["key"].upper() == ESME_SERVERS_KEY.upper():
+            self.tokens.invalidate("registry_changed")
+
+    async def _after_disconnect(self, reason: str) -> None:
+        REBOOTS.labels(host=self.windows_host, reason=reason).inc()
+        async with self.ssh.lend() as conn:
+            await AfterDisconnect(conn).run()
+            # the host is going down — don't hand the dying connection to the next iteration
+            self.ssh.mark_rebooting(conn)
+        # Drova may register the host again after the reboot
+        self.tokens.invalidate("reboot")
+
+    async def _before_connect(self) -> bool:
+        async with self.ssh.lend() as conn:
+            return await BeforeConnect(conn, self.windows_host, self.agent).run()
+
     async def polling(self) -> None:
         while not self.stop_future.done():
+            POLL_TICKS.labels(host=self.windows_host).inc()
+            retry_delay = 1.0
             try:
-                async with connect_ssh(
-                    host=self.windows_host,
-                    username=self.windows_login,
-                    password=self.windows_password,
-                    known_hosts=None,
-                    encoding="windows-1251",
-                ) as conn:
-                    try:
-                        check = CheckDesktop(conn)
-                        is_desktop_session = await check.run()
-
-                        if not is_desktop_session:
-                            is_desktop_session = await WaitNewDesktopSession(conn).run()
-
-                        if is_desktop_session:
-                            logger.info("poll: session active — starting setup")
-                            await BeforeConnect(conn).run()
+                # the watch loops get the manager, not a connection: SSH is borrowed only to read
+                # tokens, so hours of session watching don't hold a connection open
+                try:
+                    check = CheckDesktop(self.ssh, self.session_fetcher, self.tokens)
+                    is_desktop_session = await check.run()
 
+                    if not is_desktop_session:
+                        is_desktop_session = await WaitNewDesktopSession(
+                            self.ssh, self.session_fetcher, self.tokens, self.agent
+                        ).run()
+
+                    if is_desktop_session:
+                        logger.info("poll: session active — starting setup")
+                        if await self._before_connect():
                             logger.info("poll: waiting for session end")
-                            await WaitFinishOrAbort(conn).run()
+                            await WaitFinishOrAbort(self.ssh, self.session_fetcher, self.tokens, self.agent).run()
 
                             logger.info("poll: session ended — running cleanup")
-                            await AfterDisconnect(conn).run()
-                    except RebootRequired:
-                        logger.warning("poll: reboot required — running cleanup")
-                        await AfterDisconnect(conn).run()
-
-            except (ChannelOpenError, OSError):
+                            await self._after_disconnect("session_end")
+                        else:
+                            # the disk is not protected — end the session rather than let it write to it
+                            logger.error("poll: shadow mode not confirmed — rebooting instead of serving the session")
+                            await self._after_disconnect("shadow_mode_failed")
+                except RebootRequired:
+                    logger.warning("poll: reboot required — running cleanup")
+                    await self._after_disconnect("reboot_required")
+
+            except CircuitOpenError as e:
+                # the breaker already logged the outage once — just wait for its next probe
+                logger.debug("poll: %s", e)
+                retry_delay = max(e.retry_after, retry_delay)
+            except DrovaApiError as e:
+                logger.warning("poll: drova api error: %s", e)
+            except (ChannelOpenError, DisconnectError, OSError):
                 logger.debug("poll: ssh unreachable")
             except DuplicateAuthCode:
                 logger.warning("poll: duplicate server registrations — waiting for cleanup on next diagnostic")
             except:
                 logger.exception("poll: unexpected error")
 
-            await asyncio.sleep(1)
+            await asyncio.sleep(retry_delay)
 
     async def stop(self) -> None:
         self.stop_future.set_result(True)
+        if self.agent is not None:
+            await self.agent.close()
+        await self.ssh.close()
 
     async def _waitif_session_desktop_exists(self) -> None:
         try:
-            async with connect_ssh(
-                host=self.windows_host,
-                username=self.windows_login,
-                password=self.windows_password,
-                known_hosts=None,
-                encoding="windows-1251",
-            ) as conn:
-                try:
-                    if await CheckDesktop(conn).run():
-                        logger.info("poll: existing session — waiting for end")
-                        await WaitFinishOrAbort(conn).run()
-
-                        logger.info("poll: session ended — running cleanup")
-                        await AfterDisconnect(conn).run()
-                except RebootRequired:
-                    logger.warning("poll: reboot required — running cleanup")
-                    await AfterDisconnect(conn).run()
+            try:
+                if await CheckDesktop(self.ssh, self.session_fetcher, self.tokens).run():
+                    logger.info("poll: existing session — waiting for end")
+                    await WaitFinishOrAbort(self.ssh, self.session_fetcher, self.tokens, self.agent).run()
+
+                    logger.info("poll: session ended — running cleanup")
+                    await self._after_disconnect("session_end")
+            except RebootRequired:
+                logger.warning("poll: reboot required — running cleanup")
+                await self._after_disconnect("reboot_required")
         except:
             logger.exception("poll: startup check error")
 
     async def _run_startup_diagnostic(self) -> None:
         try:
-            async with connect_ssh(
-                host=self.windows_host,
-                username=self.windows_login,
-                password=self.windows_password,
-                known_hosts=None,
-                encoding="windows-1251",
-            ) as conn:
-                await GamePCDiagnostic(conn, self.windows_host).run()
-        except (ChannelOpenError, OSError):
+            async with self.ssh.lend() as conn:
+                diagnostic = GamePCDiagnostic(conn, self.windows_host, self.session_fetcher, self.tokens)
+                await diagnostic.run()
+                if diagnostic.rebooted:
+                    self.ssh.mark_rebooting(conn)
+        except (ChannelOpenError, DisconnectError, OSError):
             logger.warning("diagnostic: host unreachable (rebooting?)")
         except Exception:
             logger.exception("diagnostic: unexpected error")
 
     async def serve(self, wait_forever=False):
         logger.info("worker: start host=%s", self.windows_host)
+        if self.agent is not None:
+            await self.agent.start()
         await self._run_startup_diagnostic()
         await self._waitif_session_desktop_exists()
 
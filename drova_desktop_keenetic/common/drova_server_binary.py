@@ -12,6 +12,8 @@ from asyncio import (
 from asyncio.exceptions import CancelledError
 from typing import NamedTuple
 
+from drova_desktop_keenetic.common.metrics import PROXY_BYTES
+
 logger = logging.getLogger(__name__)
 
 BLOCK_SIZE = 4096
@@ -23,9 +25,11 @@ class Socket(NamedTuple):
 
 
 async def simple_passthrought(reader: StreamReader, writer: StreamWriter) -> None:
+    relayed = PROXY_BYTES.labels(direction="client_to_server")
     while True:
         logger.debug("Wait data in simple ( from client to server )")
         if (readed_bytes := await reader.read(BLOCK_SIZE)) and readed_bytes:
+            relayed.inc(len(readed_bytes))
             try:
                 writer.write(readed_bytes)
                 await writer.drain()
@@ -41,10 +45,12 @@ async def simple_passthrought(reader: StreamReader, writer: StreamWriter) -> Non
 
 async def server_need_reply(reader: StreamReader, writer: StreamWriter, is_answered: Future) -> None:
     found_answer = False
+    relayed = PROXY_BYTES.labels(direction="server_to_client")
     while True:
         logger.debug("Wait data in need_reply ( from server to client )")
         if (readed_bytes := await reader.read(BLOCK_SIZE)) and readed_bytes:
             logger.debug(f"We readed ( from server to client ) {len(readed_bytes)}")
+            relayed.inc(len(readed_bytes))
             if b"\x01" in readed_bytes and not found_answer:
                 found_answer = True
                 is_answered.set_result(True)
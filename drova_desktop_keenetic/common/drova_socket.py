@@ -18,6 +18,8 @@ from drova_desktop_keenetic.common.drova_server_binary import (
     Socket,
 )
 from drova_desktop_keenetic.common.helpers import CheckDesktop, WaitFinishOrAbort
+from drova_desktop_keenetic.common.metrics import REBOOTS
+from drova_desktop_keenetic.common.token_store import get_token_store
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +36,7 @@ class DrovaSocket:
         self.windows_host = windows_host if windows_host is not None else os.environ[WINDOWS_HOST]
         self.windows_login = windows_login if windows_login is not None else os.environ[WINDOWS_LOGIN]
         self.windows_password = windows_password if windows_password is not None else os.environ[WINDOWS_PASSWORD]
+        self.tokens = get_token_store(self.windows_host)
 
         self.server: asyncio.Server | None = None
 
@@ -62,16 +65,21 @@ class DrovaSocket:
             known_hosts=None,
             encoding="windows-1251",
         ) as conn:
-            is_desktop = await CheckDesktop(conn).run()
+            is_desktop = await CheckDesktop(conn, tokens=self.tokens).run()
 
             if is_desktop:
                 logger.info("socket: session active — starting setup")
-                await BeforeConnect(conn).run()
+                if not await BeforeConnect(conn, self.windows_host).run():
+                    logger.error("socket: shadow mode not confirmed — rebooting instead of serving the session")
+                    REBOOTS.labels(host=self.windows_host, reason="shadow_mode_failed").inc()
+                    await AfterDisconnect(conn).run()
+                    return
 
                 logger.info("socket: waiting for session end")
-                await WaitFinishOrAbort(conn).run()
+                await WaitFinishOrAbort(conn, tokens=self.tokens).run()
 
                 logger.info("socket: session ended — running cleanup")
+                REBOOTS.labels(host=self.windows_host, reason="session_end").inc()
                 await AfterDisconnect(conn).run()
 
     async def _waitif_session_desktop_exists(self):
@@ -82,11 +90,12 @@ class DrovaSocket:
             known_hosts=None,
             encoding="windows-1251",
         ) as conn:
-            if await CheckDesktop(conn).run():
+            if await CheckDesktop(conn, tokens=self.tokens).run():
                 logger.info("socket: existing session — waiting for end")
-                await WaitFinishOrAbort(conn).run()
+                await WaitFinishOrAbort(conn, tokens=self.tokens).run()
 
                 logger.info("socket: session ended — running cleanup")
+                REBOOTS.labels(host=self.windows_host, reason="session_end").inc()
                 await AfterDisconnect(conn).run()
 
     async def serve(self, wait_forever=False):
@@ -44,9 +44,5 @@ async def validate_creds():
                     assert local_f.read()
                 print("sftp open")
 
-        result_psexec = await conn.run(str(PsExec(r"cmd /c 'echo 1'", detach=False)))
-        PsExec.parseStderrErrorCode(
-            result_psexec.stderr
-            if isinstance(result_psexec.stderr, bytes)
-            else result_psexec.stderr.encode("windows-1251")
-        )
+        result_psexec = await conn.run(str(PsExec(r"cmd /c 'echo 1'", detach=False)), encoding=None)
+        PsExec.parseStderrErrorCode(result_psexec.stderr)
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import random
+import time
+from functools import partial
+
+from drova_desktop_keenetic.common.drova import SessionsEntity, get_latest_session
+from drova_desktop_keenetic.common.session_watcher import AdaptiveSchedule
+
+logger = logging.getLogger(__name__)
+
+# fleet-wide requests per second to the Drova API, whatever the number of hosts
+DEFAULT_RATE = 5.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FleetSessionPoller:
+    """Central scheduler for session polls of every host in a multi-host config.
+
+    Hosts submit (server_id, auth_token) through ``request``; the poller issues
+    the API calls one by one under a global token bucket with jittered spacing
+    and resolves each request's own future with the result.
+
+    The API budget is fleet-wide: ``rate`` defaults to ``DEFAULT_RATE`` no matter
+    how many hosts there are. Only the burst follows the host count, so every
+    host can poll once right away, e.g. when they all start together. With every
+    host in a fast phase at once the fleet would need ``hosts / fast_interval``
+    requests per second; a lower rate stretches each host's interval by the
+    shortfall and is warned about.
+    """
+
+    logger = logger.getChild("FleetSessionPoller")
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int | None = None,
+        jitter: float = 0.5,
+        hosts: int = 1,
+        schedule: AdaptiveSchedule | None = None,
+    ):
+        required = self.required_rate(hosts, schedule)
+        if rate < required:
+            self.logger.warning(
+                "rate %.1f/s is below the %.1f/s %d hosts need — session changes will be seen up to %.1fx later",
+                rate,
+                required,
+                hosts,
+                required / rate,
+            )
+        self.bucket = TokenBucket(rate, burst if burst is not None else max(hosts, 2))
+        # fraction of the nominal 1/rate spacing added as random delay
+        self.jitter = jitter
+
+        self.requests = 0
+        # at most one poll per host waits for the bucket; a newer request for the host joins it
+        self._pending: dict[str, tuple[str, str, asyncio.Future[SessionsEntity | None]]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    @staticmethod
+    def required_rate(hosts: int, schedule: AdaptiveSchedule | None = None) -> float:
+        """Requests per second that keep ``hosts`` on their fastest poll interval."""
+        schedule = schedule if schedule is not None else AdaptiveSchedule()
+        return max(hosts, 1) / schedule.fast_interval
+
+    def unregister(self, host: str) -> None:
+        if (pending := self._pending.pop(host, None)) is not None:
+            pending[2].cancel()
+
+    def fetcher(self, host: str):
+        """Drop-in replacement for ``get_latest_session`` bound to one host."""
+        return partial(self.request, host)
+
+    async def request(self, host: str, server_id: str, auth_token: str) -> SessionsEntity | None:
+        pending = self._pending.get(host)
+        if pending is not None and not pending[2].done():
+            # still waiting for the bucket: poll once, with the newest tokens
+            future = pending[2]
+        else:
+            future = asyncio.get_running_loop().create_future()
+        self._pending[host] = (server_id, auth_token, future)
+        self._wakeup.set()
+        self.start()
+        # shielded: one cancelled caller must not cancel the poll for the others
+        return await asyncio.shield(future)
+
+    async def _fetch(self, future: asyncio.Future[SessionsEntity | None], server_id: str, auth_token: str) -> None:
+        try:
+            result = await get_latest_session(server_id, auth_token)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                # nobody may be waiting any more — don't warn about an unretrieved exception
+                future.exception()
+            return
+        if not future.done():
+            future.set_result(result)
+
+    async def run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            await self.bucket.acquire()
+            await asyncio.sleep(random.uniform(0, self.jitter / self.bucket.rate))
+
+            if not self._pending:
+                continue
+            host = next(iter(self._pending))
+            server_id, auth_token, future = self._pending.pop(host)
+            if future.done():
+                continue
+            self.requests += 1
+
+            task = asyncio.create_task(self._fetch(future, server_id, auth_token))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(), name="fleet_session_poller")
+
+    async def stop(self) -> None:
+        for task in (self._task, *self._inflight):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._task, *self._inflight) if t is not None), return_exceptions=True)
+        self._task = None
+
+    async def __aenter__(self) -> "FleetSessionPoller":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
@@ -1,14 +1,36 @@
 import logging
 import os
-from asyncio import sleep
 
 from asyncssh import SSHClientConnection
 
-from drova_desktop_keenetic.common.commands import RegDeleteKey, RegQuery, ShadowDefenderCLI, TaskKill
-from drova_desktop_keenetic.common.contants import SHADOW_DEFENDER_DRIVES, SHADOW_DEFENDER_PASSWORD
-from drova_desktop_keenetic.common.drova import StatusEnum, check_credentials, get_latest_session
-from drova_desktop_keenetic.common.helpers import BaseDrovaMerchantWindows, RebootRequired
-from drova_desktop_keenetic.common.patch import ALL_PATCHES, PatchWindowsSettings, RegistryPatch
+from drova_desktop_keenetic.common.commands import (
+    CommandRunner,
+    RegDeleteKey,
+    ShadowDefenderCLI,
+    run_command,
+)
+from drova_desktop_keenetic.common.contants import (
+    SHADOW_DEFENDER_DRIVES,
+    SHADOW_DEFENDER_PASSWORD,
+)
+from drova_desktop_keenetic.common.drova import StatusEnum, check_credentials
+from drova_desktop_keenetic.common.helpers import (
+    BaseDrovaMerchantWindows,
+    RebootRequired,
+    SessionFetcher,
+)
+from drova_desktop_keenetic.common.metrics import REBOOTS
+from drova_desktop_keenetic.common.parsers import decode_output
+from drova_desktop_keenetic.common.patch import PatchWindowsSettings
+from drova_desktop_keenetic.common.patch_scheduler import PatchScheduler
+from drova_desktop_keenetic.common.patch_state import get_patch_state
+from drova_desktop_keenetic.common.powershell import persistent_shell
+from drova_desktop_keenetic.common.readiness import (
+    ShadowModeTimeout,
+    wait_for_shadow_mode,
+)
+from drova_desktop_keenetic.common.registry import RegistryCheck, verify_registry
+from drova_desktop_keenetic.common.token_store import HostTokenStore, get_token_store
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +45,19 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
     выходит из SD+reboot (откатывает все изменения).
     """
 
-    def __init__(self, client: SSHClientConnection, host: str):
-        super().__init__(client)
+    # a lent connection, not the manager: the diagnostic needs SFTP and a persistent shell
+    client: SSHClientConnection
+
+    def __init__(
+        self,
+        client: SSHClientConnection,
+        host: str,
+        session_fetcher: SessionFetcher | None = None,
+        tokens: HostTokenStore | None = None,
+    ):
+        super().__init__(client, session_fetcher, tokens if tokens is not None else get_token_store(host))
         self.host = host
+        self.rebooted = False
         # host встроен в имя логгера — не нужен префикс в каждом сообщении
         self.logger = logger.getChild(host)
 
@@ -41,12 +73,11 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
         """
         from drova_desktop_keenetic.common.commands import RegQueryEsme
 
-        result = await self.client.run(str(RegQueryEsme()))
+        result = await run_command(self.client, RegQueryEsme())
         if result.exit_status or result.returncode:
             return
 
-        stdout = result.stdout.encode() if isinstance(result.stdout, str) else (result.stdout or b"")
-        all_pairs = RegQueryEsme.parseAllAuthCodes(stdout)
+        all_pairs = RegQueryEsme.parseAllAuthCodes(result.stdout)
 
         if len(all_pairs) <= 1:
             return
@@ -65,7 +96,8 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
             else:
                 reg_path = rf"HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\{server_id}"
                 self.logger.warning("cleanup: %s... — invalid, deleting", server_id[:8])
-                await self.client.run(str(RegDeleteKey(reg_path=reg_path)))
+                await run_command(self.client, RegDeleteKey(reg_path=reg_path))
+                self.tokens.invalidate("registry_changed")
 
     # ------------------------------------------------------------------
     # Session check
@@ -73,13 +105,13 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
 
     async def _has_active_sessions(self) -> bool:
         try:
-            server_id = await self.get_server_id()
-            auth_token = await self.get_auth_token()
+            await self.get_server_id()
+            await self.get_auth_token()
         except RebootRequired:
             self.logger.warning("sessions: auth tokens unavailable — host needs reboot")
             return True
 
-        session = await get_latest_session(server_id, auth_token)
+        session = await self.get_session()
         if session and session.status in _ACTIVE_STATUSES:
             self.logger.info("sessions: active (%s) — diagnostic skipped", session.status)
             return True
@@ -93,7 +125,7 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
     def _sd_log(self, label: str, result) -> None:
         """Одна строка: SD <label>: OK/FAILED [— первая строка вывода]."""
         first_out = next(
-            (l.strip() for l in (result.stdout or "").splitlines() if l.strip()), ""
+            (l.strip() for l in decode_output(result.stdout).splitlines() if l.strip()), ""
         )
         if result.exit_status:
             self.logger.warning(
@@ -104,36 +136,44 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
             self.logger.info(
                 "SD %s: OK%s", label, f" — {first_out}" if first_out else ""
             )
-        if stderr := (result.stderr or "").strip():
+        if stderr := decode_output(result.stderr).strip():
             self.logger.warning("SD %s stderr: %s", label, stderr[:200])
 
     async def _sd_log_status(self) -> None:
         """Одна строка: SD status: Drive C: Protected; Drive D: Not protected."""
-        result = await self.client.run(
-            str(ShadowDefenderCLI(password=os.environ[SHADOW_DEFENDER_PASSWORD], actions=["list"]))
+        result = await run_command(
+            self.client, ShadowDefenderCLI(password=os.environ[SHADOW_DEFENDER_PASSWORD], actions=["list"])
         )
-        lines = [l.strip() for l in (result.stdout or "").splitlines() if l.strip()]
+        lines = [l.strip() for l in decode_output(result.stdout).splitlines() if l.strip()]
         self.logger.info("SD status: %s", "; ".join(lines) if lines else "(no output)")
 
     async def _sd_enter(self) -> None:
-        result = await self.client.run(
-            str(ShadowDefenderCLI(
+        result = await run_command(
+            self.client,
+            ShadowDefenderCLI(
                 password=os.environ[SHADOW_DEFENDER_PASSWORD],
                 actions=["enter"],
                 drives=os.environ[SHADOW_DEFENDER_DRIVES],
-            ))
+            ),
         )
         self._sd_log("enter", result)
-        await sleep(2)
-        await self._sd_log_status()
+        try:
+            await wait_for_shadow_mode(self.client, os.environ[SHADOW_DEFENDER_DRIVES], protected=True)
+        except ShadowModeTimeout:
+            await self._sd_log_status()
+            raise
 
     async def _sd_exit_reboot(self) -> None:
-        result = await self.client.run(
-            str(ShadowDefenderCLI(
+        REBOOTS.labels(host=self.host, reason="diagnostic").inc()
+        self.rebooted = True
+        self.tokens.invalidate("reboot")
+        result = await run_command(
+            self.client,
+            ShadowDefenderCLI(
                 password=os.environ[SHADOW_DEFENDER_PASSWORD],
                 actions=["exit", "reboot"],
                 drives=os.environ[SHADOW_DEFENDER_DRIVES],
-            ))
+            ),
         )
         self._sd_log("exit+reboot", result)
 
@@ -141,57 +181,41 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
     # Apply restrictions
     # ------------------------------------------------------------------
 
-    async def _apply_restrictions(self) -> list[str]:
+    async def _apply_restrictions(self, shell: CommandRunner) -> list[str]:
         """Применяет все патчи. Возвращает список имён упавших патчей."""
-        failed: list[str] = []
         async with self.client.start_sftp_client() as sftp:
-            for patch_class in ALL_PATCHES:
-                if patch_class.TASKKILL_IMAGE:
-                    await self.client.run(str(TaskKill(image=patch_class.TASKKILL_IMAGE)))
-                await sleep(0.2)
-                try:
-                    await patch_class(self.client, sftp).patch()
-                    self.logger.info("patch %-20s OK", patch_class.NAME)
-                except Exception:
-                    self.logger.warning("patch %-20s FAILED", patch_class.NAME, exc_info=True)
-                    failed.append(patch_class.NAME)
-        return failed
+            results = await PatchScheduler(shell, sftp, state=get_patch_state().for_host(self.host)).run()
+        return [result.name for result in results if not result.ok]
 
     # ------------------------------------------------------------------
     # Verify restrictions
     # ------------------------------------------------------------------
 
-    async def _verify_patch(self, patch: RegistryPatch) -> bool:
-        result = await self.client.run(str(RegQuery(patch.reg_directory, patch.value_name)))
-        if result.exit_status != 0:
-            return False
-        return RegQuery.parse_value(result.stdout) is not None
-
-    async def _verify_all_restrictions(self) -> dict[str, bool]:
-        settings = PatchWindowsSettings(self.client, None)  # type: ignore[arg-type]
-        results: dict[str, bool] = {}
-        for patch in settings._get_patches():
-            key = f"{patch.reg_directory}\\{patch.value_name}"
-            results[key] = await self._verify_patch(patch)
-        return results
+    async def _verify_all_restrictions(self, shell: CommandRunner) -> list[RegistryCheck]:
+        return await verify_registry(shell, PatchWindowsSettings.registry_patches())
 
     # ------------------------------------------------------------------
     # Report
     # ------------------------------------------------------------------
 
-    def _log_report(self, verification: dict[str, bool]) -> None:
+    def _log_report(self, verification: list[RegistryCheck]) -> None:
         total = len(verification)
-        ok_count = sum(1 for v in verification.values() if v)
-        missing = [k for k, v in verification.items() if not v]
+        failed = [check for check in verification if not check.ok]
+        ok_count = total - len(failed)
 
-        if not missing:
+        if not failed:
             self.logger.info("restrictions: %d/%d OK", ok_count, total)
         else:
             self.logger.warning(
-                "restrictions: %d/%d OK — %d MISSING", ok_count, total, len(missing)
+                "restrictions: %d/%d OK — %d MISSING", ok_count, total, len(failed)
             )
-            for key in missing:
-                self.logger.warning("  missing: %s", key)
+            for check in failed:
+                if check.actual is None:
+                    self.logger.warning("  missing: %s", check.patch.display_name)
+                else:
+                    self.logger.warning(
+                        "  mismatch: %s = %s, expected %s", check.patch.display_name, check.actual, check.patch.value
+                    )
 
     # ------------------------------------------------------------------
     # Entry point
@@ -204,14 +228,15 @@ class GamePCDiagnostic(BaseDrovaMerchantWindows):
             if await self._has_active_sessions():
                 return
 
-            await self._sd_enter()
-
             try:
-                patch_failures = await self._apply_restrictions()
-                if patch_failures:
-                    self.logger.warning("patches failed: %s", ", ".join(patch_failures))
-
-                verification = await self._verify_all_restrictions()
+                # inside the try: a half-entered shadow mode is rolled back by the reboot too
+                await self._sd_enter()
+                async with persistent_shell(self.client) as shell:
+                    patch_failures = await self._apply_restrictions(shell)
+                    if patch_failures:
+                        self.logger.warning("patches failed: %s", ", ".join(patch_failures))
+
+                    verification = await self._verify_all_restrictions(shell)
                 self._log_report(verification)
             finally:
                 await self._sd_exit_reboot()
@@ -0,0 +1,102 @@
+"""Helpers around recorded Drova API traffic (``drova_har_reg_file.txt``).
+
+The capture in the repo was exported without response bodies — only URLs,
+statuses, sizes and timings — so session-manager bodies are rebuilt from
+the recorded size: 15 bytes is an empty ``{"sessions":[]}``, anything
+larger held one session.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+from uuid import NAMESPACE_URL, UUID, uuid5
+
+from drova_desktop_keenetic.common.drova import UUID_DESKTOP, StatusEnum
+
+HAR_FILE = Path(__file__).parent.parent.parent / "drova_har_reg_file.txt"
+
+_EMPTY_SESSIONS_SIZE = len(b'{"sessions":[]}')
+
+
+@dataclass(frozen=True)
+class HarEntry:
+    method: str
+    url: str
+    path: str
+    query: dict[str, str]
+    status: int
+    body: bytes | None
+    body_size: int
+    wait: float  # seconds until the first response byte
+
+
+def load_har(path: str | Path = HAR_FILE) -> list[HarEntry]:
+    with open(path, encoding="utf-8") as f:
+        har = json.load(f)
+
+    entries = []
+    for entry in har["log"]["entries"]:
+        request, response = entry["request"], entry["response"]
+        content = response.get("content", {})
+
+        body: bytes | None = None
+        if (text := content.get("text")) is not None:
+            body = base64.b64decode(text) if content.get("encoding") == "base64" else text.encode()
+
+        entries.append(
+            HarEntry(
+                method=request["method"],
+                url=request["url"],
+                path=urlparse(request["url"]).path,
+                query={item["name"]: item["value"] for item in request.get("queryString", [])},
+                status=response["status"],
+                body=body,
+                body_size=content.get("size", 0),
+                wait=max(entry.get("timings", {}).get("wait", 0), 0) / 1000,
+            )
+        )
+    return entries
+
+
+def synthesize_session(
+    seed: str, status: StatusEnum = StatusEnum.FINISHED, product_id: UUID = UUID_DESKTOP, index: int = 0
+) -> dict:
+    """One session-manager session object, deterministic for a given seed."""
+    created_on = datetime(2025, 8, 25, tzinfo=timezone.utc) - timedelta(hours=index)
+    return {
+        "uuid": str(uuid5(NAMESPACE_URL, f"{seed}/session/{index}")),
+        "server_id": seed,
+        "product_id": str(product_id),
+        "client_id": str(uuid5(NAMESPACE_URL, f"{seed}/client/{index}")),
+        "created_on": created_on.isoformat(),
+        "finished_on": (
+            (created_on + timedelta(minutes=47)).isoformat()
+            if status in (StatusEnum.FINISHED, StatusEnum.ABORTED)
+            else None
+        ),
+        "status": status.value,
+        "creator_ip": f"10.{index % 250}.0.1",
+        "abort_comment": None,
+        "score": None,
+        "score_reason": None,
+        "score_text": None,
+        "billing_type": "default",
+    }
+
+
+def sessions_body(entry: HarEntry, count: int | None = None) -> bytes:
+    """Response body for a recorded session-manager entry; ``count`` overrides the recorded session count."""
+    if entry.body is not None and count is None:
+        return entry.body
+
+    if count is None:
+        count = 0 if entry.body_size <= _EMPTY_SESSIONS_SIZE else 1
+    seed = entry.query.get("server_id", entry.url)
+    return json.dumps({"sessions": [synthesize_session(seed, index=index) for index in range(count)]}).encode()
+
+
+def session_entries(entries: list[HarEntry]) -> list[HarEntry]:
+    return [entry for entry in entries if entry.path.endswith("/session-manager/sessions")]
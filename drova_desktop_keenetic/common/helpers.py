@@ -1,61 +1,119 @@
 import logging
-from asyncio import sleep
-from typing import Dict
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
 
 from asyncssh import SSHClientConnection
-from expiringdict import ExpiringDict  # type: ignore
 
-from drova_desktop_keenetic.common.commands import NotFoundAuthCode, RegQueryEsme
+from drova_desktop_keenetic.common.agent import AgentClient, Message
 from drova_desktop_keenetic.common.drova import (
     UUID_DESKTOP,
+    DrovaUnauthorized,
     SessionsEntity,
     StatusEnum,
     get_latest_session,
-    get_product_info,
+)
+from drova_desktop_keenetic.common.product_cache import get_product_cache
+from drova_desktop_keenetic.common.session_watcher import (
+    AdaptiveSchedule,
+    SessionWatcher,
+)
+from drova_desktop_keenetic.common.ssh_pool import SSHConnectionManager
+from drova_desktop_keenetic.common.token_store import (
+    HostTokenStore,
+    RebootRequired,
+    Tokens,
 )
 
 logger = logging.getLogger(__name__)
 
+SessionFetcher = Callable[[str, str], Awaitable[SessionsEntity | None]]
 
-class RebootRequired(RuntimeError): ...
+
+# standalone helpers (no shared store) keep tokens only briefly, like the old per-object cache
+PRIVATE_TOKEN_TTL = 60.0
 
 
 class BaseDrovaMerchantWindows:
     logger = logger.getChild("BaseDrovaMerchantWindows")
 
-    def __init__(self, client: SSHClientConnection):
+    def __init__(
+        self,
+        client: SSHClientConnection | SSHConnectionManager,
+        session_fetcher: SessionFetcher | None = None,
+        tokens: HostTokenStore | None = None,
+        agent: AgentClient | None = None,
+    ):
+        # with a connection manager every command borrows the connection only for its own duration
         self.client = client
-        self.dict_store = ExpiringDict(max_len=100, max_age_seconds=60)
+        # set by DrovaPoll in multi-host mode to route polls through FleetSessionPoller
+        self.session_fetcher = session_fetcher
+        # DrovaPoll passes the host's shared store, so tokens survive across helpers and poll iterations
+        self.tokens = tokens if tokens is not None else HostTokenStore("", ttl=PRIVATE_TOKEN_TTL)
+        # the host agent's logon/logoff events make the watch loops poll the API right away
+        self.agent = agent
 
-    async def get_auth_token(self):
-        if "auth_token" not in self.dict_store:
-            await self.refresh_actual_tokens()
-        return self.dict_store["auth_token"]
+    async def get_auth_token(self) -> str:
+        return (await self.tokens.get(self.client))[1]
 
-    async def get_server_id(self):
-        if "server_id" not in self.dict_store:
-            await self.refresh_actual_tokens()
-        return self.dict_store["server_id"]
+    async def get_server_id(self) -> str:
+        return (await self.tokens.get(self.client))[0]
 
-    async def refresh_actual_tokens(self) -> tuple[str, str]:
-        complete_process = await self.client.run(str(RegQueryEsme()))
-        stdout = b""
+    async def refresh_actual_tokens(self) -> Tokens:
+        return await self.tokens.refresh(self.client)
 
-        if complete_process.exit_status or complete_process.returncode:
-            raise RebootRequired()
+    async def fetch_session(self, server_id: str, auth_token: str) -> SessionsEntity | None:
+        fetch = self.session_fetcher if self.session_fetcher is not None else get_latest_session
+        return await fetch(server_id, auth_token)
 
+    async def _fetch_authorized(self, tokens: Tokens) -> tuple[Tokens, SessionsEntity | None]:
+        """Fetch with ``tokens``; on 401/403 re-read them once and retry if the registry has new ones."""
+        try:
+            return tokens, await self.fetch_session(*tokens)
+        except DrovaUnauthorized:
+            fresh = await self.tokens.refresh(self.client, stale=tokens, reason="unauthorized")
+            if fresh == tokens:
+                raise
+            return fresh, await self.fetch_session(*fresh)
+
+    async def get_session(self) -> SessionsEntity | None:
+        _, session = await self._fetch_authorized(await self.tokens.get(self.client))
+        return session
+
+    async def pinned_session_fetch(self) -> Callable[[], Awaitable[SessionsEntity | None]]:
+        """Session fetch bound to the current tokens: a watch loop polls the API without touching SSH again.
+
+        Only a 401/403 makes it re-read the registry and re-pin.
+        """
+        pinned = await self.tokens.get(self.client)
+
+        async def fetch() -> SessionsEntity | None:
+            nonlocal pinned
+            pinned, session = await self._fetch_authorized(pinned)
+            return session
+
+        return fetch
+
+    @contextmanager
+    def nudged_by_agent(self, watcher: SessionWatcher) -> Iterator[None]:
+        """While inside, every Windows session change the agent reports nudges ``watcher``."""
+        if self.agent is None:
+            yield
+            return
+
+        def on_message(message: Message) -> None:
+            if message["type"] == "session":
+                watcher.nudge()
+
+        self.agent.add_listener(on_message)
         try:
-            if isinstance(complete_process.stdout, str):
-                stdout = complete_process.stdout.encode()
-            self.dict_store["server_id"], self.dict_store["auth_token"] = RegQueryEsme.parseAuthCode(stdout=stdout)
-        except NotFoundAuthCode:
-            raise RebootRequired
-        return self.dict_store["server_id"], self.dict_store["auth_token"]
+            yield
+        finally:
+            self.agent.remove_listener(on_message)
 
     async def check_desktop_session(self, session: SessionsEntity) -> bool:
         if session.product_id == UUID_DESKTOP:
             return True
-        product_info = await get_product_info(session.product_id, auth_token=await self.get_auth_token())
+        product_info = await get_product_cache().get(session.product_id, auth_token=await self.get_auth_token())
         return product_info.use_default_desktop
 
 
@@ -63,7 +121,7 @@ class CheckDesktop(BaseDrovaMerchantWindows):
     logger = logger.getChild("CheckDesktop")
 
     async def run(self) -> bool:
-        session = await get_latest_session(await self.get_server_id(), await self.get_auth_token())
+        session = await self.get_session()
         self.logger.debug("session: %s", session)
 
         if not session:
@@ -78,33 +136,30 @@ class CheckDesktop(BaseDrovaMerchantWindows):
 
 class WaitFinishOrAbort(BaseDrovaMerchantWindows):
     logger = logger.getChild("WaitFinishOrAbort")
+    schedule = AdaptiveSchedule()
 
     async def run(self) -> bool:
-        while True:
-
-            session = await get_latest_session(await self.get_server_id(), await self.get_auth_token())
-            if not session:
-                return False
-            # wait close current session
-            if session.status in (StatusEnum.ABORTED, StatusEnum.FINISHED):
-                return True
-            await sleep(1)
+        watcher = SessionWatcher(await self.pinned_session_fetch(), self.schedule)
+        # wait close current session
+        with self.nudged_by_agent(watcher):
+            session = await watcher.wait_for(
+                lambda session: session is None or session.status in (StatusEnum.ABORTED, StatusEnum.FINISHED)
+            )
+        self.logger.debug("session closed after %d polls", watcher.polls)
+        return session is not None
 
 
 class WaitNewDesktopSession(BaseDrovaMerchantWindows):
     logger = logger.getChild("WaitNewDesktopSession")
+    schedule = AdaptiveSchedule()
 
     async def run(self) -> bool:
-        while True:
-
-            session = await get_latest_session(await self.get_server_id(), await self.get_auth_token())
-            if not session:
-                return False
-
-            if session.status in (
-                StatusEnum.HANDSHAKE,
-                StatusEnum.NEW,
-                StatusEnum.ACTIVE,
-            ):
-                return await self.check_desktop_session(session)
-            await sleep(1)
+        watcher = SessionWatcher(await self.pinned_session_fetch(), self.schedule)
+        with self.nudged_by_agent(watcher):
+            session = await watcher.wait_for(
+                lambda session: session is None
+                or session.status in (StatusEnum.HANDSHAKE, StatusEnum.NEW, StatusEnum.ACTIVE)
+            )
+        if not session:
+            return False
+        return await self.check_desktop_session(session)
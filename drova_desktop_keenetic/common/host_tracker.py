@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+
+from drova_desktop_keenetic.common.metrics import REBOOT_TURNAROUND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class HostAvailability:
+    """Tracks whether a host's sshd is up using cheap TCP probes instead of SSH handshakes.
+
+    While the host is marked down, ``wait_ready()`` connects to the port with a
+    short timeout and treats it as up only once it sends an ``SSH-`` banner.
+    After a reboot is issued the port has to be seen closed first, so the probe
+    doesn't report the dying sshd as back.
+    """
+
+    logger = logger.getChild("HostAvailability")
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 22,
+        connect_timeout: float = 0.5,
+        min_interval: float = 0.1,
+        max_interval: float = 1.0,
+        backoff: float = 2.0,
+        down_grace: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.down_grace = down_grace
+
+        self.probes = 0
+        self.last_turnaround: float | None = None
+
+        self._down_since: float | None = None
+        self._reason = ""
+        self._seen_down = True
+
+    @property
+    def is_down(self) -> bool:
+        return self._down_since is not None
+
+    def mark_down(self, reason: str) -> None:
+        if self._down_since is not None:
+            return
+        self._down_since = time.monotonic()
+        self._reason = reason
+        # "unreachable" was observed; after "reboot" sshd is still up for a while
+        self._seen_down = reason != "reboot"
+        self.logger.info("%s: down (%s)", self.host, reason)
+
+    def _mark_up(self) -> None:
+        assert self._down_since is not None
+        turnaround = time.monotonic() - self._down_since
+        self._down_since = None
+        self.last_turnaround = turnaround
+        if self._reason == "reboot":
+            REBOOT_TURNAROUND_SECONDS.labels(host=self.host).observe(turnaround)
+        self.logger.info("%s: sshd back after %.1fs (%s)", self.host, turnaround, self._reason)
+
+    async def probe(self) -> bool:
+        """True if the port accepts a connection and greets with an SSH banner."""
+        self.probes += 1
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.connect_timeout)
+            banner = await asyncio.wait_for(reader.readline(), self.connect_timeout)
+            return banner.startswith(b"SSH-")
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def wait_ready(self, timeout: float | None = None) -> None:
+        """Return once sshd answers; OSError if it doesn't within ``timeout``."""
+        if self._down_since is None:
+            return
+
+        started = time.monotonic()
+        interval = self.min_interval
+        while True:
+            if await self.probe():
+                grace_over = time.monotonic() - self._down_since >= self.down_grace
+                if self._seen_down or grace_over:
+                    self._mark_up()
+                    return
+            else:
+                self._seen_down = True
+
+            if timeout is not None and time.monotonic() - started >= timeout:
+                raise OSError(f"{self.host}:{self.port} not ready after {timeout:.0f}s")
+            await asyncio.sleep(interval)
+            # the cap bounds how late sshd coming back is noticed
+            interval = min(interval * self.backoff, self.max_interval)
@@ -0,0 +1,324 @@
+"""In-process metrics with OpenMetrics / node-exporter textfile exposition.
+
+Exporting is opt-in: set ``DROVA_METRICS_LISTEN`` (``port`` or ``host:port``)
+to serve ``/metrics`` over HTTP, and/or ``DROVA_METRICS_TEXTFILE`` to a
+``*.prom`` path inside node-exporter's textfile collector directory.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator
+
+from drova_desktop_keenetic.common.contants import (
+    DROVA_METRICS_LISTEN,
+    DROVA_METRICS_TEXTFILE,
+)
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    TYPE: str
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        assert set(labels) == set(self.labelnames), f"{self.name}: expected labels {self.labelnames}"
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def _samples(self, openmetrics: bool) -> Iterator[str]: ...
+
+    def render(self, openmetrics: bool) -> str:
+        family = self.name
+        if self.TYPE == "counter" and not openmetrics:
+            family += "_total"
+        lines = [f"# HELP {family} {self.documentation}", f"# TYPE {family} {self.TYPE}"]
+        lines.extend(self._samples(openmetrics))
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._children: dict[LabelValues, _CounterChild] = {}
+
+    def labels(self, **labels: str) -> _CounterChild:
+        return self._children.setdefault(self._key(labels), _CounterChild())
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self, openmetrics: bool) -> Iterator[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._children: dict[LabelValues, _GaugeChild] = {}
+
+    def labels(self, **labels: str) -> _GaugeChild:
+        return self._children.setdefault(self._key(labels), _GaugeChild())
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def _samples(self, openmetrics: bool) -> Iterator[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._children: dict[LabelValues, _HistogramChild] = {}
+
+    def labels(self, **labels: str) -> _HistogramChild:
+        key = self._key(labels)
+        if key not in self._children:
+            self._children[key] = _HistogramChild(self.buckets)
+        return self._children[key]
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _samples(self, openmetrics: bool) -> Iterator[str]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(child.buckets, child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        assert metric.name not in self._metrics, f"duplicate metric {metric.name}"
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self, openmetrics: bool = True) -> str:
+        text = "\n".join(metric.render(openmetrics) for metric in self._metrics.values())
+        return text + ("\n# EOF\n" if openmetrics else "\n")
+
+
+REGISTRY = Registry()
+
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    "drova_api_request_seconds", "Drova API request latency per attempt", ("endpoint",)
+)
+API_CIRCUIT_OPEN = REGISTRY.gauge(
+    "drova_api_circuit_open", "1 while the endpoint circuit breaker is not closed", ("endpoint",)
+)
+SSH_CONNECT_SECONDS = REGISTRY.histogram("drova_ssh_connect_seconds", "SSH connect + auth time", ("host",))
+COMMAND_SECONDS = REGISTRY.histogram("drova_command_seconds", "Remote command run time", ("command",))
+BEFORE_CONNECT_SECONDS = REGISTRY.histogram("drova_before_connect_seconds", "Total BeforeConnect time")
+PATCH_SECONDS = REGISTRY.histogram("drova_patch_seconds", "Time of a single BeforeConnect patch", ("patch",))
+REBOOT_TURNAROUND_SECONDS = REGISTRY.histogram(
+    "drova_reboot_turnaround_seconds",
+    "From issuing a reboot until sshd answers again",
+    ("host",),
+    buckets=(15, 30, 45, 60, 90, 120, 180, 300, 600),
+)
+SD_TRANSITION_SECONDS = REGISTRY.histogram(
+    "drova_sd_transition_seconds", "Time until Shadow Defender reports the wanted drive state", ("transition",)
+)
+PROXY_BYTES = REGISTRY.counter("drova_proxy_bytes", "Bytes relayed by the drova socket proxy", ("direction",))
+POLL_TICKS = REGISTRY.counter("drova_poll_ticks", "DrovaPoll loop iterations", ("host",))
+SSH_CONNECTS = REGISTRY.counter("drova_ssh_connects", "SSH connections opened", ("host",))
+REBOOTS = REGISTRY.counter("drova_reboots", "Shadow Defender exit+reboot issued", ("host", "reason"))
+TOKEN_FETCHES = REGISTRY.counter("drova_token_fetches", "Auth token reads from the registry", ("host", "reason"))
+
+
+class MetricsExporter:
+    logger = logger.getChild("MetricsExporter")
+
+    def __init__(
+        self,
+        registry: Registry = REGISTRY,
+        listen: str | None = None,
+        textfile: str | None = None,
+        textfile_interval: float = 15.0,
+    ):
+        self.registry = registry
+        self.listen = listen
+        self.textfile = textfile
+        self.textfile_interval = textfile_interval
+
+        self._runner: "web.AppRunner | None" = None
+        self._textfile_task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "MetricsExporter":
+        return cls(listen=os.environ.get(DROVA_METRICS_LISTEN), textfile=os.environ.get(DROVA_METRICS_TEXTFILE))
+
+    def write_textfile(self) -> None:
+        assert self.textfile
+        tmp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.registry.render(openmetrics=False))
+        os.replace(tmp_path, self.textfile)
+
+    async def _textfile_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.write_textfile)
+            except OSError:
+                self.logger.warning("textfile %s not writable", self.textfile, exc_info=True)
+            await asyncio.sleep(self.textfile_interval)
+
+    async def start(self) -> None:
+        if self.listen:
+            from aiohttp import web
+
+            async def handle(request: web.Request) -> web.Response:
+                openmetrics = "application/openmetrics-text" in request.headers.get("Accept", "")
+                content_type = (
+                    "application/openmetrics-text; version=1.0.0; charset=utf-8"
+                    if openmetrics
+                    else "text/plain; version=0.0.4; charset=utf-8"
+                )
+                return web.Response(
+                    body=self.registry.render(openmetrics).encode(), headers={"Content-Type": content_type}
+                )
+
+            app = web.Application()
+            app.router.add_get("/metrics", handle)
+            runner = self._runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            host, _, port = self.listen.rpartition(":")
+            await web.TCPSite(runner, host or "0.0.0.0", int(port)).start()
+            self.logger.info("serving /metrics on %s", self.listen)
+
+        if self.textfile:
+            self._textfile_task = asyncio.create_task(self._textfile_loop())
+
+    async def stop(self) -> None:
+        if self._textfile_task is not None:
+            self._textfile_task.cancel()
+            self._textfile_task = None
+            try:
+                self.write_textfile()
+            except OSError:
+                pass
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "MetricsExporter":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
@@ -0,0 +1,211 @@
+"""Parsers for the output of Windows console tools, working on raw bytes.
+
+Patterns are compiled once at import; each parser makes a single pass over the
+output and decodes only the fields it returns.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# what cmd.exe/reg.exe/CmdTool.exe write on a Russian Windows
+OUTPUT_ENCODING = "windows-1251"
+
+
+def as_bytes(output: bytes | str | None) -> bytes:
+    """Raw command output; ``str`` only comes from connections that still decode, so encode it back losslessly."""
+    if output is None:
+        return b""
+    if isinstance(output, str):
+        return output.encode(OUTPUT_ENCODING)
+    return output
+
+
+def decode_output(output: bytes | str | None) -> str:
+    """Command output as text, for logging and the few parsers that need more than ASCII."""
+    if output is None:
+        return ""
+    if isinstance(output, bytes):
+        return output.decode(OUTPUT_ENCODING, errors="replace")
+    return output
+
+
+def _text(data: bytes | None) -> str:
+    return data.decode(OUTPUT_ENCODING, errors="replace") if data else ""
+
+
+# ----------------------------------------------------------------------
+# reg query
+# ----------------------------------------------------------------------
+
+# a key line, or a "    name    REG_TYPE    data" value line; one alternation so the output is scanned once
+_RE_REG_LINE = re.compile(
+    rb"^(?:[ \t]*(?P<key>HKEY_[^\r\n]*?)"
+    rb"| {4}(?P<name>[^\r\n]*?) {4}(?P<type>REG_[A-Z_]+)(?: {4}(?P<data>[^\r\n]*))?)"
+    rb"[ \t]*\r?$",
+    re.MULTILINE,
+)
+
+_INTEGER_TYPES = frozenset({"REG_DWORD", "REG_QWORD", "REG_DWORD_LITTLE_ENDIAN", "REG_DWORD_BIG_ENDIAN"})
+
+
+@dataclass(slots=True)
+class RegValue:
+    name: str
+    type: str
+    data: str  # as printed by reg.exe
+
+    @property
+    def value(self) -> str | int | list[str] | bytes:
+        """``data`` as a Python value: int for DWORD/QWORD, list for MULTI_SZ, bytes for BINARY."""
+        if self.type in _INTEGER_TYPES:
+            return int(self.data, 16)
+        if self.type == "REG_MULTI_SZ":
+            # reg.exe prints the NUL separators as a literal \0
+            return self.data.split("\\0") if self.data else []
+        if self.type == "REG_BINARY":
+            return bytes.fromhex(self.data)
+        return self.data
+
+
+@dataclass(slots=True)
+class RegKey:
+    path: str
+    values: list[RegValue] = field(default_factory=list)
+
+    def get(self, name: str) -> RegValue | None:
+        name = name.upper()
+        return next((value for value in self.values if value.name.upper() == name), None)
+
+
+def parse_reg_query(output: bytes | str | None) -> list[RegKey]:
+    """Every key of ``reg query`` output (``/s`` included) with its values, in output order."""
+    keys: list[RegKey] = []
+    values: list[RegValue] | None = None
+    for key, name, value_type, data in _RE_REG_LINE.findall(as_bytes(output)):
+        # findall gives b"" for groups that didn't take part
+        if key:
+            current = RegKey(key.decode(OUTPUT_ENCODING, errors="replace"))
+            keys.append(current)
+            values = current.values
+        elif values is not None:
+            values.append(
+                RegValue(
+                    name.decode(OUTPUT_ENCODING, errors="replace"),
+                    value_type.decode(),
+                    data.decode(OUTPUT_ENCODING, errors="replace"),
+                )
+            )
+    return keys
+
+
+def parse_reg_values(output: bytes | str | None) -> dict[str, dict[str, tuple[str, str]]]:
+    """``{KEY: {value name: (REG_TYPE, data)}}``; key paths and value names upper-cased."""
+    keys: dict[str, dict[str, tuple[str, str]]] = {}
+    for key in parse_reg_query(output):
+        values = keys.setdefault(key.path.upper(), {})
+        for value in key.values:
+            values[value.name.upper()] = (value.type, value.data)
+    return keys
+
+
+def parse_auth_tokens(output: bytes | str | None) -> list[tuple[str, str]]:
+    """(server_id, auth_token) of every ``Esme\\servers\\<server_id>`` key that has an ``auth_token``."""
+    return [
+        (key.path.rpartition("\\")[2], value.data)
+        for key in parse_reg_query(output)
+        for value in key.values
+        if value.name.lower() == "auth_token"
+    ]
+
+
+# ----------------------------------------------------------------------
+# qwinsta
+# ----------------------------------------------------------------------
+
+# ">rdp-tcp#0   user   2  Active": session name and user may be blank, the id never is
+_RE_QWINSTA_ROW = re.compile(
+    rb"^(?P<current>[ >])(?P<session>\S*)[ \t]+(?:(?P<user>\S+)[ \t]+)?(?P<id>\d+)[ \t]+(?P<state>\S+)",
+    re.MULTILINE,
+)
+
+# state column prefixes, English and Russian Windows
+_QWINSTA_STATES = (
+    ("Active", ("active", "актив")),
+    ("Disc", ("disc", "разъед", "диск")),
+    ("Listen", ("listen", "прослуш")),
+    ("Conn", ("conn", "подключ", "соедин")),
+    ("Down", ("down", "отключ")),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class WinStation:
+    session: str
+    user: str
+    id: int
+    state: str  # Active, Disc, Listen, Conn, Down or the raw column text
+    current: bool  # the ">" row — the session qwinsta itself ran in
+
+
+def _qwinsta_state(raw: str) -> str:
+    lowered = raw.lower()
+    for state, prefixes in _QWINSTA_STATES:
+        if lowered.startswith(prefixes):
+            return state
+    return raw
+
+
+def parse_qwinsta(output: bytes | str | None) -> list[WinStation]:
+    return [
+        WinStation(
+            session=_text(match["session"]),
+            user=_text(match["user"]),
+            id=int(match["id"]),
+            state=_qwinsta_state(_text(match["state"])),
+            current=match["current"] == b">",
+        )
+        for match in _RE_QWINSTA_ROW.finditer(as_bytes(output))
+    ]
+
+
+def parse_active_session_id(output: bytes | str | None) -> int | None:
+    return next((station.id for station in parse_qwinsta(output) if station.state == "Active"), None)
+
+
+# ----------------------------------------------------------------------
+# psexec, tasklist, Shadow Defender
+# ----------------------------------------------------------------------
+
+_RE_PSEXEC_EXIT = re.compile(rb"(?P<executable>\S*) exited on (?P<hostname>\S*) with error code (?P<exit_code>\d+)\.")
+
+
+def parse_psexec_exit_code(stderr: bytes | str | None) -> int | None:
+    """Exit code from the last non-empty line of psexec's stderr, None if it didn't start the executable."""
+    last_line = b""
+    for line in as_bytes(stderr).split(b"\r\n"):
+        if line:
+            last_line = line
+    if match := _RE_PSEXEC_EXIT.search(last_line):
+        return int(match["exit_code"] + b"0")
+    return None
+
+
+_RE_TASKLIST_IMAGE = re.compile(rb'^"(?P<image>[^"]+)",', re.MULTILINE)
+
+
+def parse_tasklist_images(output: bytes | str | None) -> set[str]:
+    """Lower-cased image names from ``tasklist /FO CSV /NH``."""
+    return {_text(match["image"]).lower() for match in _RE_TASKLIST_IMAGE.finditer(as_bytes(output))}
+
+
+_RE_SD_DRIVE = re.compile(rb"\b(?P<drive>[A-Za-z]):")
+_RE_SD_STATE = re.compile(rb"\b(?P<state>not\s+protected|protected)\b", re.IGNORECASE)
+
+
+def parse_shadow_status(output: bytes | str | None) -> dict[str, bool]:
+    """``CmdTool.exe /list`` output -> {drive letter: protected}."""
+    status = {}
+    for line in as_bytes(output).splitlines():
+        if (drive := _RE_SD_DRIVE.search(line)) and (state := _RE_SD_STATE.search(line)):
+            status[drive["drive"].decode().upper()] = not state["state"].lower().startswith(b"not")
+    return status
@@ -1,19 +1,29 @@
 import asyncio
+import hashlib
+import io
 import logging
 from abc import ABC, abstractmethod
 from configparser import ConfigParser
-from pathlib import Path, PureWindowsPath
+from pathlib import PureWindowsPath
 from typing import Generator
 
-from aiofiles.tempfile import NamedTemporaryFile
-from asyncssh import SFTPClient, SSHClientConnection
-from pydantic import BaseModel
+from asyncssh import SFTPClient
 
 from drova_desktop_keenetic.common.commands import (
+    CommandRunner,
     PsExec,
     QWinSta,
     RegAdd,
+    RegImport,
     RegValueType,
+    run_command,
+)
+from drova_desktop_keenetic.common.parsers import decode_output
+from drova_desktop_keenetic.common.patch_state import FileDigest, HostPatchState
+from drova_desktop_keenetic.common.registry import (
+    RegistryPatch,
+    render_reg_file,
+    verify_registry,
 )
 
 logger = logging.getLogger(__name__)
@@ -22,22 +32,54 @@ logger = logging.getLogger(__name__)
 class IPatch(ABC):
     NAME: str
     TASKKILL_IMAGE: str
+    # NAMEs of patches that must finish first, and shared things the patch touches
+    DEPENDS_ON: tuple[str, ...] = ()
+    RESOURCES: frozenset[str] = frozenset({"sftp"})
 
     remote_file_location: PureWindowsPath
 
-    def __init__(self, client: SSHClientConnection, sftp: SFTPClient):
+    def __init__(self, client: CommandRunner, sftp: SFTPClient, state: HostPatchState | None = None):
         self.client = client
         self.sftp = sftp
+        self.state = state
+
+    # bigger files are transformed in a worker thread to keep the event loop responsive
+    THREAD_THRESHOLD = 256 * 1024
 
     @abstractmethod
-    async def _patch(self, file: Path) -> None: ...
+    def _patch(self, content: bytes) -> bytes: ...
 
     async def patch(self) -> None:
-        async with NamedTemporaryFile("ab") as temp_file:
-            await temp_file.close()
-            await self.sftp.get(str(self.remote_file_location), str(temp_file.name))
-            await self._patch(Path(str(temp_file.name)))
-            await self.sftp.put(str(temp_file.name), str(self.remote_file_location))
+        remote_path = str(self.remote_file_location)
+
+        known = None
+        if self.state is not None:
+            attrs = await self.sftp.stat(remote_path)
+            known = await self.state.get(remote_path)
+            if known is not None and (attrs.size, attrs.mtime) == (known.size, known.mtime):
+                logger.debug("%s: %s unchanged since last patch — skipped", self.NAME, remote_path)
+                return
+
+        async with self.sftp.open(remote_path, "rb") as f:
+            content: bytes = await f.read()
+
+        if known is not None and hashlib.sha256(content).hexdigest() == known.sha256:
+            patched = content
+        elif len(content) > self.THREAD_THRESHOLD:
+            patched = await asyncio.to_thread(self._patch, content)
+        else:
+            patched = self._patch(content)
+
+        if patched != content:
+            async with self.sftp.open(remote_path, "wb") as f:
+                await f.write(patched)
+
+        if self.state is not None:
+            attrs = await self.sftp.stat(remote_path)
+            # servers may omit either attribute; without both the fast path can't be trusted
+            if attrs.size is not None and attrs.mtime is not None:
+                digest = FileDigest(attrs.size, attrs.mtime, hashlib.sha256(patched).hexdigest())
+                await self.state.put(remote_path, digest)
 
 
 class EpicGamesAuthDiscard(IPatch):
@@ -47,13 +89,14 @@ class EpicGamesAuthDiscard(IPatch):
 
     remote_file_location = PureWindowsPath(r"AppData\Local\EpicGamesLauncher\Saved\Config\WindowsEditor\GameUserSettings.ini")
 
-    async def _patch(self, file: Path) -> None:
+    def _patch(self, content: bytes) -> bytes:
         config = ConfigParser(strict=False)
-        config.read(file, encoding="UTF-8")
+        config.read_string(content.decode("UTF-8"))
         config.remove_section("RememberMe")
         config.remove_section("Offline")
-        with open(file, "w") as f:
-            config.write(f)
+        buffer = io.StringIO()
+        config.write(buffer)
+        return buffer.getvalue().encode("UTF-8")
 
 
 class SteamAuthDiscard(IPatch):
@@ -63,13 +106,10 @@ class SteamAuthDiscard(IPatch):
     # remote_file_location = PureWindowsPath(r'c:\Program Files (x86)\Steam\config\config.vdf')
     remote_file_location = PureWindowsPath(r"c:\Program Files (x86)\Steam\config\loginusers.vdf")
 
-    async def _patch(self, file: Path) -> None:
-        with open(file, mode="w") as f:
-            f.write(
-                """"users"
+    def _patch(self, content: bytes) -> bytes:
+        return b""""users"
 {
 }"""
-            )
         # self.logger.info('Read config.vdf')
         # content_config = file.read().decode()
 
@@ -90,8 +130,8 @@ class UbisoftAuthDiscard(IPatch):
         r"AppData\Local\Ubisoft Game Launcher\user.dat",
     )
 
-    async def _patch(self, _: Path) -> None:
-        return None
+    def _patch(self, content: bytes) -> bytes:
+        return content
 
     async def patch(self) -> None:
         for file in self.to_remove:
@@ -107,8 +147,8 @@ class WargamingAuthDiscard(IPatch):
 
     to_remove = (r"AppData\Roaming\Wargaming.net\GameCenter\user_info.xml",)
 
-    async def _patch(self, _: Path) -> None:
-        return None
+    def _patch(self, content: bytes) -> bytes:
+        return content
 
     async def patch(self) -> None:
         for file in self.to_remove:
@@ -117,17 +157,16 @@ class WargamingAuthDiscard(IPatch):
                 await self.sftp.remove(PureWindowsPath(file))
 
 
-class RegistryPatch(BaseModel):
-    reg_directory: str
-    value_name: str
-    value_type: RegValueType
-    value: str | int | bytes
-
-
 class PatchWindowsSettings(IPatch):
     logger = logger.getChild("PatchWindowsSettings")
     NAME = "RegistryPatch"
     TASKKILL_IMAGE = "explorer.exe"
+    RESOURCES = frozenset({"sftp", "registry", "explorer"})
+    REG_FILE = "drova_patch.reg"
+    # read the keys first and write only values that are missing or different
+    incremental = True
+
+    failed: list[str]  # "<key>\\<value>" that could not be written by the last patch()
 
     disable_cmd = RegistryPatch(
         reg_directory=r"HKCU\Software\Policies\Microsoft\Windows\System",
@@ -207,60 +246,125 @@ class PatchWindowsSettings(IPatch):
         "SoundpadService.exe",
     )
 
-    def disable_application(self) -> Generator[RegistryPatch, None, None]:
-        for app_index in range(len(self.blocked_applications)):
-            app = self.blocked_applications[app_index]
+    @classmethod
+    def disable_application(cls) -> Generator[RegistryPatch, None, None]:
+        for app_index in range(len(cls.blocked_applications)):
+            app = cls.blocked_applications[app_index]
             yield RegistryPatch(
-                reg_directory=self.explorer_path, value_name=f"{app_index}", value_type=RegValueType.REG_SZ, value=app
+                reg_directory=cls.explorer_path, value_name=f"{app_index}", value_type=RegValueType.REG_SZ, value=app
             )
 
-    def _get_patches(self):
+    @classmethod
+    def registry_patches(cls) -> tuple[RegistryPatch, ...]:
         return (
-            self.disable_cmd,
-            self.disable_task_mgr,
-            self.disable_vbscript,
-            self.disable_poweroff,
-            self.disable_logoff,
-            self.disable_poweroff_login,
-            self.disable_logout,
-            self.disable_gpedit,
-            self.disable_fast_user_switch,
-            self.disable_mmc,
-            self.disable_run_app,
-            *self.disable_application(),
+            cls.disable_cmd,
+            cls.disable_task_mgr,
+            cls.disable_vbscript,
+            cls.disable_poweroff,
+            cls.disable_logoff,
+            cls.disable_poweroff_login,
+            cls.disable_logout,
+            cls.disable_gpedit,
+            cls.disable_fast_user_switch,
+            cls.disable_mmc,
+            cls.disable_run_app,
+            *cls.disable_application(),
         )
 
+    def _get_patches(self) -> tuple[RegistryPatch, ...]:
+        return self.registry_patches()
+
     async def _apply_reg_patch(self, patch: RegistryPatch) -> None:
-        await self.client.run(str(RegAdd(patch.reg_directory)), check=True)
-        await self.client.run(
-            str(
-                RegAdd(patch.reg_directory, value_name=patch.value_name, value_type=patch.value_type, value=patch.value)
-            ),
+        await run_command(self.client, RegAdd(patch.reg_directory), check=True)
+        await run_command(
+            self.client,
+            RegAdd(patch.reg_directory, value_name=patch.value_name, value_type=patch.value_type, value=patch.value),
             check=True,
         )
         return None
 
-    async def _patch(self, _: Path) -> None:
-        return None
+    async def _apply_batched(self, patches: tuple[RegistryPatch, ...]) -> tuple[RegistryPatch, ...]:
+        """Upload all values as one ``.reg`` file and ``reg import`` it; returns the values still to write one by one."""
+        try:
+            content = render_reg_file(patches)
+        except ValueError as e:
+            self.logger.info("batched apply unavailable: %s", e)
+            return patches
+
+        async with self.sftp.open(self.REG_FILE, "wb") as f:
+            await f.write(content)
+        try:
+            result = await run_command(self.client, RegImport(self.REG_FILE), check=False)
+        finally:
+            try:
+                await self.sftp.remove(self.REG_FILE)
+            except Exception:
+                self.logger.debug("remove %s failed", self.REG_FILE, exc_info=True)
+
+        if result.exit_status:
+            # reg import doesn't say which value it choked on — the per-value fallback does
+            self.logger.warning("reg import exit_status=%r stderr=%r", result.exit_status, result.stderr)
+            return patches
+
+        # reg import exits 0 even when a policy or a locked key kept a value from being written
+        try:
+            checks = await verify_registry(self.client, patches)
+        except Exception:
+            self.logger.warning("registry: import not verified — state unavailable", exc_info=True)
+            return ()
+        mismatched = [check for check in checks if not check.ok]
+        for check in mismatched:
+            self.logger.warning(
+                "registry: %s = %s after import, expected %s", check.patch.display_name, check.actual, check.patch.value
+            )
+        return tuple(check.patch for check in mismatched)
 
-    async def patch(self) -> None:
+    async def _apply_each(self, patches: tuple[RegistryPatch, ...]) -> list[str]:
         sem = asyncio.Semaphore(5)
 
         async def _limited(patch: RegistryPatch) -> None:
             async with sem:
                 await self._apply_reg_patch(patch)
 
-        results = await asyncio.gather(
-            *[_limited(p) for p in self._get_patches()],
-            return_exceptions=True,
-        )
-        for result in results:
+        results = await asyncio.gather(*[_limited(p) for p in patches], return_exceptions=True)
+        failed = []
+        for patch, result in zip(patches, results):
             if isinstance(result, Exception):
-                self.logger.error("Registry patch failed: %s", result)
+                self.logger.error("Registry patch %s failed: %s", patch.display_name, result)
+                failed.append(patch.display_name)
+        return failed
+
+    async def _pending_patches(self, patches: tuple[RegistryPatch, ...]) -> tuple[RegistryPatch, ...]:
+        """Values that are missing or differ; all of them if the current state can't be read."""
+        try:
+            checks = await verify_registry(self.client, patches)
+        except Exception:
+            self.logger.warning("registry: current state unavailable — writing everything", exc_info=True)
+            return patches
+        return tuple(check.patch for check in checks if not check.ok)
+
+    def _patch(self, content: bytes) -> bytes:
+        return content
+
+    async def patch(self) -> None:
+        patches = self._get_patches()
+        pending = await self._pending_patches(patches) if self.incremental else patches
+
+        self.failed = []
+        if pending and (remaining := await self._apply_batched(pending)):
+            self.failed = await self._apply_each(remaining)
+        self.logger.info(
+            "registry: %d written, %d already in place, %d failed",
+            len(pending) - len(self.failed),
+            len(patches) - len(pending),
+            len(self.failed),
+        )
 
         session_id = 1  # fallback
-        qwinsta_result = await self.client.run(str(QWinSta()), check=False)
-        self.logger.info("qwinsta exit_status=%r stdout=%r", qwinsta_result.exit_status, qwinsta_result.stdout)
+        qwinsta_result = await run_command(self.client, QWinSta(), check=False)
+        self.logger.info(
+            "qwinsta exit_status=%r stdout=%r", qwinsta_result.exit_status, decode_output(qwinsta_result.stdout)
+        )
         if not (qwinsta_result.exit_status or getattr(qwinsta_result, "returncode", None)):
             stdout = qwinsta_result.stdout
             if stdout:
@@ -268,9 +372,11 @@ class PatchWindowsSettings(IPatch):
                 if detected is not None:
                     session_id = detected
         self.logger.info("starting explorer.exe in session %d", session_id)
-        psexec_cmd = str(PsExec(command="explorer.exe", interactive=session_id, user="", password=""))
-        psexec_result = await self.client.run(psexec_cmd, check=False)
-        self.logger.info("psexec exit_status=%r stderr=%r", psexec_result.exit_status, psexec_result.stderr)
+        psexec_cmd = PsExec(command="explorer.exe", interactive=session_id, user="", password="")
+        psexec_result = await run_command(self.client, psexec_cmd, check=False)
+        self.logger.info(
+            "psexec exit_status=%r stderr=%r", psexec_result.exit_status, decode_output(psexec_result.stderr)
+        )
 
 
 ALL_PATCHES = (EpicGamesAuthDiscard, SteamAuthDiscard, UbisoftAuthDiscard, WargamingAuthDiscard, PatchWindowsSettings)
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Sequence
+
+from asyncssh import SFTPClient
+
+from drova_desktop_keenetic.common.agent import AgentClient, AgentUnavailable
+from drova_desktop_keenetic.common.commands import (
+    CommandRunner,
+    TaskKill,
+    TaskList,
+    run_command,
+)
+from drova_desktop_keenetic.common.contants import DROVA_PATCH_CONCURRENCY
+from drova_desktop_keenetic.common.metrics import PATCH_SECONDS
+from drova_desktop_keenetic.common.patch import ALL_PATCHES, IPatch
+from drova_desktop_keenetic.common.patch_state import HostPatchState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+
+# how many patches may hold a resource at once; unknown resources are exclusive
+RESOURCE_LIMITS = {"sftp": 4, "registry": 1, "explorer": 1}
+
+# Windows restarts these right after they are killed — waiting for them to be gone only runs into the timeout
+RESTARTED_IMAGES = frozenset({"explorer.exe"})
+
+
+class DependencyFailed(RuntimeError): ...
+
+
+async def wait_exited(
+    client: CommandRunner,
+    images: Sequence[str],
+    timeout: float = 5.0,
+    interval: float = 0.1,
+    agent: AgentClient | None = None,
+) -> bool:
+    """Poll ``tasklist`` until none of ``images`` is running; False on timeout.
+
+    A connected ``agent`` that observes processes reports their exits itself — no ``tasklist`` then.
+    """
+    wanted = {image.lower() for image in images}
+    deadline = time.monotonic() + timeout
+    if agent is not None and agent.available:
+        try:
+            await agent.wait_until(
+                lambda state: not (wanted & state.processes),
+                timeout,
+                # an agent that doesn't run tasklist has an empty process set — that proves nothing
+                covers=lambda state: "processes" in state.parts,
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except AgentUnavailable:
+            pass
+    while True:
+        result = await run_command(client, TaskList())
+        if result.exit_status or not (wanted & TaskList.parse_images(result.stdout)):
+            # a failed tasklist gives nothing to wait on — don't stall the setup
+            return not result.exit_status
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+
+
+@dataclass
+class PatchResult:
+    name: str
+    ok: bool
+    seconds: float
+    error: BaseException | None = None
+
+
+class PatchScheduler:
+    """Runs patches concurrently, respecting ``IPatch.DEPENDS_ON`` and ``IPatch.RESOURCES``.
+
+    A patch starts once all its dependencies finished and it holds every resource it
+    needs; a failed dependency fails its dependants without running them.
+    """
+
+    logger = logger.getChild("PatchScheduler")
+
+    def __init__(
+        self,
+        client: CommandRunner,
+        sftp: SFTPClient,
+        patches: Sequence[type[IPatch]] = ALL_PATCHES,
+        concurrency: int | None = None,
+        resource_limits: dict[str, int] | None = None,
+        state: HostPatchState | None = None,
+        kill_timeout: float = 5.0,
+        agent: AgentClient | None = None,
+    ):
+        self.client = client
+        self.sftp = sftp
+        self.state = state
+        self.agent = agent
+        self.kill_timeout = kill_timeout
+        self.patches = tuple(patches)
+        if concurrency is None:
+            concurrency = int(os.environ.get(DROVA_PATCH_CONCURRENCY, DEFAULT_CONCURRENCY))
+        self.concurrency = max(concurrency, 1)
+        self.resource_limits = RESOURCE_LIMITS | (resource_limits or {})
+
+        self._validate()
+
+    def _validate(self) -> None:
+        by_name = {patch.NAME: patch for patch in self.patches}
+        for patch in self.patches:
+            if unknown := set(patch.DEPENDS_ON) - set(by_name):
+                raise ValueError(f"{patch.NAME}: unknown dependencies {sorted(unknown)}")
+
+        visiting: set[str] = set()
+        done: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"dependency cycle through {name}")
+            visiting.add(name)
+            for dependency in by_name[name].DEPENDS_ON:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in by_name:
+            visit(name)
+
+    async def _kill_images(self) -> None:
+        images = tuple(dict.fromkeys(patch.TASKKILL_IMAGE for patch in self.patches if patch.TASKKILL_IMAGE))
+        if not images:
+            return
+        await run_command(self.client, TaskKill(images=images))
+        if not (awaited := [image for image in images if image.lower() not in RESTARTED_IMAGES]):
+            return
+        if not await wait_exited(self.client, awaited, self.kill_timeout, agent=self.agent):
+            self.logger.warning("processes still running after %.1fs — patching anyway", self.kill_timeout)
+
+    async def _apply(self, patch_class: type[IPatch]) -> None:
+        await patch_class(self.client, self.sftp, self.state).patch()
+
+    async def run(self) -> list[PatchResult]:
+        limit = asyncio.Semaphore(self.concurrency)
+        resources = {
+            resource: asyncio.Semaphore(self.resource_limits.get(resource, 1))
+            for patch in self.patches
+            for resource in patch.RESOURCES
+        }
+        tasks: dict[str, asyncio.Task[PatchResult]] = {}
+
+        await self._kill_images()
+
+        async def run_one(patch_class: type[IPatch]) -> PatchResult:
+            dependencies = await asyncio.gather(*(tasks[name] for name in patch_class.DEPENDS_ON))
+            if failed := [result.name for result in dependencies if not result.ok]:
+                error = DependencyFailed(f"{patch_class.NAME}: dependencies failed: {', '.join(failed)}")
+                self.logger.warning("patch %-20s SKIPPED — %s", patch_class.NAME, error)
+                return PatchResult(patch_class.NAME, ok=False, seconds=0.0, error=error)
+
+            async with AsyncExitStack() as held:
+                await held.enter_async_context(limit)
+                # sorted acquisition order keeps two patches from deadlocking on each other's resources;
+                # the stack releases exactly what was acquired, even if cancelled halfway through
+                for resource in sorted(patch_class.RESOURCES):
+                    await held.enter_async_context(resources[resource])
+                started = time.perf_counter()
+                try:
+                    await self._apply(patch_class)
+                except Exception as e:
+                    result = PatchResult(patch_class.NAME, ok=False, seconds=time.perf_counter() - started, error=e)
+                    self.logger.warning("patch %-20s FAILED", patch_class.NAME, exc_info=True)
+                else:
+                    result = PatchResult(patch_class.NAME, ok=True, seconds=time.perf_counter() - started)
+                    self.logger.info("patch %-20s OK %.2fs", patch_class.NAME, result.seconds)
+
+            PATCH_SECONDS.labels(patch=patch_class.NAME).observe(result.seconds)
+            return result
+
+        for patch_class in self.patches:
+            tasks[patch_class.NAME] = asyncio.create_task(run_one(patch_class))
+        return list(await asyncio.gather(*tasks.values()))
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from drova_desktop_keenetic.common.contants import DROVA_STATE_DIR
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "patch_state.json"
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    size: int
+    mtime: int
+    sha256: str  # of the known-good patched content
+
+
+class PatchStateStore:
+    """Last known-good patched state of remote files, per host.
+
+    Kept in memory, and in ``$DROVA_STATE_DIR/patch_state.json`` when the
+    directory is configured, so skipping survives worker restarts.
+    """
+
+    logger = logger.getChild("PatchStateStore")
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path is not None else None
+
+        self._hosts: dict[str, dict[str, FileDigest]] | None = None
+        self._lock = asyncio.Lock()
+
+    def _read_disk(self) -> dict[str, dict[str, FileDigest]]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+            return {host: {path: FileDigest(**digest) for path, digest in files.items()} for host, files in raw.items()}
+        except (OSError, ValueError, TypeError):
+            self.logger.warning("state file %s unreadable — starting empty", self.path, exc_info=True)
+            return {}
+
+    def _write_disk(self, data: dict[str, dict[str, dict]]) -> None:
+        assert self.path is not None
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def _load(self) -> dict[str, dict[str, FileDigest]]:
+        if self._hosts is None:
+            self._hosts = await asyncio.to_thread(self._read_disk)
+        return self._hosts
+
+    async def get(self, host: str, remote_path: str) -> FileDigest | None:
+        async with self._lock:
+            return (await self._load()).get(host, {}).get(remote_path)
+
+    async def put(self, host: str, remote_path: str, digest: FileDigest) -> None:
+        async with self._lock:
+            hosts = await self._load()
+            if hosts.get(host, {}).get(remote_path) == digest:
+                return
+            hosts.setdefault(host, {})[remote_path] = digest
+            if self.path is None:
+                return
+            snapshot = {host: {path: asdict(digest) for path, digest in files.items()} for host, files in hosts.items()}
+            try:
+                await asyncio.to_thread(self._write_disk, snapshot)
+            except OSError:
+                self.logger.warning("state file %s not writable", self.path, exc_info=True)
+
+    async def forget(self, host: str, remote_path: str) -> None:
+        async with self._lock:
+            (await self._load()).get(host, {}).pop(remote_path, None)
+
+    def for_host(self, host: str) -> "HostPatchState":
+        return HostPatchState(self, host)
+
+
+@dataclass(frozen=True)
+class HostPatchState:
+    store: PatchStateStore
+    host: str
+
+    async def get(self, remote_path: str) -> FileDigest | None:
+        return await self.store.get(self.host, remote_path)
+
+    async def put(self, remote_path: str, digest: FileDigest) -> None:
+        await self.store.put(self.host, remote_path, digest)
+
+
+_default_store: PatchStateStore | None = None
+
+
+def get_patch_state() -> PatchStateStore:
+    global _default_store
+    if _default_store is None:
+        state_dir = os.environ.get(DROVA_STATE_DIR)
+        _default_store = PatchStateStore(Path(state_dir) / STATE_FILE if state_dir else None)
+    return _default_store
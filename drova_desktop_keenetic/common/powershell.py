@@ -0,0 +1,231 @@
+"""One long-lived ``powershell.exe`` per host instead of a process per command.
+
+Commands are written to the shell's stdin one line each, handed to ``cmd.exe`` as a
+PowerShell literal — the builders quote for cmd.exe, as over a plain SSH
+channel — and wrapped so that the shell prints a per-command marker with the exit code to stdout and a marker
+to stderr when the command is done. Commands are pipelined: several may be
+in flight, their output is demultiplexed in FIFO order. The shell runs
+without decoding; output is decoded per command, only if the caller wants text.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from uuid import uuid4
+
+from asyncssh import Error as SSHError
+from asyncssh import (
+    ProcessError,
+    SSHClientConnection,
+    SSHClientProcess,
+    SSHCompletedProcess,
+)
+
+from drova_desktop_keenetic.common.commands import CommandRunner
+from drova_desktop_keenetic.common.parsers import OUTPUT_ENCODING
+
+logger = logging.getLogger(__name__)
+
+POWERSHELL = "powershell.exe -NoLogo -NoProfile -NonInteractive -Command -"
+
+
+# PowerShell ends a single-quoted string at any of these; doubled, each stands for itself
+_SINGLE_QUOTES = "'\u2018\u2019\u201a\u201b"
+
+
+class ShellClosed(RuntimeError): ...
+
+
+def _cmd_literal(command: str) -> str:
+    """``cmd.exe /s /c`` running ``command``, with nothing in it left for PowerShell to parse.
+
+    ``$``, backticks, ``;`` and the like reach cmd.exe as written. The trailing space keeps
+    whitespace outside of any quotes, so PowerShell always passes the line to cmd.exe in the
+    outer quotes ``/s`` strips.
+    """
+    for quote in _SINGLE_QUOTES:
+        command = command.replace(quote, quote * 2)
+    return f"cmd.exe /d /s /c '{command} '"
+
+
+class _Pending:
+    def __init__(self, seq: int, command: str):
+        self.seq = seq
+        self.command = command
+        self.stdout: list[bytes] = []
+        self.stderr: list[bytes] = []
+        self.exit_status: int | None = None
+        self.done = asyncio.get_running_loop().create_future()
+        self._streams_left = 2
+
+    def stream_done(self) -> None:
+        self._streams_left -= 1
+        if not self._streams_left and not self.done.done():
+            self.done.set_result(None)
+
+    def fail(self, exc: BaseException) -> None:
+        if not self.done.done():
+            self.done.set_exception(exc)
+
+
+class PowerShellExecutor:
+    """Runs ``ICommandBuilder`` strings through one persistent PowerShell process.
+
+    Quacks like ``SSHClientConnection`` for ``run_command`` and the patches: ``run()``
+    returns an ``SSHCompletedProcess``, ``start_sftp_client()`` goes to the connection.
+    """
+
+    logger = logger.getChild("PowerShellExecutor")
+
+    def __init__(self, client: SSHClientConnection):
+        self.client = client
+
+        self._process: SSHClientProcess | None = None
+        self._readers: list[asyncio.Task] = []
+        self._stdout_queue: deque[_Pending] = deque()
+        self._stderr_queue: deque[_Pending] = deque()
+        self._marker = f"##DROVA-{uuid4().hex[:12]}-"
+        self._marker_bytes = self._marker.encode()
+        self._seq = 0
+        self._closed = False
+
+    def _wrap(self, seq: int, command: str) -> str:
+        tag = f"{self._marker}{seq}"
+        # `$null |` gives the command an empty stdin, so it can't eat the following command lines.
+        # A native command sets $LASTEXITCODE and that alone is its exit code — PowerShell 5.1 also
+        # turns `$?` false when one merely writes to stderr. `$?` only counts for cmdlets and exceptions.
+        return (
+            f"$global:LASTEXITCODE = $null; $__ok = $true; "
+            f"try {{ $null | {_cmd_literal(command)}; $__ok = $? }} catch {{ $__ok = $false; [Console]::Error.WriteLine($_) }}; "
+            f"$__rc = if ($null -ne $LASTEXITCODE) {{ $LASTEXITCODE }} elseif ($__ok) {{ 0 }} else {{ 1 }}; "
+            f"[Console]::Error.WriteLine('{tag}'); '{tag}:' + $__rc\n"
+        )
+
+    async def _read(self, stream, queue: deque[_Pending], stdout: bool) -> None:
+        try:
+            while line := await stream.readline():
+                if not line.startswith(self._marker_bytes):
+                    if queue:
+                        (queue[0].stdout if stdout else queue[0].stderr).append(line)
+                    else:
+                        self.logger.debug("stray output: %r", line)
+                    continue
+
+                seq, _, exit_status = line[len(self._marker_bytes) :].strip().decode().partition(":")
+                if not queue or queue[0].seq != int(seq):
+                    self.logger.warning("out-of-order marker %r", line)
+                    continue
+                pending = queue.popleft()
+                if stdout:
+                    pending.exit_status = int(exit_status or 1)
+                pending.stream_done()
+        except Exception:
+            self.logger.debug("reader failed", exc_info=True)
+        finally:
+            self._closed = True
+            for pending in list(queue):
+                pending.fail(ShellClosed("powershell exited"))
+            queue.clear()
+
+    async def start(self) -> None:
+        self._process = await self.client.create_process(POWERSHELL, encoding=None)
+        self._readers = [
+            asyncio.create_task(self._read(self._process.stdout, self._stdout_queue, stdout=True)),
+            asyncio.create_task(self._read(self._process.stderr, self._stderr_queue, stdout=False)),
+        ]
+
+    def is_closed(self) -> bool:
+        return self._closed or self._process is None
+
+    async def run(
+        self,
+        command: str,
+        check: bool = False,
+        timeout: float | None = None,
+        encoding: str | None = OUTPUT_ENCODING,
+        **kwargs,
+    ) -> SSHCompletedProcess:
+        """Like ``SSHClientConnection.run``; ``encoding=None`` returns the output as ``bytes``."""
+        if kwargs:
+            # stdin/stdout redirection etc. need their own channel
+            return await self.client.run(command, check=check, timeout=timeout, encoding=encoding, **kwargs)
+        if self._process is None or self.is_closed():
+            raise ShellClosed("powershell is not running")
+
+        self._seq += 1
+        pending = _Pending(self._seq, command)
+        self._stdout_queue.append(pending)
+        self._stderr_queue.append(pending)
+        self._process.stdin.write(self._wrap(pending.seq, command).encode(OUTPUT_ENCODING))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(pending.done), timeout)
+        except asyncio.TimeoutError:
+            # the stuck command would swallow the output of everything queued behind it
+            await self.close()
+            raise
+
+        raw_stdout, raw_stderr = b"".join(pending.stdout), b"".join(pending.stderr)
+        stdout: bytes | str = raw_stdout
+        stderr: bytes | str = raw_stderr
+        if encoding is not None:
+            stdout = raw_stdout.decode(encoding, errors="replace")
+            stderr = raw_stderr.decode(encoding, errors="replace")
+        if check and pending.exit_status:
+            raise ProcessError(None, command, None, pending.exit_status, None, pending.exit_status, stdout, stderr)
+        return SSHCompletedProcess(
+            env=None,
+            command=command,
+            subsystem=None,
+            exit_status=pending.exit_status,
+            exit_signal=None,
+            returncode=pending.exit_status,
+            stdout=stdout,
+            stderr=stderr,
+        )
+
+    def start_sftp_client(self, *args, **kwargs):
+        return self.client.start_sftp_client(*args, **kwargs)
+
+    async def close(self) -> None:
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        self._closed = True
+        try:
+            process.stdin.write(b"exit\n")
+            process.stdin.write_eof()
+            await asyncio.wait_for(process.wait_closed(), 5)
+        except (asyncio.TimeoutError, SSHError, OSError):
+            process.close()
+        for reader in self._readers:
+            reader.cancel()
+        await asyncio.gather(*self._readers, return_exceptions=True)
+
+    async def __aenter__(self) -> "PowerShellExecutor":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+@asynccontextmanager
+async def persistent_shell(client: SSHClientConnection, probe_timeout: float = 15.0) -> AsyncIterator[CommandRunner]:
+    """A started ``PowerShellExecutor``, or the plain connection if the shell can't be brought up."""
+    executor = PowerShellExecutor(client)
+    try:
+        await executor.start()
+        await executor.run("rem", check=True, timeout=probe_timeout)
+    except (asyncio.TimeoutError, SSHError, ShellClosed, OSError):
+        logger.warning("persistent powershell unavailable — one channel per command", exc_info=True)
+        await executor.close()
+        yield client
+        return
+
+    try:
+        yield executor
+    finally:
+        await executor.close()
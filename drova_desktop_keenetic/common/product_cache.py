@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from uuid import UUID
+
+from drova_desktop_keenetic.common.contants import DROVA_PRODUCT_CACHE
+from drova_desktop_keenetic.common.drova import ProductInfo, get_product_info
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    product: ProductInfo
+    fetched_at: float  # wall clock — entries loaded from disk must age across restarts
+
+
+class ProductInfoCache:
+    """Two-tier (memory LRU + optional JSON file) cache of ProductInfo keyed by product_id.
+
+    Entries older than ``ttl`` are revalidated against the API; if revalidation
+    fails the stale entry is served rather than failing session classification.
+    """
+
+    logger = logger.getChild("ProductInfoCache")
+
+    def __init__(self, max_entries: int = 256, ttl: float = 6 * 3600, path: str | Path | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = Path(path) if path is not None else None
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.revalidations = 0
+
+        self._memory: OrderedDict[UUID, _CacheEntry] = OrderedDict()
+        self._disk: dict[str, dict] | None = None
+        self._lock = asyncio.Lock()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "revalidations": self.revalidations,
+            "size": len(self._memory),
+        }
+
+    def _remember(self, product_id: UUID, entry: _CacheEntry) -> None:
+        self._memory[product_id] = entry
+        self._memory.move_to_end(product_id)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self) -> dict[str, dict]:
+        if self.path is None or not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            self.logger.warning("cache file %s unreadable — starting empty", self.path, exc_info=True)
+            return {}
+
+    def _write_disk(self, data: dict[str, dict]) -> None:
+        assert self.path is not None
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def _lookup_disk(self, product_id: UUID) -> _CacheEntry | None:
+        if self.path is None:
+            return None
+        if self._disk is None:
+            self._disk = await asyncio.to_thread(self._read_disk)
+        if (raw := self._disk.get(str(product_id))) is None:
+            return None
+        try:
+            return _CacheEntry(product=ProductInfo.model_validate(raw["product"]), fetched_at=raw["fetched_at"])
+        except (KeyError, ValueError):
+            return None
+
+    async def _store_disk(self, product_id: UUID, entry: _CacheEntry) -> None:
+        if self.path is None:
+            return
+        if self._disk is None:
+            self._disk = await asyncio.to_thread(self._read_disk)
+        self._disk[str(product_id)] = {"product": entry.product.model_dump(mode="json"), "fetched_at": entry.fetched_at}
+        try:
+            await asyncio.to_thread(self._write_disk, dict(self._disk))
+        except OSError:
+            self.logger.warning("cache file %s not writable", self.path, exc_info=True)
+
+    async def get(self, product_id: UUID, auth_token: str) -> ProductInfo:
+        async with self._lock:
+            entry = self._memory.get(product_id)
+            if entry is None and (entry := await self._lookup_disk(product_id)) is not None:
+                self.disk_hits += 1
+                self._remember(product_id, entry)
+
+            if entry is not None and time.time() - entry.fetched_at < self.ttl:
+                self.hits += 1
+                self._memory.move_to_end(product_id)
+                return entry.product
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.revalidations += 1
+
+        try:
+            product = await get_product_info(product_id, auth_token)
+        except Exception:
+            if entry is None:
+                raise
+            self.logger.warning("product %s: revalidation failed — serving stale entry", product_id)
+            return entry.product
+
+        fresh = _CacheEntry(product=product, fetched_at=time.time())
+        async with self._lock:
+            self._remember(product_id, fresh)
+            await self._store_disk(product_id, fresh)
+        return product
+
+
+_default_cache: ProductInfoCache | None = None
+
+
+def get_product_cache() -> ProductInfoCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ProductInfoCache(path=os.environ.get(DROVA_PRODUCT_CACHE) or None)
+    return _default_cache
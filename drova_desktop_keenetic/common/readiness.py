@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import time
+
+from drova_desktop_keenetic.common.agent import AgentClient, AgentUnavailable
+from drova_desktop_keenetic.common.commands import (
+    CommandRunner,
+    ShadowDefenderCLI,
+    run_command,
+)
+from drova_desktop_keenetic.common.contants import SHADOW_DEFENDER_PASSWORD
+from drova_desktop_keenetic.common.metrics import SD_TRANSITION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowModeTimeout(RuntimeError): ...
+
+
+async def wait_for_shadow_mode(
+    client: CommandRunner,
+    drives: str,
+    protected: bool,
+    timeout: float = 15.0,
+    interval: float = 0.25,
+    transition: str | None = None,
+    agent: AgentClient | None = None,
+) -> float:
+    """Poll ``CmdTool.exe /list`` until every drive in ``drives`` is (not) protected.
+
+    With a connected ``agent`` that observes all of ``drives`` its pushed Shadow Defender
+    state is awaited instead, falling back to polling if the agent goes away.
+    Returns how long it took (also observed in ``drova_sd_transition_seconds``);
+    raises ShadowModeTimeout with the last seen status after ``timeout``.
+    """
+    wanted = {drive.upper() for drive in drives if drive.isalpha()}
+    command = ShadowDefenderCLI(password=os.environ[SHADOW_DEFENDER_PASSWORD], actions=["list"])
+    transition = transition or ("enter" if protected else "exit")
+
+    def ready(status: dict[str, bool]) -> bool:
+        return bool(wanted) and all(status.get(drive) == protected for drive in wanted)
+
+    def done() -> float:
+        elapsed = time.monotonic() - started
+        SD_TRANSITION_SECONDS.labels(transition=transition).observe(elapsed)
+        logger.info("SD %s: drives %s ready after %.2fs", transition, "".join(sorted(wanted)), elapsed)
+        return elapsed
+
+    started = time.monotonic()
+    if agent is not None and agent.available:
+        try:
+            await agent.wait_until(
+                lambda state: ready(state.shadow),
+                timeout,
+                covers=lambda state: "shadow" in state.parts and wanted <= state.shadow.keys(),
+            )
+            return done()
+        except asyncio.TimeoutError:
+            raise ShadowModeTimeout(
+                f"SD {transition}: drives not ready after {timeout:.0f}s, status={agent.state.shadow}"
+            ) from None
+        except AgentUnavailable:
+            logger.debug("SD %s: agent gone or not observing %s — polling", transition, "".join(sorted(wanted)))
+
+    status: dict[str, bool] = {}
+    while True:
+        result = await run_command(client, command)
+        status = ShadowDefenderCLI.parse_status(result.stdout)
+        if ready(status):
+            return done()
+
+        if time.monotonic() - started >= timeout:
+            raise ShadowModeTimeout(f"SD {transition}: drives not ready after {timeout:.0f}s, status={status}")
+        await asyncio.sleep(interval)
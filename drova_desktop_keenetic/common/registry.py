@@ -0,0 +1,133 @@
+import asyncio
+import codecs
+from dataclasses import dataclass
+from typing import Iterable
+
+from pydantic import BaseModel
+
+from drova_desktop_keenetic.common.commands import (
+    CommandRunner,
+    RegQuery,
+    RegValueType,
+    run_command,
+)
+
+_REG_ROOTS = {
+    "HKCU": "HKEY_CURRENT_USER",
+    "HKLM": "HKEY_LOCAL_MACHINE",
+    "HKCR": "HKEY_CLASSES_ROOT",
+    "HKU": "HKEY_USERS",
+    "HKCC": "HKEY_CURRENT_CONFIG",
+}
+
+
+def _reg_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _reg_hex(data: bytes, kind: str = "") -> str:
+    return f"hex{kind}:" + ",".join(f"{byte:02x}" for byte in data)
+
+
+class RegistryPatch(BaseModel):
+    reg_directory: str
+    value_name: str
+    value_type: RegValueType
+    value: str | int | bytes
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.reg_directory}\\{self.value_name}"
+
+    @property
+    def reg_file_key(self) -> str:
+        root, sep, rest = self.reg_directory.partition("\\")
+        return _REG_ROOTS.get(root.upper(), root) + sep + rest
+
+    def reg_file_line(self) -> str:
+        """``"name"=data`` line of a ``.reg`` file; ValueError for types ``reg import`` can't express here."""
+        match self.value_type:
+            case RegValueType.REG_SZ:
+                data = _reg_string(str(self.value))
+            case RegValueType.REG_DWORD | RegValueType.REG_DWORD_LITTLE_ENDIAN:
+                data = f"dword:{int(self.value):08x}"
+            case RegValueType.REG_EXPAND_SZ:
+                data = _reg_hex((str(self.value) + "\0").encode("utf-16-le"), "(2)")
+            case RegValueType.REG_MULTI_SZ:
+                # same separator as `reg add /t REG_MULTI_SZ /d "a\0b"`
+                items = str(self.value).split("\\0")
+                data = _reg_hex(("\0".join(items) + "\0\0").encode("utf-16-le"), "(7)")
+            case RegValueType.REG_BINARY:
+                raw = self.value if isinstance(self.value, bytes) else bytes.fromhex(str(self.value))
+                data = _reg_hex(raw)
+            case _:
+                raise ValueError(f"{self.value_type} is not supported in .reg files")
+        return f"{_reg_string(self.value_name)}={data}"
+
+
+def render_reg_file(patches: Iterable[RegistryPatch]) -> bytes:
+    """One ``.reg`` file setting all values, UTF-16LE with BOM as ``reg import`` expects."""
+    keys: dict[str, list[str]] = {}
+    for patch in patches:
+        keys.setdefault(patch.reg_file_key, []).append(patch.reg_file_line())
+
+    lines = ["Windows Registry Editor Version 5.00", ""]
+    for key, values in keys.items():
+        lines += [f"[{key}]", *values, ""]
+    return codecs.BOM_UTF16_LE + "\r\n".join(lines + [""]).encode("utf-16-le")
+
+
+@dataclass(frozen=True)
+class RegistryCheck:
+    patch: RegistryPatch
+    actual: str | None  # data as printed by `reg query`, None if the value is missing
+
+    @property
+    def ok(self) -> bool:
+        if self.actual is None:
+            return False
+        match self.patch.value_type:
+            case RegValueType.REG_DWORD | RegValueType.REG_DWORD_LITTLE_ENDIAN:
+                try:
+                    return int(self.actual, 16) == int(self.patch.value)
+                except ValueError:
+                    return False
+            case RegValueType.REG_BINARY:
+                expected = self.patch.value.hex() if isinstance(self.patch.value, bytes) else str(self.patch.value)
+                return self.actual.lower() == expected.lower()
+            case _:
+                return self.actual == str(self.patch.value)
+
+
+def query_roots(keys: Iterable[str]) -> list[str]:
+    """Distinct keys with those already covered by a queried ancestor (``reg query /s``) dropped."""
+    roots: list[str] = []
+    for key in sorted({key.upper(): key for key in keys}.values(), key=str.upper):
+        if not any(key.upper().startswith(root.upper() + "\\") for root in roots):
+            roots.append(key)
+    return roots
+
+
+async def read_registry(
+    client: CommandRunner, patches: Iterable[RegistryPatch]
+) -> dict[str, dict[str, tuple[str, str]]]:
+    """Values under every key the patches touch, one ``reg query /s`` per distinct key, all in flight at once."""
+    roots = query_roots(patch.reg_file_key for patch in patches)
+    results = await asyncio.gather(*(run_command(client, RegQuery(root, recursive=True)) for root in roots))
+
+    values: dict[str, dict[str, tuple[str, str]]] = {}
+    for result in results:
+        # a missing key exits 1 — its values are simply absent
+        if not result.exit_status:
+            values.update(RegQuery.parse_values(result.stdout))
+    return values
+
+
+async def verify_registry(client: CommandRunner, patches: Iterable[RegistryPatch]) -> list[RegistryCheck]:
+    patches = tuple(patches)
+    values = await read_registry(client, patches)
+    checks = []
+    for patch in patches:
+        found = values.get(patch.reg_file_key.upper(), {}).get(patch.value_name.upper())
+        checks.append(RegistryCheck(patch, found[1] if found is not None else None))
+    return checks
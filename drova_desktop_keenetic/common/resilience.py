@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuit {name} is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets one probe through after a cool-down.
+
+    Every failed probe doubles the cool-down (up to ``max_reset_timeout``); the
+    cool-down is jittered so that workers sharing a breaker state do not probe in lockstep.
+    """
+
+    logger = logger.getChild("CircuitBreaker")
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 5.0, max_reset_timeout: float = 120.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+
+        self._cooldown = reset_timeout
+        self._retry_at = 0.0
+        self._probe_inflight = False
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state == self.state:
+            return
+        log = self.logger.warning if state == CircuitState.OPEN else self.logger.info
+        log("%s: %s -> %s (failures=%d)", self.name, self.state, state, self.failures)
+        self.state = state
+
+    def retry_after(self) -> float:
+        return max(self._retry_at - time.monotonic(), 0.0)
+
+    def before_call(self) -> None:
+        if self.state == CircuitState.CLOSED:
+            return
+        if self.state == CircuitState.OPEN and time.monotonic() >= self._retry_at:
+            self._set_state(CircuitState.HALF_OPEN)
+        if self.state == CircuitState.HALF_OPEN and not self._probe_inflight:
+            self._probe_inflight = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def release(self) -> None:
+        """Call was cancelled before it could tell anything about the endpoint."""
+        self._probe_inflight = False
+
+    def record_success(self) -> None:
+        self._probe_inflight = False
+        self.failures = 0
+        self._cooldown = self.reset_timeout
+        self._set_state(CircuitState.CLOSED)
+
+    def record_failure(self) -> None:
+        was_probe, self._probe_inflight = self._probe_inflight, False
+        self.failures += 1
+        if was_probe:
+            self._cooldown = min(self._cooldown * 2, self.max_reset_timeout)
+        elif self.state != CircuitState.CLOSED or self.failures < self.failure_threshold:
+            return
+
+        self.opened += 1
+        self._retry_at = time.monotonic() + self._cooldown * random.uniform(0.8, 1.2)
+        self._set_state(CircuitState.OPEN)
+
+    def stats(self) -> dict[str, float | str]:
+        return {
+            "state": self.state.value,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": self.retry_after(),
+        }
+
+
+class RetryBudget:
+    """Process-wide cap on retries: at most ``ratio`` of recent requests, plus a small floor."""
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+
+        self.exhausted = 0
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) < self.min_per_second * self.window + self.ratio * len(self._requests):
+            self._retries.append(now)
+            return True
+        self.exhausted += 1
+        return False
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+
+    def delay(self, attempt: int) -> float:
+        # "full jitter": spreads retries of many callers over the whole backoff window
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+async def call_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    breaker: CircuitBreaker,
+    budget: RetryBudget,
+    policy: RetryPolicy,
+    retry_on: tuple[type[BaseException], ...],
+) -> T:
+    attempt = 0
+    while True:
+        breaker.before_call()
+        budget.record_request()
+        try:
+            result = await fn()
+        except retry_on as e:
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= policy.attempts or breaker.state == CircuitState.OPEN or not budget.try_spend():
+                raise
+            delay = policy.delay(attempt)
+            logger.debug("%s: %r — retry %d in %.2fs", breaker.name, e, attempt, delay)
+            await asyncio.sleep(delay)
+        except BaseException:
+            # cancelled, or an error outside ``retry_on`` (e.g. 401, malformed body): says nothing
+            # about an outage either way — neither closes nor trips the breaker
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,140 @@
+import logging
+import time
+from asyncio import FIRST_COMPLETED, Event, Queue, ensure_future, sleep, wait
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from drova_desktop_keenetic.common.drova import SessionsEntity, StatusEnum
+
+logger = logging.getLogger(__name__)
+
+SessionFetcher = Callable[[], Awaitable[SessionsEntity | None]]
+SessionPredicate = Callable[[SessionsEntity | None], bool]
+
+_TRANSITION_STATUSES = (StatusEnum.NEW, StatusEnum.HANDSHAKE)
+
+
+@dataclass(frozen=True)
+class SessionTransition:
+    previous: SessionsEntity | None
+    current: SessionsEntity | None
+    at: float
+
+
+@dataclass
+class AdaptiveSchedule:
+    """Poll interval policy: fast around transitions, exponential backoff while nothing changes.
+
+    Worst-case delay between a session ending and the watcher seeing it: ``fast_interval``
+    during the first ``active_warmup`` of an ACTIVE session, ``active_max_interval`` after
+    that (10s by default), plus one API round trip. A host agent cuts this to about one
+    round trip after the Windows logoff — see ``SessionWatcher.nudge``.
+
+    Between sessions the cap is ``idle_max_interval``, which is also how late a new session
+    is noticed without an agent. It defaults to ``fast_interval``; raising it saves API calls
+    on idle hosts at the cost of a slower start for the next client.
+    """
+
+    fast_interval: float = 1.0
+    # ACTIVE sessions are polled fast for this long — most aborts happen right after start
+    active_warmup: float = 180.0
+    # bounds how late a session end is noticed once the warmup is over
+    active_max_interval: float = 10.0
+    # bounds how late a new session is noticed — the client is already waiting for the host
+    idle_max_interval: float = 1.0
+    backoff_factor: float = 1.5
+
+    def next_interval(self, session: SessionsEntity | None, previous_interval: float, stable_for: float) -> float:
+        if session is not None and session.status in _TRANSITION_STATUSES:
+            return self.fast_interval
+
+        if session is not None and session.status == StatusEnum.ACTIVE:
+            if stable_for < self.active_warmup:
+                return self.fast_interval
+            max_interval = self.active_max_interval
+        else:
+            max_interval = self.idle_max_interval
+
+        return min(max(previous_interval, self.fast_interval) * self.backoff_factor, max_interval)
+
+
+class SessionWatcher:
+    """Polls the latest session on an adaptive schedule and publishes transitions to subscribers.
+
+    ``nudge()`` cuts the current wait short — for hints cheaper than the API, like the host
+    agent seeing a Windows logon or logoff.
+    """
+
+    logger = logger.getChild("SessionWatcher")
+
+    def __init__(self, fetch: SessionFetcher, schedule: AdaptiveSchedule | None = None):
+        self.fetch = fetch
+        self.schedule = schedule if schedule is not None else AdaptiveSchedule()
+
+        self.session: SessionsEntity | None = None
+        self.interval = self.schedule.fast_interval
+        self.polls = 0
+
+        self._changed_at = time.monotonic()
+        self._subscribers: list[Queue[SessionTransition]] = []
+        self._nudged = Event()
+
+    def subscribe(self) -> Queue[SessionTransition]:
+        queue: Queue[SessionTransition] = Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: Queue[SessionTransition]) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    @staticmethod
+    def _is_transition(previous: SessionsEntity | None, current: SessionsEntity | None) -> bool:
+        if previous is None or current is None:
+            return previous is not current
+        return previous.uuid != current.uuid or previous.status != current.status
+
+    async def poll(self) -> SessionsEntity | None:
+        session = await self.fetch()
+        self.polls += 1
+        now = time.monotonic()
+
+        if self._is_transition(self.session, session):
+            self.logger.info(
+                "transition: %s -> %s",
+                self.session.status if self.session else None,
+                session.status if session else None,
+            )
+            transition = SessionTransition(previous=self.session, current=session, at=now)
+            for queue in self._subscribers:
+                queue.put_nowait(transition)
+            self._changed_at = now
+            self.interval = self.schedule.fast_interval
+        else:
+            self.interval = self.schedule.next_interval(session, self.interval, now - self._changed_at)
+
+        self.session = session
+        return session
+
+    def nudge(self) -> None:
+        """Poll now and fast again: something on the host changed, the API will follow shortly."""
+        self.interval = self.schedule.fast_interval
+        self._nudged.set()
+
+    async def _pause(self) -> None:
+        if not self._nudged.is_set():
+            waits = (ensure_future(sleep(self.interval)), ensure_future(self._nudged.wait()))
+            try:
+                await wait(waits, return_when=FIRST_COMPLETED)
+            finally:
+                # also when the watcher itself is cancelled — don't leave the waiters behind
+                for pending in waits:
+                    pending.cancel()
+        self._nudged.clear()
+
+    async def wait_for(self, predicate: SessionPredicate) -> SessionsEntity | None:
+        while True:
+            session = await self.poll()
+            if predicate(session):
+                return session
+            await self._pause()
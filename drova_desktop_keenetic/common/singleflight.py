@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[K, T]):
+    """Coalesces concurrent calls with the same key into one underlying call.
+
+    Callers arriving while a call for the key is in flight await the same task;
+    callers arriving within ``window`` seconds after it completed get its result.
+    The call runs as its own task, so a cancelled caller does not cancel it for the others.
+    """
+
+    def __init__(self, window: float = 0.5):
+        self.window = window
+
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+        self._inflight: dict[K, asyncio.Task[T]] = {}
+        self._recent: dict[K, tuple[float, T]] = {}
+
+    def stats(self) -> dict[str, int]:
+        return {"calls": self.calls, "executed": self.executed, "coalesced": self.coalesced}
+
+    def forget(self, key: K) -> None:
+        self._recent.pop(key, None)
+
+    def _on_done(self, key: K, task: asyncio.Task[T]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            now = time.monotonic()
+            self._recent = {k: v for k, v in self._recent.items() if now - v[0] < self.window}
+            self._recent[key] = (now, task.result())
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+
+        if (recent := self._recent.get(key)) is not None and time.monotonic() - recent[0] < self.window:
+            self.coalesced += 1
+            return recent[1]
+
+        if (task := self._inflight.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            self.executed += 1
+
+            async def call() -> T:
+                return await fn()
+
+            task = asyncio.create_task(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+
+        return await asyncio.shield(task)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from asyncssh import DisconnectError, SSHClientConnection
+from asyncssh import connect as connect_ssh
+from asyncssh.misc import ChannelOpenError
+
+from drova_desktop_keenetic.common.host_tracker import HostAvailability
+from drova_desktop_keenetic.common.metrics import SSH_CONNECT_SECONDS, SSH_CONNECTS
+
+logger = logging.getLogger(__name__)
+
+# errors after which the connection can not be trusted anymore
+_CONNECTION_ERRORS = (ChannelOpenError, DisconnectError, OSError)
+
+
+class SSHConnectionManager:
+    """Keeps one SSH connection to a Windows host and lends it to the helpers.
+
+    The connection is opened on first use and reused until it dies — keepalive
+    timeout, reboot or a transport error — so the handshake happens once per
+    host boot instead of once per poll. With ``idle_timeout`` set it is closed
+    when nobody borrowed it for that long, and reopened on the next ``lend()``.
+    """
+
+    logger = logger.getChild("SSHConnectionManager")
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        keepalive_interval: float = 10.0,
+        keepalive_count_max: int = 3,
+        connect_timeout: float = 10.0,
+        ready_timeout: float = 30.0,
+        idle_timeout: float | None = None,
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count_max = keepalive_count_max
+        self.connect_timeout = connect_timeout
+        self.ready_timeout = ready_timeout
+        self.idle_timeout = idle_timeout
+        self.availability = HostAvailability(host)
+
+        self._conn: SSHClientConnection | None = None
+        self._lock = asyncio.Lock()
+        self._leases = 0
+        self._idle_handle: asyncio.TimerHandle | None = None
+
+    def is_alive(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def _open(self) -> SSHClientConnection:
+        SSH_CONNECTS.labels(host=self.host).inc()
+        with SSH_CONNECT_SECONDS.labels(host=self.host).time():
+            return await connect_ssh(
+                host=self.host,
+                username=self.username,
+                password=self.password,
+                known_hosts=None,
+                encoding="windows-1251",
+                keepalive_interval=self.keepalive_interval,
+                keepalive_count_max=self.keepalive_count_max,
+                connect_timeout=self.connect_timeout,
+            )
+
+    async def get(self) -> SSHClientConnection:
+        async with self._lock:
+            if not self.is_alive():
+                if self._conn is not None:
+                    self.logger.info("%s: connection lost — reconnecting", self.host)
+                    self._conn = None
+                # while the host is known to be down only TCP probes go out, no handshakes
+                await self.availability.wait_ready(self.ready_timeout)
+                try:
+                    self._conn = await self._open()
+                except OSError:
+                    self.availability.mark_down("unreachable")
+                    raise
+            assert self._conn is not None
+            return self._conn
+
+    @asynccontextmanager
+    async def lend(self) -> AsyncIterator[SSHClientConnection]:
+        self._leases += 1
+        self._cancel_idle_close()
+        try:
+            conn = await self.get()
+            try:
+                yield conn
+            except _CONNECTION_ERRORS:
+                self.invalidate(conn)
+                raise
+        finally:
+            self._leases -= 1
+            if not self._leases and self.idle_timeout is not None and self._conn is not None:
+                self._idle_handle = asyncio.get_running_loop().call_later(self.idle_timeout, self._close_idle)
+
+    def _cancel_idle_close(self) -> None:
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def _close_idle(self) -> None:
+        self._idle_handle = None
+        if not self._leases and self._conn is not None:
+            self.logger.debug("%s: idle for %.0fs — closing", self.host, self.idle_timeout)
+            self.invalidate()
+
+    def invalidate(self, conn: SSHClientConnection | None = None) -> None:
+        """Drop the connection (e.g. after issuing a reboot) so the next ``lend()`` reconnects."""
+        if self._conn is None or (conn is not None and conn is not self._conn):
+            return
+        self._conn.close()
+        self._conn = None
+
+    def mark_rebooting(self, conn: SSHClientConnection | None = None) -> None:
+        """A reboot was issued: drop the connection and wait for sshd to go away and come back."""
+        self.invalidate(conn)
+        self.availability.mark_down("reboot")
+
+    async def run(self, command: str, **kwargs):
+        async with self.lend() as conn:
+            return await conn.run(command, **kwargs)
+
+    async def close(self) -> None:
+        self._cancel_idle_close()
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+            await conn.wait_closed()
+
+    async def __aenter__(self) -> "SSHConnectionManager":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+
+from asyncssh import SSHClientConnection
+
+from drova_desktop_keenetic.common.commands import (
+    NotFoundAuthCode,
+    RegQueryEsme,
+    run_command,
+)
+from drova_desktop_keenetic.common.metrics import TOKEN_FETCHES
+from drova_desktop_keenetic.common.ssh_pool import SSHConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# the tokens only change when Drova re-registers the host — the TTL is a safety net, not the refresh path
+DEFAULT_TTL = 6 * 3600.0
+
+Tokens = tuple[str, str]
+
+
+class RebootRequired(RuntimeError): ...
+
+
+class HostTokenStore:
+    """(server_id, auth_token) of one host, read from its registry and shared by every helper.
+
+    The registry is read again only after ``invalidate()`` — the API answered
+    401/403, the Esme keys were changed or the host rebooted — or once ``ttl``
+    has passed. Concurrent callers share a single read.
+    """
+
+    logger = logger.getChild("HostTokenStore")
+
+    def __init__(self, host: str, ttl: float = DEFAULT_TTL):
+        self.host = host
+        self.ttl = ttl
+        self.fetches = 0
+
+        self._tokens: Tokens | None = None
+        self._expires_at = 0.0
+        self._reason = "initial"
+        self._lock = asyncio.Lock()
+
+    @property
+    def cached(self) -> Tokens | None:
+        return self._tokens if time.monotonic() < self._expires_at else None
+
+    def invalidate(self, reason: str) -> None:
+        if self.cached is not None:
+            self.logger.debug("%s: tokens invalidated (%s)", self.host, reason)
+        self._expires_at = 0.0
+        self._reason = reason
+
+    async def get(self, client: SSHClientConnection | SSHConnectionManager) -> Tokens:
+        if (tokens := self.cached) is not None:
+            return tokens
+        async with self._lock:
+            if (tokens := self.cached) is not None:
+                return tokens
+            return await self._fetch(client, self._reason)
+
+    async def refresh(
+        self, client: SSHClientConnection | SSHConnectionManager, stale: Tokens | None = None, reason: str = "refresh"
+    ) -> Tokens:
+        """Re-read the tokens, unless another caller already replaced ``stale`` with fresh ones."""
+        async with self._lock:
+            if stale is not None and (tokens := self.cached) is not None and tokens != stale:
+                return tokens
+            return await self._fetch(client, reason)
+
+    async def _fetch(self, client: SSHClientConnection | SSHConnectionManager, reason: str) -> Tokens:
+        self.fetches += 1
+        TOKEN_FETCHES.labels(host=self.host, reason=reason).inc()
+
+        complete_process = await run_command(client, RegQueryEsme())
+        if complete_process.exit_status or complete_process.returncode:
+            self.invalidate("reboot_required")
+            raise RebootRequired()
+
+        try:
+            tokens = RegQueryEsme.parseAuthCode(stdout=complete_process.stdout)
+        except NotFoundAuthCode:
+            self.invalidate("reboot_required")
+            raise RebootRequired
+
+        previous, self._tokens = self._tokens, tokens
+        self._expires_at = time.monotonic() + self.ttl
+        self._reason = "ttl"
+        if previous is not None and previous != tokens:
+            self.logger.info("%s: server registration changed in the registry", self.host)
+        return tokens
+
+
+_stores: dict[str, HostTokenStore] = {}
+
+
+def get_token_store(host: str) -> HostTokenStore:
+    if host not in _stores:
+        _stores[host] = HostTokenStore(host)
+    return _stores[host]
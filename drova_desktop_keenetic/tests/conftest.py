@@ -1,5 +1,24 @@
+from datetime import datetime
+from ipaddress import IPv4Address
+from uuid import uuid4
+
 import pytest
 
+from drova_desktop_keenetic.common.drova import SessionsEntity, StatusEnum
+
+SLEEP = "drova_desktop_keenetic.common.session_watcher.sleep"
+
+
+def _session(status: StatusEnum, uuid=None) -> SessionsEntity:
+    return SessionsEntity(
+        uuid=uuid or uuid4(),
+        product_id=uuid4(),
+        client_id=uuid4(),
+        created_on=datetime.now(),
+        status=status,
+        creator_ip=IPv4Address("127.0.0.1"),
+    )
+
 
 @pytest.fixture(autouse=True)
 def test_env(monkeypatch):
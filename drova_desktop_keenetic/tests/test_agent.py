@@ -0,0 +1,228 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.agent import (
+    ESME_SERVERS_KEY,
+    AgentClient,
+    AgentState,
+    Message,
+)
+from drova_desktop_keenetic.common.agent_server import AgentServer
+from drova_desktop_keenetic.common.drova import StatusEnum
+from drova_desktop_keenetic.common.drova_poll import DrovaPoll
+from drova_desktop_keenetic.common.helpers import WaitFinishOrAbort
+from drova_desktop_keenetic.common.patch_scheduler import wait_exited
+from drova_desktop_keenetic.common.readiness import wait_for_shadow_mode
+from drova_desktop_keenetic.common.session_watcher import AdaptiveSchedule
+from drova_desktop_keenetic.common.token_store import HostTokenStore
+from drova_desktop_keenetic.tests.conftest import _session
+
+TOKEN = "shared-secret"
+
+
+def test_state_diff_roundtrip() -> None:
+    current = AgentState(sessions={1: "Active", 2: "Disc"}, processes={"steam.exe"}, shadow={"C": False})
+    observed = AgentState(
+        sessions={1: "Disc"},
+        processes={"epicgameslauncher.exe"},
+        shadow={"C": True},
+        parts={"sessions", "processes", "shadow"},
+    )
+
+    messages = current.diff(observed)
+    assert {"type": "session", "id": 2, "state": "Gone"} in messages
+    assert {"type": "process", "image": "steam.exe", "running": False} in messages
+
+    for message in messages:
+        assert current.apply(message)
+    assert current == observed
+    assert current.diff(observed) == []
+    # only the observed parts are compared
+    assert current.diff(AgentState(parts={"sessions", "processes", "shadow"})) == [
+        {"type": "session", "id": 1, "state": "Gone"},
+        {"type": "process", "image": "epicgameslauncher.exe", "running": False},
+    ]
+    # a part no longer observed is announced, its stale content is not
+    assert current.diff(AgentState(parts={"sessions"})) == [
+        {"type": "parts", "parts": ["sessions"]},
+        {"type": "session", "id": 1, "state": "Gone"},
+    ]
+
+
+async def _subscribed(server: AgentServer, **kwargs) -> AgentClient:
+    client = AgentClient("127.0.0.1", server.port, TOKEN, retry_interval=0.05, **kwargs)
+    await client.start()
+    for _ in range(100):
+        if client.available:
+            return client
+        await asyncio.sleep(0.01)
+    raise AssertionError("agent client did not connect")
+
+
+@pytest.mark.asyncio
+async def test_events_pushed_to_subscriber() -> None:
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        await server.publish({"type": "process", "image": "Steam.exe", "running": True})
+        client = await _subscribed(server)
+        received: list[Message] = []
+        client.add_listener(received.append)
+
+        assert client.state.processes == {"steam.exe"}
+
+        async def later() -> None:
+            await asyncio.sleep(0.02)
+            await server.publish({"type": "shadow", "drive": "C", "protected": True})
+
+        started = time.monotonic()
+        asyncio.create_task(later())
+        await client.wait_until(lambda state: state.shadow.get("C") is True, timeout=1)
+        assert time.monotonic() - started < 0.1
+
+        # unchanged state is not pushed again
+        assert await server.publish({"type": "shadow", "drive": "C", "protected": True}) == 0
+        assert received == [{"type": "shadow", "drive": "C", "protected": True}]
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_no_agent() -> None:
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        port = server.port
+    client = AgentClient("127.0.0.1", port, TOKEN)
+    assert not await client.connect()
+    assert not client.available
+
+
+@pytest.mark.asyncio
+async def test_wrong_token_rejected() -> None:
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        client = AgentClient("127.0.0.1", server.port, "guess")
+        assert not await client.connect()
+        assert not server._subscribers
+
+    with pytest.raises(ValueError):
+        AgentServer(":7989", TOKEN)
+    with pytest.raises(ValueError):
+        AgentServer("127.0.0.1:7989", "")
+
+
+@pytest.mark.asyncio
+async def test_shadow_wait_uses_agent_then_falls_back() -> None:
+    ssh = mock.MagicMock()
+    ssh.run = mock.AsyncMock(return_value=mock.MagicMock(exit_status=0, stdout="Drive C: Protected\r\n"))
+
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        await server.publish({"type": "shadow", "drive": "C", "protected": True})
+        agent = await _subscribed(server)
+
+        await wait_for_shadow_mode(ssh, "C", protected=True, agent=agent)
+        assert ssh.run.await_count == 0
+
+    # server gone: the client notices and the wait polls over SSH again
+    for _ in range(100):
+        if not agent.available:
+            break
+        await asyncio.sleep(0.01)
+    await wait_for_shadow_mode(ssh, "C", protected=True, agent=agent)
+    assert ssh.run.await_count == 1
+    await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_shadow_wait_polls_drives_agent_does_not_observe() -> None:
+    ssh = mock.MagicMock()
+    ssh.run = mock.AsyncMock(
+        return_value=mock.MagicMock(exit_status=0, stdout="Drive C: Protected\r\nDrive D: Protected\r\n")
+    )
+
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        # no Shadow Defender password on the agent: it reports processes only
+        await server.update(AgentState(processes={"steam.exe"}, parts={"processes"}))
+        agent = await _subscribed(server)
+        await wait_for_shadow_mode(ssh, "C", protected=True, agent=agent)
+        assert ssh.run.await_count == 1
+
+        # the agent sees C: only — D: still has to be polled
+        await server.publish({"type": "shadow", "drive": "C", "protected": True})
+        await wait_for_shadow_mode(ssh, "CD", protected=True, agent=agent)
+        assert ssh.run.await_count == 2
+
+        await wait_for_shadow_mode(ssh, "C", protected=True, agent=agent)
+        assert ssh.run.await_count == 2
+        await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_wait_exited_uses_agent() -> None:
+    ssh = mock.MagicMock()
+    ssh.run = mock.AsyncMock()
+
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        await server.publish({"type": "process", "image": "steam.exe", "running": True})
+        agent = await _subscribed(server)
+
+        assert not await wait_exited(ssh, ["Steam.exe"], timeout=0.05, agent=agent)
+        asyncio.get_running_loop().call_later(
+            0.02,
+            lambda: asyncio.ensure_future(server.publish({"type": "process", "image": "steam.exe", "running": False})),
+        )
+        assert await wait_exited(ssh, ["Steam.exe"], timeout=1, agent=agent)
+        assert ssh.run.await_count == 0
+        await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_wait_exited_polls_when_agent_does_not_observe_processes() -> None:
+    ssh = mock.MagicMock()
+    ssh.run = mock.AsyncMock(return_value=mock.MagicMock(exit_status=0, stdout=b'"steam.exe","1234"\r\n'))
+
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        # tasklist failed on the agent: its empty process set proves nothing
+        await server.update(AgentState(sessions={1: "Active"}, parts={"sessions"}))
+        agent = await _subscribed(server)
+
+        assert not await wait_exited(ssh, ["Steam.exe"], timeout=0.05, interval=0.01, agent=agent)
+        assert ssh.run.await_count > 0
+        await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_session_end_wait_nudged_by_logoff() -> None:
+    active = _session(StatusEnum.ACTIVE)
+    statuses = iter([active, _session(StatusEnum.FINISHED, uuid=active.uuid)])
+
+    async def fetch(server_id, auth_token):
+        return next(statuses)
+
+    tokens = mock.MagicMock(spec=HostTokenStore)
+    tokens.get = mock.AsyncMock(return_value=("server", "token"))
+
+    async with AgentServer("127.0.0.1:0", TOKEN) as server:
+        await server.publish({"type": "session", "id": 2, "state": "Active"})
+        agent = await _subscribed(server)
+
+        helper = WaitFinishOrAbort(mock.MagicMock(), fetch, tokens, agent)
+        helper.schedule = AdaptiveSchedule(fast_interval=60)
+        waiting = asyncio.create_task(helper.run())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        await server.publish({"type": "session", "id": 2, "state": "Gone"})
+        assert await asyncio.wait_for(waiting, 1)
+        assert agent._listeners == []
+        await agent.close()
+
+
+@pytest.mark.asyncio
+async def test_poll_drops_tokens_on_registration_change() -> None:
+    poll = DrovaPoll("agent-host", "user", "password", agent_port=1, agent_token=TOKEN)
+    with mock.patch.object(poll.tokens, "invalidate") as invalidate:
+        poll._on_agent_message({"type": "registry", "key": ESME_SERVERS_KEY.upper(), "digest": "x"})
+        poll._on_agent_message({"type": "process", "image": "steam.exe", "running": True})
+    invalidate.assert_called_once_with("registry_changed")
+    assert DrovaPoll("agent-host", "user", "password").agent is None
+    # without the shared token the agent would refuse the subscription
+    assert DrovaPoll("agent-host", "user", "password", agent_port=1).agent is None
@@ -0,0 +1,34 @@
+from unittest import mock
+
+import pytest
+from asyncssh import DisconnectError
+
+from drova_desktop_keenetic.common.before_connect import BeforeConnect
+from drova_desktop_keenetic.common.readiness import ShadowModeTimeout
+
+BEFORE_CONNECT = "drova_desktop_keenetic.common.before_connect"
+
+
+@pytest.fixture
+def patched(mocker):
+    mocker.patch(f"{BEFORE_CONNECT}.persistent_shell")
+    mocker.patch(f"{BEFORE_CONNECT}.run_command")
+    return mocker.patch(f"{BEFORE_CONNECT}.PatchScheduler")
+
+
+@pytest.mark.asyncio
+async def test_before_connect_not_protected(mocker, patched):
+    mocker.patch(f"{BEFORE_CONNECT}.wait_for_shadow_mode", side_effect=ShadowModeTimeout())
+
+    assert not await BeforeConnect(mock.MagicMock()).run()
+    patched.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_before_connect_transport_error_propagates(mocker, patched):
+    # a dropped connection says nothing about shadow mode — the poll loop retries instead of rebooting
+    mocker.patch(f"{BEFORE_CONNECT}.wait_for_shadow_mode", side_effect=DisconnectError(11, "gone"))
+
+    with pytest.raises(DisconnectError):
+        await BeforeConnect(mock.MagicMock()).run()
+    patched.assert_not_called()
@@ -1,3 +1,5 @@
+from unittest.mock import AsyncMock, Mock
+
 import pytest
 
 from drova_desktop_keenetic.common.commands import (
@@ -6,7 +8,9 @@ from drova_desktop_keenetic.common.commands import (
     PsExec,
     PsExecNotFoundExecutable,
     QWinSta,
+    RegDeleteKey,
     RegQueryEsme,
+    run_command,
 )
 
 
@@ -112,3 +116,28 @@ HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\aaaa0002-0000-0000-0000-000000000
     assert len(pairs) == 2
     assert pairs[0] == ("aaaa0001-0000-0000-0000-000000000000", "bbbb0001-0000-0000-0000-000000000000")
     assert pairs[1] == ("aaaa0002-0000-0000-0000-000000000000", "bbbb0002-0000-0000-0000-000000000000")
+
+
+def test_parse_RegQueryEsme_decoded_output_no_mojibake() -> None:
+    # a connection that still decodes hands over str — it must not be re-encoded as utf-8
+    output = r"""
+HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\сервер-1
+    auth_token    REG_SZ    токен-1
+"""
+    assert RegQueryEsme.parseAuthCode(output) == ("сервер-1", "токен-1")
+    assert RegQueryEsme.parseAuthCode(output.encode("windows-1251")) == ("сервер-1", "токен-1")
+
+
+@pytest.mark.asyncio
+async def test_run_command_raw_output() -> None:
+    client = Mock()
+    client.run = AsyncMock()
+
+    await run_command(client, RegQueryEsme())
+    assert client.run.await_args.kwargs == {"encoding": None}
+
+    await run_command(client, RegQueryEsme(), encoding="utf-8")
+    assert client.run.await_args.kwargs == {"encoding": "utf-8"}
+
+    await run_command(client, RegDeleteKey(reg_path="HKCU\\Software\\X"))
+    assert client.run.await_args.kwargs == {}
@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import pytest
+
+from drova_desktop_keenetic.common.drova import (
+    DrovaApiClient,
+    SessionsResponse,
+    SessionStatus,
+    close_api_client,
+    decode_sessions,
+    get_api_client,
+)
+from drova_desktop_keenetic.common.har import load_har, session_entries, sessions_body
+
+
+@pytest.mark.asyncio
+async def test_api_client_reuses_session() -> None:
+    client = DrovaApiClient(limit_per_host=2)
+    session = client.session
+    assert client.session is session
+    assert session.connector is not None and session.connector.limit_per_host == 2
+
+    await client.close()
+    assert session.closed
+    assert client.session is not session
+    await client.close()
+
+
+def test_api_client_session_replaced_on_new_loop() -> None:
+    client = DrovaApiClient()
+
+    async def session():
+        return client.session
+
+    first = asyncio.run(session())
+    second = asyncio.run(session())
+
+    assert second is not first
+    # the first loop is gone: its session is let go of, not left open
+    assert first.closed
+    asyncio.run(client.close())
+
+
+@pytest.mark.asyncio
+async def test_default_api_client_is_shared() -> None:
+    assert get_api_client() is get_api_client()
+    await close_api_client()
+
+
+def test_decode_sessions_matches_legacy_path() -> None:
+    entries = session_entries(load_har())
+    assert entries
+
+    for entry in entries:
+        body = sessions_body(entry, count=3)
+        legacy = SessionsResponse(**json.loads(body)).sessions
+        assert decode_sessions(body) == legacy
+        assert decode_sessions(body, limit=1) == legacy[:1]
+        assert decode_sessions(body, limit=1, model=SessionStatus)[0].status == legacy[0].status
+
+    assert decode_sessions(b'{"sessions":[]}', limit=1) == []
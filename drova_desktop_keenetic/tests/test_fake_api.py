@@ -0,0 +1,46 @@
+import pytest
+
+from drova_desktop_keenetic.bench.fake_api import (
+    FakeDrovaApi,
+    FaultConfig,
+    SessionTimeline,
+    TimelineStep,
+)
+from drova_desktop_keenetic.common.drova import UUID_DESKTOP, DrovaApiClient, StatusEnum
+from drova_desktop_keenetic.common.har import load_har
+
+
+@pytest.mark.asyncio
+async def test_client_against_fake_api() -> None:
+    timeline = SessionTimeline([TimelineStep(StatusEnum.ACTIVE, 3600)], "server")
+    async with FakeDrovaApi(timelines={"server": timeline}, faults=FaultConfig(invalid_tokens={"bad"})) as api:
+        async with DrovaApiClient(base_url=api.base_url) as client:
+            session = await client.get_latest_session("server", "token")
+            assert session is not None
+            assert session.status == StatusEnum.ACTIVE
+            assert await client.get_new_session("server", "token") is None
+
+            product = await client.get_product_info(UUID_DESKTOP, "token")
+            assert product.use_default_desktop
+
+            assert await client.check_credentials("server", "token")
+            assert not await client.check_credentials("server", "bad")
+
+    assert api.stats["401"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fake_api_replays_har() -> None:
+    async with FakeDrovaApi(har_entries=load_har()) as api:
+        async with DrovaApiClient(base_url=api.base_url) as client:
+            sessions = [await client.get_latest_session("unknown", "token") for _ in range(6)]
+
+    assert any(session is None for session in sessions)
+    assert any(session is not None for session in sessions)
+
+
+def test_timeline_advances() -> None:
+    timeline = SessionTimeline([TimelineStep(None, 10), TimelineStep(StatusEnum.NEW, 10)], repeat=False)
+    assert timeline.sessions(100.0) == []
+    assert timeline.sessions(115.0)[0]["status"] == "NEW"
+    assert timeline.sessions(1000.0)[0]["status"] == "NEW"
@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from drova_desktop_keenetic.common.fleet_poller import (
+    DEFAULT_RATE,
+    FleetSessionPoller,
+    TokenBucket,
+)
+from drova_desktop_keenetic.common.session_watcher import AdaptiveSchedule
+
+GET_LATEST_SESSION = "drova_desktop_keenetic.common.fleet_poller.get_latest_session"
+
+
+def test_token_bucket() -> None:
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+@pytest.mark.asyncio
+async def test_fleet_poller_fans_out(mocker) -> None:
+    api = mocker.patch(GET_LATEST_SESSION, new=AsyncMock(side_effect=lambda server_id, _: f"session-{server_id}"))
+
+    async with FleetSessionPoller(rate=200, burst=1, jitter=0) as poller:
+        results = await asyncio.gather(
+            *(poller.fetcher(f"host{i}")(f"server{i}", "token") for i in range(5)),
+        )
+
+    assert results == [f"session-server{i}" for i in range(5)]
+    assert api.call_count == 5
+    assert poller.requests == 5
+
+
+@pytest.mark.asyncio
+async def test_fleet_poller_propagates_errors(mocker) -> None:
+    mocker.patch(GET_LATEST_SESSION, new=AsyncMock(side_effect=OSError("down")))
+
+    async with FleetSessionPoller(rate=200, jitter=0) as poller:
+        with pytest.raises(OSError):
+            await poller.request("host", "server", "token")
+
+
+@pytest.mark.asyncio
+async def test_fleet_poller_late_answer_goes_to_its_own_request(mocker) -> None:
+    delays = {"old": 0.05, "new": 0.1}
+
+    async def api(server_id, auth_token):
+        await asyncio.sleep(delays[auth_token])
+        return f"session-{auth_token}"
+
+    mocker.patch(GET_LATEST_SESSION, new=api)
+
+    async with FleetSessionPoller(rate=200, burst=2, jitter=0) as poller:
+        abandoned = asyncio.create_task(poller.request("host", "server", "old"))
+        await asyncio.sleep(0.01)  # its API call is in flight now
+        abandoned.cancel()
+
+        # the cancelled call answers first — that answer is not handed to the next request
+        assert await poller.request("host", "server", "new") == "session-new"
+        assert poller.requests == 2
+
+
+def test_fleet_poller_rate_is_fleet_wide(caplog) -> None:
+    poller = FleetSessionPoller(hosts=3)
+    assert poller.bucket.rate == DEFAULT_RATE
+    assert poller.bucket.capacity == 3
+    assert not caplog.records
+
+    poller = FleetSessionPoller(hosts=60)
+    assert poller.bucket.rate == DEFAULT_RATE
+    assert poller.bucket.capacity == 60
+    assert "below the 60.0/s 60 hosts need" in caplog.text
+
+    caplog.clear()
+    poller = FleetSessionPoller(rate=30, burst=4, hosts=60, schedule=AdaptiveSchedule(fast_interval=2))
+    assert poller.bucket.capacity == 4
+    assert not caplog.records
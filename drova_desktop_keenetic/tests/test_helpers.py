@@ -3,7 +3,13 @@ from unittest.mock import AsyncMock, Mock
 import pytest
 from asyncssh import SSHCompletedProcess
 
-from drova_desktop_keenetic.common.helpers import CheckDesktop, RebootRequired
+from drova_desktop_keenetic.common.drova import StatusEnum
+from drova_desktop_keenetic.common.helpers import (
+    CheckDesktop,
+    RebootRequired,
+    WaitFinishOrAbort,
+)
+from drova_desktop_keenetic.tests.conftest import SLEEP, _session
 
 
 @pytest.mark.asyncio
@@ -72,3 +78,28 @@ async def test_RebootRequiredBadReturn():
         await helper.refresh_actual_tokens()
         print(client.run.called)
         assert client.run.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_WaitFinishOrAbort_reads_tokens_once(mocker):
+    result = SSHCompletedProcess()
+    result.exit_status = result.returncode = 0
+    result.stdout = r"""
+HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\85dd80c4-adc1-1111-1111-111111111111
+    auth_token    REG_SZ    7a8b78f4-103d-1111-1111-111111111111
+"""
+    client = Mock()
+    client.run = AsyncMock(return_value=result)
+    helper = WaitFinishOrAbort(client)
+
+    active = _session(StatusEnum.ACTIVE)
+    statuses = iter([active, active, _session(StatusEnum.FINISHED, uuid=active.uuid)])
+
+    async def fetch(server_id, auth_token):
+        helper.tokens.invalidate("ttl")  # the token cache expiring mid-session must not mean another SSH read
+        return next(statuses)
+
+    mocker.patch(SLEEP, new=AsyncMock())
+    helper.session_fetcher = fetch
+    assert await helper.run()
+    assert client.run.await_count == 1
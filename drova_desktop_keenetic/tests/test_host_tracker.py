@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from drova_desktop_keenetic.common.host_tracker import HostAvailability
+
+
+async def _sshd(port: int) -> asyncio.Server:
+    async def greet(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(b"SSH-2.0-OpenSSH_for_Windows_9.5\r\n")
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(greet, "127.0.0.1", port)
+
+
+@pytest.mark.asyncio
+async def test_probe_requires_ssh_banner(unused_tcp_port) -> None:
+    availability = HostAvailability("127.0.0.1", unused_tcp_port)
+    assert not await availability.probe()
+
+    server = await _sshd(unused_tcp_port)
+    async with server:
+        assert await availability.probe()
+
+
+@pytest.mark.asyncio
+async def test_reboot_detected_after_port_went_down(unused_tcp_port) -> None:
+    availability = HostAvailability("127.0.0.1", unused_tcp_port, min_interval=0.01, max_interval=0.05)
+    server = await _sshd(unused_tcp_port)
+
+    availability.mark_down("reboot")
+    waiter = asyncio.create_task(availability.wait_ready(timeout=5))
+
+    # sshd is still answering right after the reboot command — not "back" yet
+    await asyncio.sleep(0.1)
+    assert not waiter.done()
+
+    server.close()
+    await server.wait_closed()
+    await asyncio.sleep(0.1)
+    assert not waiter.done()
+
+    server = await _sshd(unused_tcp_port)
+    async with server:
+        await asyncio.wait_for(waiter, 1)
+    assert not availability.is_down
+    assert availability.last_turnaround is not None and availability.last_turnaround >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_wait_ready_timeout(unused_tcp_port) -> None:
+    availability = HostAvailability("127.0.0.1", unused_tcp_port, min_interval=0.01)
+    await availability.wait_ready(timeout=0)  # not marked down — no probing at all
+    assert availability.probes == 0
+
+    availability.mark_down("unreachable")
+    with pytest.raises(OSError):
+        await availability.wait_ready(timeout=0.05)
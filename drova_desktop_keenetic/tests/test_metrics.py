@@ -0,0 +1,44 @@
+import pytest
+from aiohttp import ClientSession
+
+from drova_desktop_keenetic.common.metrics import MetricsExporter, Registry
+
+
+def test_render_openmetrics_and_textfile_format() -> None:
+    registry = Registry()
+    connects = registry.counter("drova_ssh_connects", "SSH connections opened", ("host",))
+    latency = registry.histogram("drova_api_request_seconds", "latency", ("endpoint",), buckets=(0.1, 1.0))
+
+    connects.labels(host="10.0.0.2").inc()
+    connects.labels(host="10.0.0.2").inc()
+    latency.labels(endpoint="sessions").observe(0.05)
+    latency.labels(endpoint="sessions").observe(0.5)
+
+    text = registry.render(openmetrics=True)
+    assert "# TYPE drova_ssh_connects counter" in text
+    assert 'drova_ssh_connects_total{host="10.0.0.2"} 2' in text
+    assert 'drova_api_request_seconds_bucket{endpoint="sessions",le="0.1"} 1' in text
+    assert 'drova_api_request_seconds_bucket{endpoint="sessions",le="+Inf"} 2' in text
+    assert 'drova_api_request_seconds_count{endpoint="sessions"} 2' in text
+    assert text.endswith("# EOF\n")
+
+    prometheus = registry.render(openmetrics=False)
+    assert "# TYPE drova_ssh_connects_total counter" in prometheus
+    assert "# EOF" not in prometheus
+
+
+@pytest.mark.asyncio
+async def test_exporter_serves_http_and_writes_textfile(tmp_path, unused_tcp_port) -> None:
+    registry = Registry()
+    registry.gauge("drova_api_circuit_open", "circuit", ("endpoint",)).labels(endpoint="sessions").set(1)
+    textfile = tmp_path / "drova.prom"
+
+    async with MetricsExporter(registry, listen=f"127.0.0.1:{unused_tcp_port}", textfile=str(textfile)):
+        async with ClientSession() as session:
+            async with session.get(
+                f"http://127.0.0.1:{unused_tcp_port}/metrics", headers={"Accept": "application/openmetrics-text"}
+            ) as resp:
+                assert resp.headers["Content-Type"].startswith("application/openmetrics-text")
+                assert 'drova_api_circuit_open{endpoint="sessions"} 1' in await resp.text()
+
+    assert 'drova_api_circuit_open{endpoint="sessions"} 1' in textfile.read_text()
@@ -0,0 +1,110 @@
+from drova_desktop_keenetic.common.parsers import (
+    RegKey,
+    RegValue,
+    parse_active_session_id,
+    parse_auth_tokens,
+    parse_qwinsta,
+    parse_reg_query,
+)
+
+REG_QUERY = "\r\n".join(
+    (
+        "",
+        r"HKEY_CURRENT_USER\Software\Test",
+        "    (Default)    REG_SZ    ",
+        "    Name    REG_SZ    значение с пробелами",
+        "    Flags    REG_DWORD    0x1f",
+        "    Big    REG_QWORD    0x100000000",
+        r"    List    REG_MULTI_SZ    one\0two words\0три",
+        "    Empty    REG_MULTI_SZ    ",
+        "    Blob    REG_BINARY    00FF10",
+        "",
+        r"HKEY_CURRENT_USER\Software\Test\Empty",
+        "",
+        r"HKEY_CURRENT_USER\Software\Test\Подраздел",
+        "    Path    REG_EXPAND_SZ    %SystemRoot%\\system32",
+        "",
+        "End of search: 8 match(es) found.",
+        "",
+    )
+).encode("windows-1251")
+
+
+def _value(key: RegKey, name: str) -> str | int | list[str] | bytes:
+    value = key.get(name)
+    assert value is not None
+    return value.value
+
+
+def test_parse_reg_query_records() -> None:
+    keys = parse_reg_query(REG_QUERY)
+    assert [key.path for key in keys] == [
+        r"HKEY_CURRENT_USER\Software\Test",
+        r"HKEY_CURRENT_USER\Software\Test\Empty",
+        r"HKEY_CURRENT_USER\Software\Test\Подраздел",
+    ]
+
+    test, empty, sub = keys
+    assert test.get("(default)") == RegValue("(Default)", "REG_SZ", "")
+    assert _value(test, "NAME") == "значение с пробелами"
+    assert _value(test, "Flags") == 0x1F
+    assert _value(test, "Big") == 1 << 32
+    assert _value(test, "List") == ["one", "two words", "три"]
+    assert _value(test, "Empty") == []
+    assert _value(test, "Blob") == b"\x00\xff\x10"
+    assert test.get("missing") is None
+    assert empty.values == []
+    assert _value(sub, "Path") == "%SystemRoot%\\system32"
+
+
+def test_parse_reg_query_text_and_empty() -> None:
+    assert parse_reg_query(REG_QUERY.decode("windows-1251")) == parse_reg_query(REG_QUERY)
+    assert parse_reg_query(b"") == []
+    assert parse_reg_query(None) == []
+
+
+def test_parse_auth_tokens() -> None:
+    output = "\r\n".join(
+        (
+            r"HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\aaaa",
+            "    auth_token    REG_SZ    token-a",
+            "",
+            r"HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\bbbb",
+            "    auth_token    REG_SZ    token-b",
+        )
+    )
+    assert parse_auth_tokens(output) == [("aaaa", "token-a"), ("bbbb", "token-b")]
+
+
+def test_parse_qwinsta_en() -> None:
+    output = (
+        " SESSIONNAME       USERNAME                 ID  STATE   TYPE        DEVICE\r\n"
+        " services                                    0  Disc\r\n"
+        ">console           user                      1  Active\r\n"
+        "                   other                     2  Disc\r\n"
+        " rdp-tcp                                 65536  Listen\r\n"
+    )
+    stations = parse_qwinsta(output)
+    assert [(s.session, s.user, s.id, s.state, s.current) for s in stations] == [
+        ("services", "", 0, "Disc", False),
+        ("console", "user", 1, "Active", True),
+        ("", "other", 2, "Disc", False),
+        ("rdp-tcp", "", 65536, "Listen", False),
+    ]
+    assert parse_active_session_id(output) == 1
+
+
+def test_parse_qwinsta_ru() -> None:
+    output = (
+        " СЕАНС             ПОЛЬЗОВАТЕЛЬ             ID  СТАТУС  ТИП         УСТР-ВО\r\n"
+        " services                                    0  Диск\r\n"
+        ">console           пользователь              4  Активно\r\n"
+        " rdp-tcp                                 65536  Прослушивание\r\n"
+    ).encode("windows-1251")
+    assert [(s.user, s.id, s.state) for s in parse_qwinsta(output)] == [
+        ("", 0, "Disc"),
+        ("пользователь", 4, "Active"),
+        ("", 65536, "Listen"),
+    ]
+    assert parse_active_session_id(output) == 4
+    assert parse_active_session_id(b"") is None
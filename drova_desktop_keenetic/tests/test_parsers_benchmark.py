@@ -0,0 +1,70 @@
+import pytest
+
+from drova_desktop_keenetic.common.parsers import (
+    parse_active_session_id,
+    parse_auth_tokens,
+    parse_reg_query,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+KEYS = 2000
+VALUES_PER_KEY = 10
+
+
+def _reg_query_output(keys: int, values_per_key: int) -> bytes:
+    lines = [""]
+    for key in range(keys):
+        lines.append(rf"HKEY_CURRENT_USER\Software\Policies\Bench\Key{key}")
+        for value in range(values_per_key):
+            match value % 4:
+                case 0:
+                    lines.append(f"    Name{value}    REG_SZ    значение {key}-{value}")
+                case 1:
+                    lines.append(f"    Dword{value}    REG_DWORD    0x{value:x}")
+                case 2:
+                    lines.append(rf"    Multi{value}    REG_MULTI_SZ    a\0b\0c{value}")
+                case 3:
+                    lines.append(f"    Blob{value}    REG_BINARY    {bytes(range(16)).hex().upper()}")
+        lines.append("")
+    lines.append(f"End of search: {keys * values_per_key} match(es) found.")
+    return "\r\n".join(lines).encode("windows-1251")
+
+
+REG_QUERY = _reg_query_output(KEYS, VALUES_PER_KEY)
+
+ESME = "\r\n".join(
+    line
+    for server in range(KEYS)
+    for line in (
+        rf"HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\{server:08x}-0000-0000-0000-000000000000",
+        f"    auth_token    REG_SZ    {server:08x}-1111-1111-1111-111111111111",
+        "",
+    )
+).encode("windows-1251")
+
+QWINSTA = (
+    " SESSIONNAME       USERNAME                 ID  STATE   TYPE        DEVICE\r\n"
+    + "".join(f"                   user{i:<20} {i + 10:>5}  Disc\r\n" for i in range(KEYS))
+    + ">console           user                      1  Active\r\n"
+).encode("windows-1251")
+
+
+def test_bench_reg_query(benchmark) -> None:
+    keys = benchmark(parse_reg_query, REG_QUERY)
+    assert len(keys) == KEYS
+    assert sum(len(key.values) for key in keys) == KEYS * VALUES_PER_KEY
+
+
+def test_bench_reg_query_typed_values(benchmark) -> None:
+    keys = parse_reg_query(REG_QUERY)
+    values = benchmark(lambda: [value.value for key in keys for value in key.values])
+    assert len(values) == KEYS * VALUES_PER_KEY
+
+
+def test_bench_auth_tokens(benchmark) -> None:
+    assert len(benchmark(parse_auth_tokens, ESME)) == KEYS
+
+
+def test_bench_qwinsta(benchmark) -> None:
+    assert benchmark(parse_active_session_id, QWINSTA) == 1
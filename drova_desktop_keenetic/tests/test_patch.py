@@ -0,0 +1,157 @@
+import codecs
+from typing import Iterable, cast
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.commands import RegValueType
+from drova_desktop_keenetic.common.patch import (
+    EpicGamesAuthDiscard,
+    PatchWindowsSettings,
+    RegistryPatch,
+    render_reg_file,
+)
+
+
+def test_render_reg_file() -> None:
+    content = render_reg_file(
+        [
+            RegistryPatch(
+                reg_directory=r"HKCU\Software\Policies\Microsoft\Windows\System",
+                value_name="DisableCMD",
+                value_type=RegValueType.REG_DWORD,
+                value=2,
+            ),
+            RegistryPatch(
+                reg_directory=r"HKLM\SOFTWARE\Test",
+                value_name="Path",
+                value_type=RegValueType.REG_SZ,
+                value=r'C:\Games\"quoted".exe',
+            ),
+            RegistryPatch(
+                reg_directory=r"HKCU\Software\Policies\Microsoft\Windows\System",
+                value_name="Blob",
+                value_type=RegValueType.REG_BINARY,
+                value=b"\x01\xff",
+            ),
+        ]
+    )
+
+    assert content.startswith(codecs.BOM_UTF16_LE)
+    text = content[len(codecs.BOM_UTF16_LE) :].decode("utf-16-le")
+    assert text == (
+        "Windows Registry Editor Version 5.00\r\n"
+        "\r\n"
+        "[HKEY_CURRENT_USER\\Software\\Policies\\Microsoft\\Windows\\System]\r\n"
+        '"DisableCMD"=dword:00000002\r\n'
+        '"Blob"=hex:01,ff\r\n'
+        "\r\n"
+        "[HKEY_LOCAL_MACHINE\\SOFTWARE\\Test]\r\n"
+        '"Path"="C:\\\\Games\\\\\\"quoted\\".exe"\r\n'
+        "\r\n"
+    )
+
+
+def _settings(
+    import_exit_status: int, registry: str = "", imported: str | None = None
+) -> tuple[PatchWindowsSettings, mock.MagicMock]:
+    """``imported``: what ``reg query`` shows once ``reg import`` succeeded; every patch by default."""
+    client = mock.MagicMock()
+    current = registry
+
+    async def run(command: str, **kwargs):
+        nonlocal current
+        exit_status = import_exit_status if command.startswith("reg import") else 0
+        if command.startswith("reg import") and not exit_status:
+            current = imported if imported is not None else _reg_query_output(PatchWindowsSettings.registry_patches())
+        stdout = current if command.startswith("reg query") else ""
+        return mock.MagicMock(exit_status=exit_status, returncode=exit_status, stdout=stdout, stderr="")
+
+    client.run = mock.AsyncMock(side_effect=run)
+    sftp = mock.MagicMock()
+    sftp.open.return_value.__aenter__.return_value.write = mock.AsyncMock()
+    sftp.remove = mock.AsyncMock()
+    return PatchWindowsSettings(client, sftp), client
+
+
+@pytest.mark.asyncio
+async def test_registry_patch_single_import() -> None:
+    settings, client = _settings(import_exit_status=0)
+    await settings.patch()
+
+    commands = [call.args[0] for call in client.run.await_args_list]
+    assert [command for command in commands if command.startswith(("reg add", "reg import"))] == [
+        "reg import drova_patch.reg"
+    ]
+    assert settings.failed == []
+    cast(mock.MagicMock, settings.sftp).remove.assert_awaited_once_with("drova_patch.reg")
+
+
+@pytest.mark.asyncio
+async def test_registry_patch_falls_back_per_value() -> None:
+    settings, client = _settings(import_exit_status=1)
+    await settings.patch()
+
+    commands = [call.args[0] for call in client.run.await_args_list]
+    assert sum(command.startswith("reg add") for command in commands) == 2 * len(settings._get_patches())
+
+
+def _reg_query_output(patches: Iterable[RegistryPatch]) -> str:
+    lines = []
+    for patch in patches:
+        data = hex(int(patch.value)) if patch.value_type == RegValueType.REG_DWORD else str(patch.value)
+        lines += [patch.reg_file_key, f"    {patch.value_name}    {patch.value_type}    {data}", ""]
+    return "\r\n".join(lines)
+
+
+@pytest.mark.asyncio
+async def test_registry_patch_import_verified() -> None:
+    patches = list(PatchWindowsSettings.registry_patches())
+    # a policy kept one value from being written, reg import still exited 0
+    blocked = patches.pop(3)
+    settings, client = _settings(import_exit_status=0, imported=_reg_query_output(patches))
+    await settings.patch()
+
+    commands = [call.args[0] for call in client.run.await_args_list]
+    reg_adds = [command for command in commands if command.startswith("reg add")]
+    assert len(reg_adds) == 2
+    assert blocked.value_name in reg_adds[1]
+    assert settings.failed == []
+
+
+@pytest.mark.asyncio
+async def test_registry_patch_writes_only_diff() -> None:
+    patches = list(PatchWindowsSettings.registry_patches())
+    missing = patches.pop(3)
+    settings, client = _settings(import_exit_status=0, registry=_reg_query_output(patches))
+    await settings.patch()
+
+    writer = cast(mock.MagicMock, settings.sftp).open.return_value.__aenter__.return_value
+    writer.write.assert_awaited_once_with(render_reg_file([missing]))
+
+
+@pytest.mark.asyncio
+async def test_registry_patch_nothing_to_write() -> None:
+    registry = _reg_query_output(list(PatchWindowsSettings.registry_patches()))
+    settings, client = _settings(import_exit_status=0, registry=registry)
+    await settings.patch()
+
+    commands = [call.args[0] for call in client.run.await_args_list]
+    assert not [command for command in commands if command.startswith(("reg add", "reg import"))]
+
+
+@pytest.mark.asyncio
+async def test_epic_patch_in_memory() -> None:
+    original = b"[RememberMe]\nEnable=True\nData=secret\n\n[Offline]\nData=x\n\n[Launcher]\nTheme=dark\n"
+    reader, writer = mock.MagicMock(), mock.MagicMock()
+    reader.read = mock.AsyncMock(return_value=original)
+    writer.write = mock.AsyncMock()
+
+    sftp = mock.MagicMock()
+    sftp.open.return_value.__aenter__.side_effect = [reader, writer]
+    await EpicGamesAuthDiscard(mock.MagicMock(), sftp).patch()
+
+    assert [call.args[1] for call in sftp.open.call_args_list] == ["rb", "wb"]
+    patched = writer.write.await_args.args[0].decode()
+    assert "RememberMe" not in patched and "secret" not in patched
+    assert "[Launcher]" in patched
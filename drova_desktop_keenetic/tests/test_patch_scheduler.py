@@ -0,0 +1,151 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.patch import IPatch
+from drova_desktop_keenetic.common.patch_scheduler import (
+    DependencyFailed,
+    PatchScheduler,
+)
+
+events: list[str] = []
+
+
+class SlowPatch(IPatch):
+    NAME = "slow"
+    TASKKILL_IMAGE = ""
+    DELAY = 0.3
+
+    def _patch(self, content: bytes) -> bytes:
+        return content
+
+    async def patch(self) -> None:
+        events.append(f"start {self.NAME}")
+        await asyncio.sleep(self.DELAY)
+        events.append(f"end {self.NAME}")
+
+
+class Launcher(SlowPatch):
+    NAME = "launcher"
+
+
+class Registry(SlowPatch):
+    NAME = "registry"
+    RESOURCES = frozenset({"registry"})
+
+
+class OtherRegistry(SlowPatch):
+    NAME = "other_registry"
+    RESOURCES = frozenset({"registry"})
+
+
+class AfterLauncher(SlowPatch):
+    NAME = "after_launcher"
+    DEPENDS_ON = ("launcher",)
+    DELAY = 0.0
+
+
+class Broken(SlowPatch):
+    NAME = "broken"
+
+    async def patch(self) -> None:
+        raise OSError("sftp failed")
+
+
+class AfterBroken(SlowPatch):
+    NAME = "after_broken"
+    DEPENDS_ON = ("broken",)
+
+
+@pytest.mark.asyncio
+async def test_independent_patches_run_concurrently() -> None:
+    events.clear()
+    scheduler = PatchScheduler(mock.MagicMock(), mock.MagicMock(), [AfterLauncher, SlowPatch, Launcher, Registry])
+
+    started = time.perf_counter()
+    results = await scheduler.run()
+    elapsed = time.perf_counter() - started
+
+    assert all(result.ok for result in results)
+    # slowest patch, not the sum
+    assert elapsed < 0.6
+    assert events.index("end launcher") < events.index("start after_launcher")
+
+
+@pytest.mark.asyncio
+async def test_exclusive_resources_and_failed_dependencies() -> None:
+    events.clear()
+    scheduler = PatchScheduler(mock.MagicMock(), mock.MagicMock(), [Registry, OtherRegistry, Broken, AfterBroken])
+    results = {result.name: result for result in await scheduler.run()}
+
+    first, second = sorted(["registry", "other_registry"], key=lambda name: events.index(f"start {name}"))
+    assert events.index(f"end {first}") < events.index(f"start {second}")
+
+    assert not results["broken"].ok
+    assert isinstance(results["after_broken"].error, DependencyFailed)
+    assert "start after_broken" not in events
+
+
+def test_dependency_cycle_rejected() -> None:
+    class A(SlowPatch):
+        NAME = "a"
+        DEPENDS_ON = ("b",)
+
+    class B(SlowPatch):
+        NAME = "b"
+        DEPENDS_ON = ("a",)
+
+    with pytest.raises(ValueError):
+        PatchScheduler(mock.MagicMock(), mock.MagicMock(), [A, B])
+
+
+@pytest.mark.asyncio
+async def test_launchers_killed_with_one_taskkill() -> None:
+    class Steam(SlowPatch):
+        NAME = "steam"
+        TASKKILL_IMAGE = "steam.exe"
+        DELAY = 0.0
+
+    class Epic(SlowPatch):
+        NAME = "epic"
+        TASKKILL_IMAGE = "EpicGamesLauncher.exe"
+        DELAY = 0.0
+
+    tasklist = iter(['"steam.exe","1234","Console","1","10 000 K"\r\n', '"explorer.exe","42","Console","1","1 K"\r\n'])
+
+    async def run(command: str, **kwargs):
+        stdout = next(tasklist) if command.startswith("tasklist") else ""
+        return mock.MagicMock(exit_status=0, stdout=stdout)
+
+    client = mock.MagicMock()
+    client.run = mock.AsyncMock(side_effect=run)
+    results = await PatchScheduler(client, mock.MagicMock(), [Steam, Epic]).run()
+
+    assert all(result.ok for result in results)
+    commands = [call.args[0] for call in client.run.await_args_list]
+    assert commands == [
+        "taskkill.exe /f /IM steam.exe /IM EpicGamesLauncher.exe",
+        "tasklist /FO CSV /NH",
+        "tasklist /FO CSV /NH",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_restarted_explorer_not_waited_for() -> None:
+    class Explorer(SlowPatch):
+        NAME = "explorer"
+        TASKKILL_IMAGE = "explorer.exe"
+        DELAY = 0.0
+
+    client = mock.MagicMock()
+    # winlogon brings explorer.exe straight back
+    client.run = mock.AsyncMock(return_value=mock.MagicMock(exit_status=0, stdout='"explorer.exe","42"\r\n'))
+
+    started = time.monotonic()
+    results = await PatchScheduler(client, mock.MagicMock(), [Explorer], kill_timeout=1).run()
+
+    assert all(result.ok for result in results)
+    assert [call.args[0] for call in client.run.await_args_list] == ["taskkill.exe /f /IM explorer.exe"]
+    assert time.monotonic() - started < 0.5
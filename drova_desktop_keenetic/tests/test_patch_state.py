@@ -0,0 +1,54 @@
+import hashlib
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.patch import SteamAuthDiscard
+from drova_desktop_keenetic.common.patch_state import FileDigest, PatchStateStore
+
+CLEAN_LOGINUSERS = b'"users"\n{\n}'
+
+
+def _sftp(content: bytes, size: int, mtime: int) -> mock.MagicMock:
+    sftp = mock.MagicMock()
+    sftp.stat = mock.AsyncMock(return_value=mock.MagicMock(size=size, mtime=mtime))
+    handle = sftp.open.return_value.__aenter__.return_value
+    handle.read = mock.AsyncMock(return_value=content)
+    handle.write = mock.AsyncMock()
+    return sftp
+
+
+@pytest.mark.asyncio
+async def test_unchanged_file_skipped(tmp_path) -> None:
+    store = PatchStateStore(tmp_path / "patch_state.json")
+    state = store.for_host("10.0.0.2")
+
+    # first session: file is clean already, nothing written but the state is remembered
+    sftp = _sftp(CLEAN_LOGINUSERS, size=len(CLEAN_LOGINUSERS), mtime=1000)
+    await SteamAuthDiscard(mock.MagicMock(), sftp, state).patch()
+    sftp.open.return_value.__aenter__.return_value.write.assert_not_awaited()
+
+    # next session from the same image: only a stat, no transfer
+    sftp = _sftp(CLEAN_LOGINUSERS, size=len(CLEAN_LOGINUSERS), mtime=1000)
+    await SteamAuthDiscard(mock.MagicMock(), sftp, state).patch()
+    sftp.open.assert_not_called()
+
+    # remembered across restarts
+    restored = PatchStateStore(tmp_path / "patch_state.json")
+    remote_path = str(SteamAuthDiscard.remote_file_location)
+    assert await restored.get("10.0.0.2", remote_path) == FileDigest(
+        len(CLEAN_LOGINUSERS), 1000, hashlib.sha256(CLEAN_LOGINUSERS).hexdigest()
+    )
+    assert await restored.get("10.0.0.3", remote_path) is None
+
+
+@pytest.mark.asyncio
+async def test_changed_file_patched() -> None:
+    state = PatchStateStore().for_host("10.0.0.2")
+    await state.put(str(SteamAuthDiscard.remote_file_location), FileDigest(12, 1000, "x"))
+
+    remembered = b'"users"\n{\n "7656" { "AccountName" "someone" }\n}'
+    sftp = _sftp(remembered, size=len(remembered), mtime=2000)
+    await SteamAuthDiscard(mock.MagicMock(), sftp, state).patch()
+
+    sftp.open.return_value.__aenter__.return_value.write.assert_awaited_once()
@@ -18,7 +18,7 @@ CHECK_DESKTOP_RUN = "drova_desktop_keenetic.common.helpers.CheckDesktop.run"
 BEFORE_CONNECT_RUN = "drova_desktop_keenetic.common.before_connect.BeforeConnect.run"
 AFTER_DISCONNECT_RUN = "drova_desktop_keenetic.common.after_disconnect.AfterDisconnect.run"
 
-DROVA_SOCKET_CONNECT_SSH = "drova_desktop_keenetic.common.drova_poll.connect_ssh"
+DROVA_SOCKET_CONNECT_SSH = "drova_desktop_keenetic.common.ssh_pool.connect_ssh"
 
 logger = logging.getLogger(__name__)
 basicConfig(level=DEBUG)
@@ -42,3 +42,21 @@ async def test_poll_full(mocker):
     await drova_socket.serve()
 
     await drova_socket.stop()
+
+
+@pytest.mark.asyncio
+async def test_poll_reboots_when_shadow_mode_fails(mocker):
+    mocker.patch(CHECK_DESKTOP_RUN, return_value=True)
+    wait_finish = mocker.patch(WAIT_FINISH_OR_ABORT_RUN)
+
+    poll = DrovaPoll(windows_host="127.0.0.1")
+    poll._before_connect = mock.AsyncMock(return_value=False)
+
+    async def after_disconnect(reason: str) -> None:
+        poll.stop_future.set_result(True)
+
+    poll._after_disconnect = mock.AsyncMock(side_effect=after_disconnect)
+    await asyncio.wait_for(poll.polling(), 5)
+
+    poll._after_disconnect.assert_awaited_once_with("shadow_mode_failed")
+    wait_finish.assert_not_called()
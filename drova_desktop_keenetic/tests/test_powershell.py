@@ -0,0 +1,121 @@
+import asyncio
+import re
+from unittest import mock
+
+import pytest
+from asyncssh import ProcessError
+
+from drova_desktop_keenetic.common.commands import PsExec, ShadowDefenderCLI
+from drova_desktop_keenetic.common.powershell import PowerShellExecutor, ShellClosed
+
+# what PowerShell makes of the wrapper: the single-quoted literal handed to cmd.exe, and the marker
+WRAPPED = re.compile(
+    r"\$null \| cmd\.exe /d /s /c '(?P<command>(?:[^'\u2018-\u201b]|['\u2018-\u201b]{2})*) '; \$__ok"
+    r".*WriteLine\('(?P<tag>[^']+)'\)"
+)
+
+
+def _unquote(literal: str) -> str:
+    return re.sub(r"(['\u2018-\u201b])['\u2018-\u201b]", r"\1", literal)
+
+
+class FakeStream:
+    def __init__(self) -> None:
+        self.lines: asyncio.Queue[bytes] = asyncio.Queue()
+
+    async def readline(self) -> bytes:
+        return await self.lines.get()
+
+
+class FakePowerShell:
+    """Answers wrapped command lines the way powershell.exe would, after a short delay."""
+
+    def __init__(self) -> None:
+        self.stdout = FakeStream()
+        self.stderr = FakeStream()
+        self.stdin = mock.MagicMock()
+        self.stdin.write.side_effect = self._on_line
+        self.commands: list[str] = []
+
+    def _on_line(self, line: bytes) -> None:
+        if not (match := WRAPPED.search(line.decode("windows-1251"))):
+            return
+        command, tag = _unquote(match["command"]), match["tag"]
+        self.commands.append(command)
+        asyncio.get_running_loop().call_later(0.01, self._answer, command, tag)
+
+    def _answer(self, command: str, tag: str) -> None:
+        exit_status = 1 if command == "fail" else 0
+        self.stdout.lines.put_nowait(f"out of {command}\r\n".encode("windows-1251"))
+        if exit_status:
+            self.stderr.lines.put_nowait(b"boom\r\n")
+        self.stderr.lines.put_nowait(f"{tag}\r\n".encode())
+        self.stdout.lines.put_nowait(f"{tag}:{exit_status}\r\n".encode())
+
+    def exit(self) -> None:
+        self.stdout.lines.put_nowait(b"")
+        self.stderr.lines.put_nowait(b"")
+
+
+@pytest.mark.asyncio
+async def test_pipelined_commands_demultiplexed() -> None:
+    shell = FakePowerShell()
+    client = mock.MagicMock()
+    client.create_process = mock.AsyncMock(return_value=shell)
+
+    executor = PowerShellExecutor(client)
+    await executor.start()
+
+    first, second, third = await asyncio.gather(
+        executor.run("reg query HKCU"), executor.run("fail"), executor.run("qwinsta")
+    )
+    assert shell.commands == ["reg query HKCU", "fail", "qwinsta"]
+    assert (first.exit_status, first.stdout) == (0, "out of reg query HKCU\r\n")
+    assert (second.exit_status, second.stderr) == (1, "boom\r\n")
+    assert third.stdout == "out of qwinsta\r\n"
+
+    with pytest.raises(ProcessError):
+        await executor.run("fail", check=True)
+
+    shell.exit()
+    await asyncio.sleep(0)
+    with pytest.raises(ShellClosed):
+        await executor.run("qwinsta")
+
+
+@pytest.mark.asyncio
+async def test_raw_output() -> None:
+    shell = FakePowerShell()
+    client = mock.MagicMock()
+    client.create_process = mock.AsyncMock(return_value=shell)
+
+    executor = PowerShellExecutor(client)
+    await executor.start()
+
+    raw = await executor.run("Привет", encoding=None)
+    assert raw.stdout == "out of Привет\r\n".encode("windows-1251")
+    text = await executor.run("Привет")
+    assert text.stdout == "out of Привет\r\n"
+    assert client.run.call_count == 0
+    shell.exit()
+
+
+def test_exit_code_of_native_command() -> None:
+    wrapped = PowerShellExecutor(mock.MagicMock())._wrap(1, "reg query HKCU")
+    # a native command that wrote to stderr but exited 0 is a success: $LASTEXITCODE decides, not $?
+    assert "$global:LASTEXITCODE = $null;" in wrapped
+    assert "$__rc = if ($null -ne $LASTEXITCODE) { $LASTEXITCODE } elseif ($__ok) { 0 } else { 1 }" in wrapped
+
+
+@pytest.mark.parametrize(
+    "builder",
+    [
+        ShadowDefenderCLI(password="p$w`d;'x\u2019", actions=["enter"], drives="C"),
+        PsExec("cmd /c exit", user="admin", password="$(Remove-Item C:\\);`'"),
+    ],
+)
+def test_builder_reaches_cmd_unparsed(builder) -> None:
+    """cmd-quoted builders pass PowerShell as one literal, whatever the password holds."""
+    match = WRAPPED.search(PowerShellExecutor(mock.MagicMock())._wrap(1, str(builder)))
+    assert match is not None
+    assert _unquote(match["command"]) == str(builder)
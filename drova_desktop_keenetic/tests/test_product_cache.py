@@ -0,0 +1,60 @@
+from pathlib import PureWindowsPath
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+
+from drova_desktop_keenetic.common.drova import ProductInfo
+from drova_desktop_keenetic.common.product_cache import ProductInfoCache
+
+GET_PRODUCT_INFO = "drova_desktop_keenetic.common.product_cache.get_product_info"
+
+
+def _product(product_id, title="Desktop") -> ProductInfo:
+    return ProductInfo(
+        product_id=product_id,
+        game_path=PureWindowsPath(r"C:\Windows\explorer.exe"),
+        work_path=PureWindowsPath(r"C:\Windows"),
+        args="",
+        use_default_desktop=True,
+        title=title,
+    )
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_and_lru(mocker) -> None:
+    fetch = mocker.patch(GET_PRODUCT_INFO, new=AsyncMock(side_effect=lambda product_id, _: _product(product_id)))
+    cache = ProductInfoCache(max_entries=2)
+    first, second, third = uuid4(), uuid4(), uuid4()
+
+    await cache.get(first, "token")
+    await cache.get(first, "token")
+    assert fetch.call_count == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    await cache.get(second, "token")
+    await cache.get(third, "token")
+    assert cache.stats()["size"] == 2
+    await cache.get(first, "token")
+    assert fetch.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_cache_disk_tier_and_ttl(mocker, tmp_path) -> None:
+    product_id = uuid4()
+    fetch = mocker.patch(GET_PRODUCT_INFO, new=AsyncMock(return_value=_product(product_id)))
+    path = tmp_path / "products.json"
+
+    await ProductInfoCache(path=path).get(product_id, "token")
+    assert path.exists()
+
+    restarted = ProductInfoCache(path=path)
+    assert (await restarted.get(product_id, "token")).title == "Desktop"
+    assert restarted.stats()["disk_hits"] == 1
+    assert fetch.call_count == 1
+
+    expired = ProductInfoCache(path=path, ttl=0)
+    fetch.side_effect = OSError("network down")
+    assert (await expired.get(product_id, "token")).product_id == product_id
+    assert expired.stats()["revalidations"] == 1
@@ -0,0 +1,40 @@
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.commands import ShadowDefenderCLI
+from drova_desktop_keenetic.common.readiness import (
+    ShadowModeTimeout,
+    wait_for_shadow_mode,
+)
+
+NOT_PROTECTED = "Drive C: Not protected\r\nDrive D: Not protected\r\n"
+PROTECTED = "Drive C: Protected\r\nDrive D: Not protected\r\n"
+
+
+def test_parse_status() -> None:
+    assert ShadowDefenderCLI.parse_status(PROTECTED) == {"C": True, "D": False}
+    assert ShadowDefenderCLI.parse_status("") == {}
+
+
+def _client(*outputs: str) -> mock.MagicMock:
+    client = mock.MagicMock()
+    client.run = mock.AsyncMock(side_effect=[mock.MagicMock(exit_status=0, stdout=output) for output in outputs])
+    return client
+
+
+@pytest.mark.asyncio
+async def test_wait_until_protected() -> None:
+    client = _client(NOT_PROTECTED, NOT_PROTECTED, PROTECTED)
+    elapsed = await wait_for_shadow_mode(client, "C", protected=True, interval=0.01)
+
+    assert client.run.await_count == 3
+    assert "/list" in client.run.await_args.args[0]
+    assert elapsed < 1
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out() -> None:
+    client = _client(*[NOT_PROTECTED] * 100)
+    with pytest.raises(ShadowModeTimeout):
+        await wait_for_shadow_mode(client, "CD", protected=True, timeout=0.05, interval=0.01)
@@ -0,0 +1,69 @@
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.commands import RegQuery, RegValueType
+from drova_desktop_keenetic.common.patch import PatchWindowsSettings, RegistryPatch
+from drova_desktop_keenetic.common.registry import query_roots, verify_registry
+
+EXPLORER = r"HKEY_CURRENT_USER\Software\Microsoft\Windows\CurrentVersion\Policies\Explorer"
+
+REG_QUERY_EXPLORER = f"""
+{EXPLORER}
+    NoClose    REG_DWORD    0x1
+    DisallowRun    REG_DWORD    0x0
+    0    REG_SZ    regedit.exe
+    1    REG_SZ    power shell.exe
+
+{EXPLORER}\\DisallowRun
+    (Default)    REG_SZ
+""".replace("\n", "\r\n")
+
+
+def test_parse_values() -> None:
+    keys = RegQuery.parse_values(REG_QUERY_EXPLORER.encode("windows-1251"))
+    assert keys[EXPLORER.upper()]["NOCLOSE"] == ("REG_DWORD", "0x1")
+    assert keys[EXPLORER.upper()]["1"] == ("REG_SZ", "power shell.exe")
+    assert keys[EXPLORER.upper() + "\\DISALLOWRUN"]["(DEFAULT)"] == ("REG_SZ", "")
+
+
+def test_query_roots_dedup_nested_keys() -> None:
+    roots = query_roots(patch.reg_file_key for patch in PatchWindowsSettings.registry_patches())
+    assert len(roots) < len(PatchWindowsSettings.registry_patches())
+    assert EXPLORER in roots
+    assert len(roots) == len({root.upper() for root in roots})
+
+
+@pytest.mark.asyncio
+async def test_verify_registry_one_query_per_key() -> None:
+    async def run(command: str, **kwargs):
+        if "Explorer" in command:
+            return mock.MagicMock(exit_status=0, stdout=REG_QUERY_EXPLORER)
+        return mock.MagicMock(exit_status=1, stdout="")
+
+    client = mock.MagicMock()
+    client.run = mock.AsyncMock(side_effect=run)
+
+    def explorer(name: str, value_type: RegValueType, value: str | int) -> RegistryPatch:
+        return RegistryPatch(
+            reg_directory=EXPLORER.replace("HKEY_CURRENT_USER", "HKCU"),
+            value_name=name,
+            value_type=value_type,
+            value=value,
+        )
+
+    patches = [
+        explorer("NoClose", RegValueType.REG_DWORD, 1),
+        explorer("DisallowRun", RegValueType.REG_DWORD, 1),
+        explorer("1", RegValueType.REG_SZ, "power shell.exe"),
+        explorer("2", RegValueType.REG_SZ, "mmc.exe"),
+    ]
+    checks = await verify_registry(client, patches)
+
+    assert client.run.await_count == 1
+    assert [(check.actual, check.ok) for check in checks] == [
+        ("0x1", True),
+        ("0x0", False),
+        ("power shell.exe", True),
+        (None, False),
+    ]
@@ -0,0 +1,93 @@
+import pytest
+
+from drova_desktop_keenetic.bench.fake_api import FakeDrovaApi, FaultConfig
+from drova_desktop_keenetic.common.drova import DrovaApiClient, DrovaServerUnavailable
+from drova_desktop_keenetic.common.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    RetryBudget,
+    RetryPolicy,
+    call_with_retry,
+)
+
+
+def test_breaker_opens_and_probes(mocker) -> None:
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    mocker.patch("drova_desktop_keenetic.common.resilience.time.monotonic", return_value=breaker._retry_at + 1)
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.stats()["opened"] == 1
+
+
+def test_retry_budget() -> None:
+    budget = RetryBudget(ratio=0.5, min_per_second=0, window=60)
+    for _ in range(4):
+        budget.record_request()
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    assert budget.exhausted == 1
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_recovers(mocker) -> None:
+    mocker.patch("drova_desktop_keenetic.common.resilience.asyncio.sleep")
+    attempts = 0
+
+    async def flaky() -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise OSError("reset")
+        return "ok"
+
+    breaker = CircuitBreaker("flaky")
+    result = await call_with_retry(flaky, breaker, RetryBudget(), RetryPolicy(attempts=3), retry_on=(OSError,))
+    assert result == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_call_with_retry_other_errors_are_neutral() -> None:
+    async def malformed() -> str:
+        raise ValueError("malformed body")
+
+    breaker = CircuitBreaker("neutral", failure_threshold=2)
+    breaker.before_call()
+    breaker.record_failure()
+
+    with pytest.raises(ValueError):
+        await call_with_retry(malformed, breaker, RetryBudget(), RetryPolicy(attempts=3), retry_on=(OSError,))
+    # neither reset by the answer nor counted towards opening
+    assert breaker.failures == 1
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_client_breaker_opens_on_outage(mocker) -> None:
+    mocker.patch("drova_desktop_keenetic.common.resilience.asyncio.sleep")
+    async with FakeDrovaApi(faults=FaultConfig(error_rate=1.0)) as api:
+        async with DrovaApiClient(base_url=api.base_url) as client:
+            client.retry_policy = RetryPolicy(attempts=2)
+            for _ in range(3):
+                with pytest.raises(DrovaServerUnavailable):
+                    await client.get_latest_session("server", "token")
+            with pytest.raises(CircuitOpenError):
+                await client.get_latest_session("server", "token")
+
+            assert client.health()["sessions"]["state"] == "open"
+    assert api.stats["5xx"] == 5
@@ -0,0 +1,101 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from drova_desktop_keenetic.common.drova import StatusEnum
+from drova_desktop_keenetic.common.session_watcher import (
+    AdaptiveSchedule,
+    SessionWatcher,
+)
+from drova_desktop_keenetic.tests.conftest import SLEEP, _session
+
+
+def test_schedule_backoff() -> None:
+    schedule = AdaptiveSchedule(fast_interval=1, active_warmup=60, active_max_interval=30, idle_max_interval=5)
+    active = _session(StatusEnum.ACTIVE)
+
+    assert schedule.next_interval(_session(StatusEnum.NEW), 10, 1000) == 1
+    assert schedule.next_interval(active, 1, 10) == 1
+
+    interval = 1.0
+    for _ in range(20):
+        interval = schedule.next_interval(active, interval, 3600)
+    assert interval == 30
+
+    interval = 1.0
+    for _ in range(20):
+        interval = schedule.next_interval(_session(StatusEnum.FINISHED), interval, 3600)
+    assert interval == 5
+
+    # the default cap bounds how late an ACTIVE session's end is seen
+    interval = 1.0
+    for _ in range(20):
+        interval = AdaptiveSchedule().next_interval(active, interval, 3600)
+    assert interval == 10
+
+    # between sessions it stays fast — a new session is noticed within a second
+    assert AdaptiveSchedule().next_interval(None, 1.0, 3600) == 1
+
+
+@pytest.mark.asyncio
+async def test_watcher_emits_transitions(mocker) -> None:
+    mocker.patch(SLEEP)
+    uuid = uuid4()
+    timeline = [
+        _session(StatusEnum.NEW, uuid),
+        _session(StatusEnum.ACTIVE, uuid),
+        _session(StatusEnum.ACTIVE, uuid),
+        _session(StatusEnum.FINISHED, uuid),
+    ]
+
+    async def fetch():
+        return timeline.pop(0)
+
+    watcher = SessionWatcher(fetch)
+    events = watcher.subscribe()
+    session = await watcher.wait_for(lambda s: s is not None and s.status == StatusEnum.FINISHED)
+
+    assert session is not None and session.status == StatusEnum.FINISHED
+    assert watcher.polls == 4
+    statuses = []
+    while not events.empty():
+        current = events.get_nowait().current
+        assert current is not None
+        statuses.append(current.status)
+    assert statuses == [StatusEnum.NEW, StatusEnum.ACTIVE, StatusEnum.FINISHED]
+
+
+@pytest.mark.asyncio
+async def test_nudge_cuts_wait_short() -> None:
+    uuid = uuid4()
+    timeline = [_session(StatusEnum.ACTIVE, uuid), _session(StatusEnum.FINISHED, uuid)]
+
+    async def fetch():
+        return timeline.pop(0)
+
+    watcher = SessionWatcher(fetch, AdaptiveSchedule(fast_interval=60))
+    waiting = asyncio.create_task(watcher.wait_for(lambda s: s is not None and s.status == StatusEnum.FINISHED))
+    await asyncio.sleep(0.01)
+    assert watcher.polls == 1
+
+    watcher.nudge()
+    session = await asyncio.wait_for(waiting, 1)
+    assert session is not None and session.status == StatusEnum.FINISHED
+    assert watcher.polls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancel_leaves_no_waiters() -> None:
+    async def fetch():
+        return None
+
+    watcher = SessionWatcher(fetch, AdaptiveSchedule(fast_interval=60))
+    waiting = asyncio.create_task(watcher.wait_for(lambda s: s is not None))
+    await asyncio.sleep(0.01)
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    await asyncio.sleep(0)
+    assert asyncio.all_tasks() == {asyncio.current_task()}
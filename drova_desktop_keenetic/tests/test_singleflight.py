@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from drova_desktop_keenetic.common.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_concurrent_calls() -> None:
+    flight: SingleFlight[str, int] = SingleFlight(window=0)
+    calls = 0
+
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.do("server", fetch) for _ in range(5)))
+    assert results == [1] * 5
+    assert flight.stats() == {"calls": 5, "executed": 1, "coalesced": 4}
+
+    assert await flight.do("server", fetch) == 2
+    assert await flight.do("other", fetch) == 3
+
+
+@pytest.mark.asyncio
+async def test_singleflight_window_and_errors() -> None:
+    flight: SingleFlight[str, int] = SingleFlight(window=60)
+
+    async def fail() -> int:
+        raise OSError("down")
+
+    with pytest.raises(OSError):
+        await flight.do("server", fail)
+
+    async def ok() -> int:
+        return 42
+
+    assert await flight.do("server", ok) == 42
+    assert await flight.do("server", fail) == 42
+    assert flight.coalesced == 1
+
+    flight.forget("server")
+    with pytest.raises(OSError):
+        await flight.do("server", fail)
@@ -0,0 +1,74 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from drova_desktop_keenetic.common.ssh_pool import SSHConnectionManager
+
+CONNECT_SSH = "drova_desktop_keenetic.common.ssh_pool.connect_ssh"
+
+
+def _fake_connection() -> mock.MagicMock:
+    conn = mock.MagicMock()
+    conn.is_closed.return_value = False
+    conn.wait_closed = mock.AsyncMock()
+    return conn
+
+
+@pytest.mark.asyncio
+async def test_connection_reused_until_closed(mocker) -> None:
+    first, second = _fake_connection(), _fake_connection()
+    connect = mocker.patch(CONNECT_SSH, new=mock.AsyncMock(side_effect=[first, second]))
+    manager = SSHConnectionManager("10.0.0.2", "user", "password")
+
+    for _ in range(3):
+        async with manager.lend() as conn:
+            assert conn is first
+    assert connect.await_count == 1
+
+    # keepalive noticed the host went away (e.g. rebooted)
+    first.is_closed.return_value = True
+    async with manager.lend() as conn:
+        assert conn is second
+    assert connect.await_count == 2
+
+    await manager.close()
+    second.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_connection_dropped_after_transport_error(mocker) -> None:
+    first, second = _fake_connection(), _fake_connection()
+    mocker.patch(CONNECT_SSH, new=mock.AsyncMock(side_effect=[first, second]))
+    manager = SSHConnectionManager("10.0.0.2", "user", "password")
+
+    with pytest.raises(OSError):
+        async with manager.lend():
+            raise OSError("connection reset")
+    first.close.assert_called_once()
+
+    # errors from the command itself keep the connection
+    with pytest.raises(ValueError):
+        async with manager.lend() as conn:
+            assert conn is second
+            raise ValueError("bad output")
+    assert manager.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_closed(mocker) -> None:
+    first, second = _fake_connection(), _fake_connection()
+    connect = mocker.patch(CONNECT_SSH, new=mock.AsyncMock(side_effect=[first, second]))
+    manager = SSHConnectionManager("10.0.0.2", "user", "password", idle_timeout=0.05)
+
+    async with manager.lend():
+        await asyncio.sleep(0.1)  # borrowed connections are never closed under the borrower
+    first.close.assert_not_called()
+
+    await asyncio.sleep(0.1)
+    first.close.assert_called_once()
+
+    async with manager.lend() as conn:
+        assert conn is second
+    assert connect.await_count == 2
+    await manager.close()
@@ -0,0 +1,110 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from asyncssh import SSHCompletedProcess
+
+from drova_desktop_keenetic.common.drova import DrovaUnauthorized
+from drova_desktop_keenetic.common.helpers import CheckDesktop
+from drova_desktop_keenetic.common.token_store import HostTokenStore, RebootRequired
+
+SERVER_ID = "85dd80c4-adc1-1111-1111-111111111111"
+
+
+def _reg_output(auth_token: str) -> SSHCompletedProcess:
+    return SSHCompletedProcess(
+        exit_status=0,
+        returncode=0,
+        stdout=rf"""
+HKEY_LOCAL_MACHINE\SOFTWARE\ITKey\Esme\servers\{SERVER_ID}
+    auth_token    REG_SZ    {auth_token}
+""",
+    )
+
+
+def _client(*auth_tokens: str) -> Mock:
+    client = Mock()
+    client.run = AsyncMock(side_effect=[_reg_output(token) for token in auth_tokens])
+    return client
+
+
+@pytest.mark.asyncio
+async def test_shared_across_helpers():
+    client = _client("token-1")
+    store = HostTokenStore("host")
+
+    for _ in range(3):
+        assert await CheckDesktop(client, tokens=store).get_auth_token() == "token-1"
+    assert store.fetches == 1
+    assert client.run.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_read_once():
+    client = _client("token-1")
+    store = HostTokenStore("host")
+
+    results = await asyncio.gather(*(store.get(client) for _ in range(5)))
+    assert set(results) == {(SERVER_ID, "token-1")}
+    assert store.fetches == 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_invalidate():
+    client = _client("token-1", "token-2", "token-3")
+    store = HostTokenStore("host", ttl=0)
+
+    assert await store.get(client) == (SERVER_ID, "token-1")
+    assert await store.get(client) == (SERVER_ID, "token-2")
+
+    store.ttl = 3600
+    store.invalidate("reboot")
+    assert await store.get(client) == (SERVER_ID, "token-3")
+    assert await store.get(client) == (SERVER_ID, "token-3")
+    assert store.fetches == 3
+
+
+@pytest.mark.asyncio
+async def test_missing_tokens_not_cached():
+    client = Mock()
+    client.run = AsyncMock(return_value=SSHCompletedProcess(exit_status=1, returncode=1, stdout=""))
+    store = HostTokenStore("host")
+
+    for _ in range(2):
+        with pytest.raises(RebootRequired):
+            await store.get(client)
+    assert store.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_unauthorized_rereads_and_retries():
+    client = _client("old-token", "new-token")
+    store = HostTokenStore("host")
+    seen = []
+
+    async def fetch(server_id, auth_token):
+        seen.append(auth_token)
+        if auth_token == "old-token":
+            raise DrovaUnauthorized(401, "url")
+        return None
+
+    helper = CheckDesktop(client, fetch, store)
+    session_fetch = await helper.pinned_session_fetch()
+    assert await session_fetch() is None
+    assert await session_fetch() is None
+    # re-pinned to the new token: one registry read for the 401, none after
+    assert seen == ["old-token", "new-token", "new-token"]
+    assert store.fetches == 2
+
+
+@pytest.mark.asyncio
+async def test_unauthorized_with_unchanged_registry_raises():
+    client = _client("token-1", "token-1")
+    store = HostTokenStore("host")
+
+    async def fetch(server_id, auth_token):
+        raise DrovaUnauthorized(403, "url")
+
+    with pytest.raises(DrovaUnauthorized):
+        await CheckDesktop(client, fetch, store).get_session()
+    assert store.fetches == 2